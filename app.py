@@ -1,150 +1,108 @@
 import streamlit as st
+
+from assets import APP_CSS, EDUCATION_CLOSING_MD, EDUCATION_PRINCIPLES_MD
+from startup import RunTimer, cold_run, default_fast_start, timing_rows
+
+run_timer = RunTimer()
+
+# --- 1. 页面配置 ---
+st.set_page_config(page_title="胜算实验室：点对点逻辑修正", layout="wide")
+# 样式表在进程内只整理一次（见 assets.py）
+st.markdown(APP_CSS, unsafe_allow_html=True)
+
+# --- 2. 主比赛信息输入 ---
+# 标题不是组件，先于重量级依赖的导入发出，冷启动时页面尽早有内容
+st.markdown('<div class="team-header"><h1>🔺 胜算实验室：全功能风控系统</h1></div>', unsafe_allow_html=True)
+st.caption("核心功能：策略模拟 + EV计算 + 蒙特卡洛实验")
+run_timer.mark("首屏")
+
+# 主客队输入只依赖 streamlit，同样先于 pandas 等依赖的导入发出
+col_match1, col_match2, col_match3 = st.columns([2, 1, 2])
+with col_match1:
+    home_team = st.text_input("🏠 主队名称", value="曼城", placeholder="输入主队名称")
+with col_match2:
+    st.markdown("<h3 style='text-align: center; margin-top: 15px;'>VS</h3>", unsafe_allow_html=True)
+with col_match3:
+    away_team = st.text_input("✈️ 客队名称", value="阿森纳", placeholder="输入客队名称")
+run_timer.mark("首个组件")
+
 import pandas as pd
 import numpy as np
+import json
 import random
+import os
 import re
+import uuid
+from urllib.error import HTTPError, URLError
 from datetime import datetime
 from collections import Counter
 
-# --- 1. 页面配置 ---
-st.set_page_config(page_title="胜算实验室：点对点逻辑修正", layout="wide")
+from dataflow import DataflowGraph, fingerprint
+from shared_cache import SessionRegistry, SharedCache, format_bytes, memory_report
 
-# --- 自定义CSS样式 ---
-st.markdown("""
-<style>
-    .team-header {
-        background: linear-gradient(90deg, #1e3c72, #2a5298);
-        color: white;
-        padding: 15px;
-        border-radius: 10px;
-        text-align: center;
-        margin-bottom: 20px;
-    }
-    .match-info {
-        background-color: #f0f2f6;
-        padding: 12px;
-        border-radius: 8px;
-        border-left: 4px solid #1e3c72;
-        margin: 10px 0;
-    }
-    .match-info-secondary {
-        background-color: #e9ecef;
-        padding: 12px;
-        border-radius: 8px;
-        border-left: 4px solid #6c757d;
-        margin: 10px 0;
-    }
-    .stMetric {
-        background-color: white;
-        padding: 10px;
-        border-radius: 8px;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-    }
-    .strategy-note {
-        background-color: #fff3cd;
-        border-left: 4px solid #ffc107;
-        padding: 10px;
-        margin: 10px 0;
-        border-radius: 5px;
-    }
-    .odds-input-section {
-        background-color: #f8f9fa;
-        padding: 15px;
-        border-radius: 8px;
-        border: 1px solid #dee2e6;
-        margin: 10px 0;
-    }
-    .tab-container {
-        background-color: white;
-        border-radius: 8px;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        padding: 10px;
-        margin: 10px 0;
-    }
-    .parlay-badge {
-        background-color: #17a2b8;
-        color: white;
-        padding: 4px 8px;
-        border-radius: 4px;
-        font-size: 12px;
-        font-weight: bold;
-        margin-right: 5px;
-    }
-    .history-stats {
-        background-color: #e7f3ff;
-        border-radius: 8px;
-        padding: 10px;
-        margin: 10px 0;
-    }
-</style>
-""", unsafe_allow_html=True)
+from backtest import S2_STRONG_COLUMNS, S2_TOTAL_COLUMNS
+from history_stats import decay_statistics, history_arrays, parse_match_date, window_statistics
+from htft import DEFAULT_FIRST_HALF_SHARE, HISTORY_LINE, HTFT_OUTCOMES, htft_market, htft_statistics
+from payoff import CS_OTHER, DEFAULT_CS_ODDS, MAX_GRID_GOALS, S2_RESULTS, S2_TOTALS, parse_scoreline
+from strategies import STRATEGIES, fixture_ev, fixture_payoff, get_strategy, outcome_rows, total_goal_probs
+from precompute import (
+    ANALYSIS_KIND, PrecomputeScheduler, analyse_fixture, analysis_fixture, analysis_key, goal_model_for,
+    home_share_from,
+)
+from priors import DEFAULT_STRENGTH, MAX_TOTAL, PRIORS_FILE, LeaguePriors, shrink_statistics
+from odds_history import OddsHistory
+from hedge import HEDGE_MARKETS, book_hedge, fixture_hedge_odds, fixture_hedge_outcomes
+# pandas/numpy 是核心页面每次运行都要用的（盘口表格、数据流），只能推迟到首屏和首个组件之后，
+# 不能省掉；plotly 在 import streamlit 时已经由 streamlit 自己导入。
+# 其余功能模块（图表、回测、归档、报告、评级/进球模型、赛季模拟、计算服务、台账、实时行情……）
+# 在用到它们的开关分支或函数里再导入：快速启动时没打开的板块不付导入开销
+
+run_timer.mark("依赖导入")
 
 # --- 解析历史战绩数据的函数 ---
 def parse_history_data(history_text, current_home, current_away):
-    """解析历史战绩数据，提取比赛信息"""
+    """解析历史战绩数据，提取比赛信息（含半场比分）"""
     matches = []
-    lines = history_text.strip().split('\n')
+    current_home_lower = current_home.lower()
+    current_away_lower = current_away.lower()
     
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        # 尝试解析各种格式的比分
-        try:
-            # 正则表达式匹配比分
-            # 匹配格式: 数字 - 数字 或 数字–数字
-            score_pattern = r'(\d+)\s*[-–]\s*(\d+)'
-            match = re.search(score_pattern, line)
-            
-            if match:
-                home_goals = int(match.group(1))
-                away_goals = int(match.group(2))
-                
-                # 尝试确定这场比赛的主队（基于当前主队名称是否在行中出现）
-                # 这是一个简化的逻辑，实际应用中可能需要更复杂的解析
-                line_lower = line.lower()
-                current_home_lower = current_home.lower()
-                current_away_lower = current_away.lower()
-                
-                # 如果当前主队名称出现在比分前，认为它是主队
-                # 否则，如果当前客队名称出现在比分前，认为它是主队
-                # 都不匹配，则默认第一个队是主队
-                
-                # 查找比分位置
-                score_start = match.start()
-                before_score = line_lower[:score_start]
-                
-                if current_home_lower in before_score:
-                    # 当前主队是这场比赛的主队
-                    matches.append({
-                        'home_goals': home_goals,
-                        'away_goals': away_goals,
-                        'total_goals': home_goals + away_goals,
-                        'result': '主胜' if home_goals > away_goals else ('客胜' if home_goals < away_goals else '平局'),
-                        'home_team_current_perspective': True  # 从当前视角看，主队是主队
-                    })
-                elif current_away_lower in before_score:
-                    # 当前客队是这场比赛的主队
-                    matches.append({
-                        'home_goals': away_goals,  # 注意交换，因为当前客队是那场比赛的主队
-                        'away_goals': home_goals,
-                        'total_goals': home_goals + away_goals,
-                        'result': '客胜' if home_goals > away_goals else ('主胜' if home_goals < away_goals else '平局'),
-                        'home_team_current_perspective': False  # 从当前视角看，主队是客队
-                    })
-                else:
-                    # 无法确定，使用默认（第一个队是主队）
-                    matches.append({
-                        'home_goals': home_goals,
-                        'away_goals': away_goals,
-                        'total_goals': home_goals + away_goals,
-                        'result': '主胜' if home_goals > away_goals else ('客胜' if home_goals < away_goals else '平局'),
-                        'home_team_current_perspective': True  # 默认
-                    })
-        except Exception as e:
-            # 如果解析失败，跳过这一行
-            continue
+    # 一个预编译正则对整段文本扫描一次：日期、主队、全场比分、(半场比分)、客队
+    for m in HISTORY_LINE.finditer(history_text):
+        date_text, line_home, fh, fa, hh, ha, _ = m.groups()
+        home_goals, away_goals = int(fh), int(fa)
+        match_day = parse_match_date(date_text)
+        ht_home, ht_away = (int(hh), int(ha)) if hh is not None else (None, None)
+        
+        # 尝试确定这场比赛的主队（基于当前主队名称是否出现在比分前）
+        # 如果当前主队名称出现在比分前，认为它是主队
+        # 否则，如果当前客队名称出现在比分前，认为它是主队
+        # 都不匹配，则默认第一个队是主队
+        before_score = line_home.lower()
+        
+        if current_home_lower in before_score or current_away_lower not in before_score:
+            # 当前主队是这场比赛的主队（或无法确定时默认第一个队是主队）
+            matches.append({
+                'home_goals': home_goals,
+                'away_goals': away_goals,
+                'total_goals': home_goals + away_goals,
+                'result': '主胜' if home_goals > away_goals else ('客胜' if home_goals < away_goals else '平局'),
+                'ht_home_goals': ht_home,
+                'ht_away_goals': ht_away,
+                'date': match_day,
+                'home_team_current_perspective': True  # 从当前视角看，主队是主队
+            })
+        else:
+            # 当前客队是这场比赛的主队
+            matches.append({
+                'home_goals': away_goals,  # 注意交换，因为当前客队是那场比赛的主队
+                'away_goals': home_goals,
+                'total_goals': home_goals + away_goals,
+                'result': '客胜' if home_goals > away_goals else ('主胜' if home_goals < away_goals else '平局'),
+                'ht_home_goals': ht_away,
+                'ht_away_goals': ht_home,
+                'date': match_day,
+                'home_team_current_perspective': False  # 从当前视角看，主队是客队
+            })
     
     return matches
 
@@ -230,18 +188,177 @@ def calculate_statistics(matches, current_home, current_away):
     
     return stats
 
-# --- 2. 主比赛信息输入 ---
-st.markdown('<div class="team-header"><h1>🔺 胜算实验室：全功能风控系统</h1></div>', unsafe_allow_html=True)
-st.caption("核心功能：策略模拟 + EV计算 + 蒙特卡洛实验")
+# --- 派生结果的纯函数（由依赖图按需调用） ---
+def summarize_ai_predictions(all_predictions):
+    """统计AI模型最常预测的3个比分"""
+    return Counter(all_predictions).most_common(3)
 
-# 创建两列布局用于主比赛信息输入
-col_match1, col_match2, col_match3 = st.columns([2, 1, 2])
-with col_match1:
-    home_team = st.text_input("🏠 主队名称", value="曼城", placeholder="输入主队名称")
-with col_match2:
-    st.markdown("<h3 style='text-align: center; margin-top: 15px;'>VS</h3>", unsafe_allow_html=True)
-with col_match3:
-    away_team = st.text_input("✈️ 客队名称", value="阿森纳", placeholder="输入客队名称")
+def default_score_market():
+    """默认波胆盘口表：常见比分 + 三个「其他」项，投入均为0"""
+    return pd.DataFrame({"比分": list(DEFAULT_CS_ODDS), "赔率": list(DEFAULT_CS_ODDS.values()),
+                         "投入": [0.0] * len(DEFAULT_CS_ODDS)})
+
+def market_selection(text):
+    """表格里的选项规范化（「2:1」->「2-1」），无法识别返回 None"""
+    text = str(text or "").strip()
+    score = parse_scoreline(text)
+    if score:
+        return f"{score[0]}-{score[1]}"
+    return text if text in CS_OTHER else None
+
+def market_bets(market):
+    """波胆表格 -> {选项: (赔率, 金额)}；跳过无法识别的选项，同一比分重复时以最后一行为准"""
+    bets = {}
+    for r in market.to_dict("records"):
+        sel = market_selection(r.get("比分"))
+        if sel and pd.notna(r.get("赔率")) and float(r["赔率"]) > 1:
+            bets[sel] = (float(r["赔率"]), float(r.get("投入") or 0.0))
+    return bets
+
+def update_market_odds(selection, odds):
+    """实时赔率写回波胆表格（盘口里没有该选项时追加一行）；以最近一次提交的表格为准"""
+    market = st.session_state.get("s1_market", default_score_market()).copy()
+    match = market["比分"].map(market_selection) == selection
+    if match.any():
+        market.loc[match, "赔率"] = odds
+    else:
+        market.loc[len(market)] = [selection, odds, 0.0]
+    st.session_state.s1_market = market
+
+def outcome_table(fixture):
+    """按净盈亏合并的盈亏表：任何已登记的策略都由收益矩阵和结果概率算出"""
+    return pd.DataFrame(outcome_rows(fixture))
+
+def simple_o25_ev(pred_prob, o25_odds, o25_stake):
+    """单纯大球投注的EV"""
+    return (pred_prob * o25_odds - 1) * o25_stake
+
+def calc_hedge_effect(ev, simple_ev):
+    """对冲效果：策略EV绝对值相对单纯大球EV的变化"""
+    return (abs(ev) - abs(simple_ev)) / abs(simple_ev) * 100 if simple_ev != 0 else 0
+
+def build_report_text(fixture):
+    """策略报告摘要（Markdown，与比赛日批量报告同一模板和算法）"""
+    from reports import fixture_report_data, render_markdown
+    return render_markdown(fixture_report_data(fixture))
+
+# --- 派生结果依赖图 ---
+# 每个派生量声明自己的输入，结果按输入指纹缓存在会话里；
+# 例如只改大球投入时，不会重新解析历史战绩或重算AI预测汇总。
+def define_flow(flow):
+    """注册全部派生量（EV 等整场分析按比赛字典放在共享层，见 fixture_analysis）"""
+    flow.define("matches", ["history_data", "home_team", "away_team"], parse_history_data)
+    flow.define("stats", ["matches", "home_team", "away_team"], calculate_statistics)
+    flow.define("shrunk_stats", ["stats", "league_prior", "prior_strength"], shrink_statistics)
+    flow.define("htft_stats", ["matches"], htft_statistics)
+    flow.define("history_arrays", ["matches"], history_arrays)
+    flow.define("decay_stats", ["history_arrays", "half_life_days"],
+                lambda arrays, half_life: decay_statistics(*arrays, half_life))
+    flow.define("recent_n_stats", ["history_arrays", "window_n"],
+                lambda arrays, n: window_statistics(*arrays, last_n=n))
+    flow.define("recent_months_stats", ["history_arrays", "window_months", "match_day"],
+                lambda arrays, months, day: window_statistics(*arrays, last_months=months, as_of=day))
+    flow.define("ai_prediction_summary", ["ai_predictions"], summarize_ai_predictions)
+    # fixture 是当前比赛的完整比赛字典（见 current_fixture），盈亏表和报告不区分策略
+    flow.define("outcome_table", ["fixture"], outcome_table)
+    flow.define("simple_ev", ["pred_prob", "o25_odds", "o25_stake"], simple_o25_ev)
+    flow.define("hedge_effect", ["ev", "simple_ev"], calc_hedge_effect)
+    flow.define("report_text", ["fixture"], build_report_text)
+
+# --- 跨会话共享层 ---
+# 不可变的昂贵产物（进球模型表、联赛先验）进程内只存一份，所有会话只读共享；
+# 会话自己的派生结果放在服务端会话空间，session_state 只保留组件取值等小增量。
+@st.cache_resource
+def shared_tier():
+    """进程级共享缓存与会话登记表"""
+    return SharedCache(), SessionRegistry()
+
+shared, registry = shared_tier()
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+session_id = st.session_state.session_id
+# 顺带回收空闲会话的服务端空间（回收后再访问会按需重建）
+registry.evict_idle()
+session_space = registry.space(session_id)
+
+flow = session_space.setdefault("dataflow", DataflowGraph())
+define_flow(flow)
+# 赔率走势：实时行情逐条写入，页面上的手动修改每次重跑时补记。
+# 序列本身按 (比赛, 盘口) 区分，放在进程级而不是会话空间：会话空闲被回收时，
+# 仍在运行的实时接入线程不会写进一份已经没人读的缓冲，回来后走势也还在
+@st.cache_resource
+def odds_history_store():
+    """进程级赔率走势缓冲（全部会话共用，容量由 OddsHistory 的序列上限约束）"""
+    return OddsHistory()
+
+odds_history = odds_history_store()
+
+def load_league_priors(path):
+    """联赛先验表：每个进程只加载一次（文件更新后按修改时间重新加载），没有表时返回 None"""
+    path = os.path.abspath(path)
+    if not os.path.exists(path):
+        return None
+    return shared.get("league_priors_table", (path, os.path.getmtime(path)), lambda: LeaguePriors.load(path))
+
+# --- 组件默认值与实时赔率 ---
+def seed_state(key, value):
+    """首次运行时写入组件默认值（之后由组件本身或实时赔率更新）"""
+    if key not in st.session_state:
+        st.session_state[key] = value
+
+def section_enabled(label, key):
+    """非核心板块是否构建：快速启动模式下要等用户打开开关才计算和渲染"""
+    return not fast_start or st.toggle(label, key=key)
+
+def start_live_odds(source, target, fixture):
+    """为当前会话启动实时赔率接入（已在运行则先停止），行情同时记入赔率走势"""
+    from live_odds import OddsIngestor, file_feed, mock_feed, socket_feed
+    stop_live_odds()
+    if source == "模拟行情":
+        feed = mock_feed(rate=int(target or 20))
+    elif source == "行情文件":
+        feed = file_feed(target)
+    else:
+        host, _, port = target.rpartition(":")
+        feed = socket_feed(host or "127.0.0.1", int(port))
+    st.session_state.live_ingestor = OddsIngestor(history=odds_history, fixture=fixture).start(feed)
+
+def stop_live_odds():
+    """停止当前会话的实时赔率接入"""
+    ingestor = st.session_state.pop("live_ingestor", None)
+    if ingestor is not None:
+        ingestor.stop()
+
+def apply_widget_odds(odds_by_key):
+    """把 {组件key: 赔率} 写入盘口（波胆写回表格行），须在对应组件创建之前调用"""
+    from live_odds import S1_ODDS_PREFIX
+    for widget_key, odd in odds_by_key.items():
+        if widget_key.startswith(S1_ODDS_PREFIX):
+            update_market_odds(widget_key[len(S1_ODDS_PREFIX):], odd)
+        else:
+            st.session_state[widget_key] = odd
+
+def apply_best_prices(scope, best):
+    """把一场比赛的多庄家最优价填入盘口；只在最优价变化时写入，之后仍可手动修改"""
+    from live_odds import market_widget_key
+    prices = {market_widget_key(m): odd for m, (odd, _) in best.items() if market_widget_key(m) is not None}
+    applied = st.session_state.setdefault("applied_best_prices", {})
+    if prices and applied.get(scope) != prices:
+        applied[scope] = prices
+        apply_widget_odds(prices)
+    return len(prices)
+
+def odds_book_source(uploaded, path):
+    """多庄家赔率表的缓存键和读取函数（上传文件按内容指纹，本地文件按路径+修改时间）"""
+    if uploaded is not None:
+        return fingerprint(uploaded.getvalue()), lambda: pd.read_csv(uploaded)
+    path = os.path.abspath(path)
+    return (path, os.path.getmtime(path)), lambda: pd.read_csv(path)
+
+# 必须在带 key 的盘口组件创建之前，把后台接入的赔率变化写入session_state
+# （上面的主客队输入没有 key，不受影响）
+if st.session_state.get("live_ingestor") is not None:
+    apply_widget_odds(st.session_state.live_ingestor.drain())
 
 # 主比赛详情输入
 col_match_info1, col_match_info2, col_match_info3 = st.columns(3)
@@ -264,6 +381,9 @@ with col_match_info3:
     # 更新session_state
     st.session_state.match_time = match_time
 
+flow.set(home_team=home_team, away_team=away_team, league=league,
+         match_when=f"{match_date.strftime('%Y-%m-%d')} {match_time.strftime('%H:%M')}")
+
 # 显示主比赛信息卡
 st.markdown(f"""
 <div class="match-info">
@@ -280,14 +400,42 @@ st.markdown(f"""
 
 # --- 3. 侧边栏输入 ---
 with st.sidebar:
+    fast_start = st.toggle("⚡ 快速启动模式", value=default_fast_start(), key="fast_start",
+                           help="报告、教育总结、热力图等非核心板块在打开对应开关前不计算、不构建")
+    
     st.markdown("### 📋 比赛信息摘要")
     st.write(f"**{home_team}** vs **{away_team}**")
     st.write(f"**联赛**: {league}")
     st.write(f"**时间**: {match_date.strftime('%m/%d')} {match_time.strftime('%H:%M')}")
     
+    st.divider()
+    st.header("🏦 多庄家比价")
+    odds_book = None
+    show_book = st.checkbox("启用多庄家赔率表", value=False, key="book_on")
+    if show_book:
+        from bookmakers import book_from_frame
+        st.caption("赔率长表CSV（列：home_team, away_team, bookmaker, market, odds；market 同实时行情盘口名，另有 u25_odds）")
+        book_file = st.file_uploader("上传赔率表", type=["csv"], key="book_file")
+        book_path = st.text_input("或本地文件路径", value="bookmaker_odds.csv", key="book_path")
+        book_autofill = st.checkbox("最优赔率自动填入盘口", value=True, key="book_autofill")
+        try:
+            # 同一份赔率表所有会话只建一次立方体
+            book_key, read_book = odds_book_source(book_file, book_path)
+            odds_book = shared.get("odds_book", book_key, lambda: book_from_frame(read_book()))
+        except (OSError, ValueError, KeyError) as e:
+            st.warning(f"⚠️ 无法读取赔率表: {e}")
+    if odds_book is not None:
+        # 胜平负报价只用于稳胆比赛，主比赛只取大球/总进球/波胆
+        main_best = {m: v for m, v in odds_book.best_for(home_team, away_team).items()
+                     if m not in S2_STRONG_COLUMNS}
+        n_filled = apply_best_prices("main", main_best) if book_autofill else 0
+        st.caption(f"{len(odds_book.fixtures)} 场 · {len(odds_book.bookmakers)} 家庄家；"
+                   f"本场有报价的结果 {len(main_best)} 个" + (f"，已取最优价填入 {n_filled} 个盘口" if n_filled else ""))
+    
     st.divider()
     st.header("⚖️ 核心大球项 (O2.5)")
-    o25_odds = st.number_input("大球 (3球+) 赔率", value=2.30, step=0.01, min_value=1.01)
+    seed_state("o25_odds", 2.30)
+    o25_odds = st.number_input("大球 (3球+) 赔率", step=0.01, min_value=1.01, key="o25_odds")
     o25_stake = st.number_input("大球投入金额 ($)", value=100.0, step=1.0, min_value=0.0)
     
     st.divider()
@@ -317,12 +465,26 @@ with st.sidebar:
         placeholder="格式示例：日期 主队 比分 (半场比分) 客队\n每行一场比赛"
     )
     
+    # 交锋场数少时统计向联赛先验收缩（先验表由 python priors.py build 赛果.csv 预先生成）
+    col_prior1, col_prior2 = st.columns([2, 1])
+    with col_prior1:
+        priors_path = st.text_input("联赛先验表", value=PRIORS_FILE, key="priors_path")
+    with col_prior2:
+        prior_strength = st.number_input("先验强度（等效场数）", value=DEFAULT_STRENGTH, min_value=0.0, step=1.0,
+                                         key="prior_strength")
+    league_priors_table = load_league_priors(priors_path)
+    shrunk_stats = None
+    # 没有交锋统计时，大球概率默认取联赛先验
+    default_over = 48 if league_priors_table is None else \
+        int(min(max(round(league_priors_table.lookup(league)["over_25_rate"]), 10), 90))
+    
     # 当用户输入历史数据时，自动分析
     if history_data:
-        matches = parse_history_data(history_data, home_team, away_team)
+        flow.set(history_data=history_data)
+        matches = flow.get("matches")
         
         if matches:
-            stats = calculate_statistics(matches, home_team, away_team)
+            stats = flow.get("stats")
             
             if stats:
                 # 显示统计摘要
@@ -379,14 +541,81 @@ with st.sidebar:
                         '平均进球': [stats['avg_home_goals'], stats['avg_away_goals'], stats['avg_goals']]
                     })
                     st.dataframe(avg_goals_df, use_container_width=True, hide_index=True)
+                    
+                    # 半全场与下半场统计
+                    htft_stats = flow.get("htft_stats")
+                    if htft_stats:
+                        st.write(f"**半全场分布**（{htft_stats['matches_with_ht']}场含半场比分）")
+                        st.dataframe(pd.DataFrame({
+                            '半全场': HTFT_OUTCOMES,
+                            '出现次数': [htft_stats['htft_counts'][o] for o in HTFT_OUTCOMES],
+                            '比例%': [htft_stats['htft_rates'][o] for o in HTFT_OUTCOMES],
+                        }), use_container_width=True, hide_index=True)
+                        st.write(f"上半场场均进球 {htft_stats['avg_first_half_goals']:.2f} · "
+                                 f"下半场场均进球 {htft_stats['avg_second_half_goals']:.2f} · "
+                                 f"下半场2球+ {htft_stats['second_half_over_15_rate']:.1f}% · "
+                                 f"两个半场都有进球 {htft_stats['both_halves_scored_rate']:.1f}% · "
+                                 f"半场落后逆转 {htft_stats['comeback_rate']:.1f}%")
+                    
+                    # 按日期加权：近期交锋权重更高
+                    if len(flow.get("history_arrays")[0]):
+                        st.write("**⏳ 按日期加权统计**")
+                        col_decay1, col_decay2, col_decay3 = st.columns(3)
+                        with col_decay1:
+                            half_life_days = st.number_input("半衰期（天）", value=365, min_value=7, step=30, key="half_life_days")
+                        with col_decay2:
+                            window_n = st.number_input("最近N场", value=5, min_value=1, step=1, key="window_n")
+                        with col_decay3:
+                            window_months = st.number_input("最近K个月", value=24, min_value=1, step=1, key="window_months")
+                        flow.set(half_life_days=float(half_life_days), window_n=int(window_n),
+                                 window_months=int(window_months), match_day=match_date)
+                        decay = flow.get("decay_stats")
+                        recent_n = flow.get("recent_n_stats")
+                        recent_k = flow.get("recent_months_stats")
+                        weighted_rows = [("全部等权", stats), ("时间衰减", decay),
+                                         (f"最近{int(window_n)}场", recent_n), (f"最近{int(window_months)}个月", recent_k)]
+                        st.dataframe(pd.DataFrame({
+                            '口径': [name for name, _ in weighted_rows],
+                            '有效场数': [float(s.get('effective_matches', s.get('total_matches'))) for _, s in weighted_rows],
+                            f'{home_team}胜率%': [float(s['home_win_rate']) for _, s in weighted_rows],
+                            '平局%': [float(s['draw_rate']) for _, s in weighted_rows],
+                            f'{away_team}胜率%': [float(s['away_win_rate']) for _, s in weighted_rows],
+                            '大球%': [float(s['over_25_rate']) for _, s in weighted_rows],
+                            '场均进球': [float(s['avg_goals']) for _, s in weighted_rows],
+                        }).round(2), use_container_width=True, hide_index=True)
                 
                 # 使用历史数据的大球比例来调整预测概率
                 historical_over_rate = stats['over_25_rate']
                 
+                # 联赛先验收缩：先验是共享表里的只读行，查找不做任何计算
+                if league_priors_table is not None:
+                    league_prior = league_priors_table.lookup(league)
+                    flow.set(league_prior=league_prior, prior_strength=float(prior_strength))
+                    shrunk_stats = flow.get("shrunk_stats")
+                    st.write("**📐 联赛先验收缩**")
+                    st.caption(f"先验：{league_prior['league']}（{league_prior['matches']:.0f}场）"
+                               + ("" if league_prior['league'] == league else f" · 先验表中没有{league}，使用全部联赛")
+                               + f" · 先验权重 {float(shrunk_stats['prior_weight']) * 100:.0f}%")
+                    prior_rows = [("历史交锋", stats), ("联赛先验", league_prior), ("收缩后", shrunk_stats)]
+                    st.dataframe(pd.DataFrame({
+                        '口径': [name for name, _ in prior_rows],
+                        f'{home_team}胜率%': [float(s['home_win_rate']) for _, s in prior_rows],
+                        '平局%': [float(s['draw_rate']) for _, s in prior_rows],
+                        f'{away_team}胜率%': [float(s['away_win_rate']) for _, s in prior_rows],
+                        '大球%': [float(s['over_25_rate']) for _, s in prior_rows],
+                        '场均进球': [float(s['avg_goals']) for _, s in prior_rows],
+                    }).round(2), use_container_width=True, hide_index=True)
+                    st.caption("收缩后总进球分布：" + " · ".join(
+                        f"{g}球{'+' if g == MAX_TOTAL else ''} {p * 100:.1f}%"
+                        for g, p in enumerate(shrunk_stats['goal_probs'])))
+                    historical_over_rate = float(shrunk_stats['over_25_rate'])
+                
                 # 根据历史大球比例调整预测概率
                 st.markdown("---")
                 st.write("##### 🎯 基于历史数据调整预测")
-                st.info(f"📊 历史交锋大球比例: {historical_over_rate:.1f}%")
+                st.info(f"📊 历史交锋大球比例: {stats['over_25_rate']:.1f}%"
+                        + (f" · 向{shrunk_stats['prior_league']}先验收缩后 {historical_over_rate:.1f}%"
+                           if shrunk_stats is not None else ""))
                 
                 # 让用户基于历史数据调整预测
                 pred_prob = st.slider(
@@ -397,14 +626,14 @@ with st.sidebar:
                 ) / 100
             else:
                 st.warning("⚠️ 未能从输入的数据中计算统计信息。")
-                pred_prob = st.slider("你预测的大球概率 (%)", 10, 90, 48) / 100
+                pred_prob = st.slider("你预测的大球概率 (%)", 10, 90, default_over) / 100
         else:
             st.warning("⚠️ 未能从输入的数据中提取有效的比赛信息。请检查格式。")
-            pred_prob = st.slider("你预测的大球概率 (%)", 10, 90, 48) / 100
+            pred_prob = st.slider("你预测的大球概率 (%)", 10, 90, default_over) / 100
     else:
         # 如果没有输入历史数据，使用默认滑块
         st.write("##### 🎯 预测大球概率")
-        pred_prob = st.slider("你预测的大球概率 (%)", 10, 90, 48) / 100
+        pred_prob = st.slider("你预测的大球概率 (%)", 10, 90, default_over) / 100
     
     # --- 添加AI模型比分预测 ---
     st.markdown("---")
@@ -445,8 +674,8 @@ with st.sidebar:
         ]
         
         # 统计最常见的预测
-        prediction_counts = Counter(all_predictions)
-        most_common = prediction_counts.most_common(3)
+        flow.set(ai_predictions=all_predictions)
+        most_common = flow.get("ai_prediction_summary")
         
         if most_common:
             st.write("**最常预测的比分**:")
@@ -454,553 +683,435 @@ with st.sidebar:
                 st.write(f"- {pred}: {count}次 ({count/len(all_predictions)*100:.1f}%)")
     
     st.divider()
-    mode = st.radio("请选择执行策略：", ["策略 1：比分精准流", "策略 2：总进球复式流"])
+    mode = st.radio("请选择执行策略：", list(STRATEGIES))
+    flow.set(mode=mode, pred_prob=pred_prob, o25_odds=o25_odds, o25_stake=o25_stake)
+    
+    st.divider()
+    st.header("📈 球队评级 (Elo)")
+    show_ratings = st.checkbox("启用评级模型", value=False, key="elo_on")
+    if show_ratings:
+        st.caption("赛果CSV（列：date, home_team, away_team, home_goals, away_goals，可选 league）")
+        elo_file = st.file_uploader("上传赛果CSV", type=["csv"], key="elo_file")
+        elo_path = st.text_input("或本地文件路径", value="results.csv", key="elo_path")
+        fit_goals = st.checkbox("同时拟合联赛进攻/防守进球模型 (Dixon–Coles)", value=True, key="goal_fit_on")
+        if fit_goals:
+            goal_half_life = st.number_input("赛果权重半衰期（天）", value=365, min_value=30, step=30,
+                                             key="goal_half_life")
+            goal_cache_dir = st.text_input("拟合参数缓存目录", value="model_cache", key="goal_cache_dir")
     
     st.divider()
     st.header("🎲 蒙特卡洛实验")
     show_monte_carlo = st.checkbox("启用蒙特卡洛模拟", value=False)
+    
+    st.divider()
+    st.header("⏱️ 滚球模式")
+    show_inplay = st.checkbox("比赛已开始（按当前比分重算）", value=False, key="inplay_on")
+    if show_inplay:
+        inplay_minute = st.slider("已进行分钟", 0, 90, 45, key="inplay_minute")
+        col_ip1, col_ip2 = st.columns(2)
+        # 比分网格只到 MAX_GRID_GOALS 球，当前比分不能超出网格
+        with col_ip1:
+            inplay_home_score = st.number_input(f"{home_team} 进球", value=0, min_value=0, max_value=MAX_GRID_GOALS,
+                                                step=1, key="inplay_hs")
+        with col_ip2:
+            inplay_away_score = st.number_input(f"{away_team} 进球", value=0, min_value=0, max_value=MAX_GRID_GOALS,
+                                                step=1, key="inplay_as")
+    
+    st.divider()
+    st.header("📡 实时赔率")
+    live_source = st.radio("行情来源", ["模拟行情", "行情文件", "行情Socket"], key="live_source")
+    if live_source == "模拟行情":
+        live_target = st.text_input("每秒更新数", value="20", key="live_target_mock")
+    elif live_source == "行情文件":
+        live_target = st.text_input("JSON行文件路径", value="odds_feed.jsonl", key="live_target_file")
+    else:
+        live_target = st.text_input("地址 (host:port)", value="127.0.0.1:9100", key="live_target_socket")
+    
+    col_live1, col_live2 = st.columns(2)
+    with col_live1:
+        if st.button("▶️ 开始接入", key="live_start"):
+            try:
+                start_live_odds(live_source, live_target, f"{home_team} vs {away_team}")
+            except (OSError, ValueError) as e:
+                st.error(f"无法启动行情接入: {e}")
+    with col_live2:
+        if st.button("⏹️ 停止", key="live_stop"):
+            stop_live_odds()
+    
+    live_ingestor = st.session_state.get("live_ingestor")
+    if live_ingestor is not None and live_ingestor.is_running():
+        from live_odds import DEFAULT_MIN_INTERVAL
+        st.caption(f"已接收 {live_ingestor.stats['received']} 条 · 推送 {live_ingestor.stats['flushes']} 批 · "
+                   f"变化盘口 {live_ingestor.stats['changed']} 个 · 异动报警 {live_ingestor.stats['alerts']} 次")
+        
+        # 去抖：按固定间隔检查，有变化才整页重跑
+        @st.fragment(run_every=DEFAULT_MIN_INTERVAL)
+        def live_odds_watcher():
+            ingestor = st.session_state.get("live_ingestor")
+            if ingestor is not None and ingestor.has_updates():
+                st.rerun()
+        
+        live_odds_watcher()
+    
+    st.divider()
+    st.header("🧪 历史回测")
+    show_backtest = st.checkbox("启用历史回测", value=False)
+    if show_backtest:
+        bt_remote = st.checkbox("交给计算服务执行（不占用页面线程）", value=True, key="bt_remote")
+        eval_url = st.text_input("计算服务地址（留空使用本机内置服务）", value="", key="eval_url")
 
 # --- 4. 逻辑处理核心 ---
-st.divider()
-col_in, col_out = st.columns([1.6, 2], gap="large")
-
-active_bets = [] 
-parlay_bets = []  # 存储2串1复式投注
-
-if mode == "策略 1：比分精准流":
-    with col_in:
-        st.write(f"### 🕹️ 设定比分对冲 ({home_team} vs {away_team})")
-        # 强制 6 种比分
-        scores = ["0-0", "1-0", "0-1", "1-1", "2-0", "0-2"]
-        score_labels = ["0-0", f"1-0 ({home_team}胜)", f"0-1 ({away_team}胜)", "1-1", f"2-0 ({home_team}胜)", f"0-2 ({away_team}胜)"]
-        default_odds = {"0-0": 10.0, "1-0": 8.5, "0-1": 8.0, "1-1": 7.0, "2-0": 13.0, "0-2": 12.0}
-        
-        for i, s in enumerate(scores):
-            c1, c2, c3 = st.columns([1.5, 1.2, 1.2])
-            with c1: 
-                is_on = st.checkbox(score_labels[i], key=f"s1_{s}")
-                # 显示概率提示
-                if s == "1-1":
-                    st.caption("常见比分", help="平局常见比分，概率相对较高")
-                elif s == "0-0":
-                    st.caption("低概率", help="双方保守时可能出现")
-            
-            with c2: 
-                s_amt = st.number_input(f"金额", value=10.0, key=f"s1_am_{s}", 
-                                      label_visibility="collapsed", min_value=0.0) if is_on else 0.0
-            with c3: 
-                s_odd = st.number_input(f"赔率", value=default_odds[s], key=f"s1_od_{s}", 
-                                      label_visibility="collapsed", min_value=1.01) if is_on else 0.0
-            if is_on: 
-                active_bets.append({"item": s, "odd": s_odd, "stake": s_amt})
-        
-        # 添加大球项
-        active_bets.append({"item": "3球+", "odd": o25_odds, "stake": o25_stake})
-        total_cost = sum(b['stake'] for b in active_bets)
-        
-        # 显示投入统计
-        col_cost1, col_cost2 = st.columns(2)
-        with col_cost1:
-            st.metric("💰 大球投入", f"${o25_stake:.2f}")
-        with col_cost2:
-            st.metric("💰 对冲投入", f"${total_cost - o25_stake:.2f}")
-        st.metric("💰 方案总投入", f"${total_cost:.2f}")
+# 策略输入按 strategy.schema 逐个字段生成：有专门编辑器的字段（波胆盘口、稳胆比赛、总进球2串1）用编辑器，
+# 一个编辑器一次填好一组字段（editor(strategy, 已填字段) -> {字段名: 取值}）；其余字段按类型生成通用组件。之后的盈亏表、EV、报告、对冲、回测
+# 都只和由这些字段组成的比赛字典打交道，新登记的策略不需要改页面。
+def score_market_editor(strategy, fields):
+    """波胆盘口表格 -> score_bets"""
+    st.write(f"### 🕹️ 设定波胆对冲 ({home_team} vs {away_team})")
+    st.caption(f"每行一个比分（如 2-1）或 {' / '.join(CS_OTHER)}（盘口中未列出的比分）；"
+               "投入为0的行只作为盘口列出。修改完成后点「应用盘口」一次提交。")
+    
+    # 整个盘口是一个表格组件，放在表单里：编辑过程中不触发重跑，提交时一次生效
+    seed_state("s1_market", default_score_market())
+    with st.form("s1_market_form", border=False):
+        s1_table = st.data_editor(
+            st.session_state.s1_market, num_rows="dynamic", hide_index=True, use_container_width=True,
+            key="s1_market_editor",
+            column_config={
+                "比分": st.column_config.TextColumn("比分", required=True),
+                "赔率": st.column_config.NumberColumn("赔率", min_value=1.01, step=0.01, format="%.2f"),
+                "投入": st.column_config.NumberColumn("投入 ($)", min_value=0.0, step=1.0, format="%.2f"),
+            },
+        )
+        if st.form_submit_button("✅ 应用盘口"):
+            # 提交的表格写回盘口种子：之后的实时赔率/最优价都在用户编辑过的表格上更新，
+            # 否则表格的数据一变（组件随之重建），已填的投入和新增的行会被旧种子覆盖
+            st.session_state.s1_market = s1_table.reset_index(drop=True)
+    score_bets = market_bets(s1_table)
+    unknown = [str(s) for s in s1_table["比分"] if market_selection(s) is None and pd.notna(s)]
+    if unknown:
+        st.warning(f"⚠️ 无法识别的选项已忽略: {', '.join(unknown)}")
+    odds_history.record_changes(f"{home_team} vs {away_team}",
+                                {f"cs_{sel}": odd for sel, (odd, _) in score_bets.items()})
+    return {"score_bets": score_bets}
 
-    with col_out:
-        st.write("### 📊 模拟盈亏校验 (点对点比分组合图)")
-        
-        # 生成所有可能结果
-        s1_outcomes = scores + ["3球+"]
-        outcome_labels = score_labels + [f"3球或以上 ({home_team} {away_team} 总进球≥3)"]
-        res_list = []
-        
-        for i, out in enumerate(s1_outcomes):
-            # 只有当投注项的名字完全等于模拟赛果的名字时才计入收益
-            income = sum(b['stake'] * b['odd'] for b in active_bets if b['item'] == out)
-            net_profit = round(income - total_cost, 2)
-            
-            # 判断结果类型
-            result_type = "中立"
-            if out == "3球+":
-                result_type = "大球胜"
-            elif out in ["0-0", "1-0", "0-1", "1-1", "2-0", "0-2"]:
-                result_type = "小球胜"
-            
-            res_list.append({
-                "模拟赛果": outcome_labels[i],
-                "净盈亏": net_profit,
-                "类型": result_type
-            })
-        
-        df_s1 = pd.DataFrame(res_list)
-        
-        # 用颜色区分的柱状图
-        colors = ['#ff6b6b' if x < 0 else '#1dd1a1' for x in df_s1['净盈亏']]
+def strong_leg_editor(strategy, fields):
+    """稳胆比赛（另一场比赛的胜平负）-> s2_home_team, s2_away_team, s2_league, s2_selection, s2_odds"""
+    st.write("### 🏆 稳胆比赛设置")
+    col_s2a1, col_s2a2, col_s2a3 = st.columns([2, 1, 2])
+    with col_s2a1:
+        s2_home_team = st.text_input("🏠 稳胆主队", value="利物浦", placeholder="输入稳胆主队", key="s2_home")
+    with col_s2a2:
+        st.markdown("<h4 style='text-align: center; margin-top: 10px;'>VS</h4>", unsafe_allow_html=True)
+    with col_s2a3:
+        s2_away_team = st.text_input("✈️ 稳胆客队", value="诺丁汉森林", placeholder="输入稳胆客队", key="s2_away")
+    
+    # 多庄家最优价：稳胆比赛只取胜平负
+    if odds_book is not None and book_autofill:
+        apply_best_prices("strong", {m: v for m, v in odds_book.best_for(s2_home_team, s2_away_team).items()
+                                     if m in S2_STRONG_COLUMNS})
+    
+    # 稳胆比赛联赛
+    s2_league = st.selectbox("📋 稳胆联赛", ["英超", "欧冠", "西甲", "德甲", "意甲", "法甲", "其他"], key="s2_league")
+    
+    # 显示稳胆比赛信息卡
+    st.markdown(f"""
+    <div class="match-info-secondary">
+        <div style="display: flex; justify-content: space-between; align-items: center;">
+            <div style="font-size: 16px; font-weight: bold;">
+                {s2_home_team} <span style="color: #666; font-weight: normal;">vs</span> {s2_away_team}
+            </div>
+            <div style="font-size: 12px; color: #666;">
+                {s2_league}
+            </div>
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # 稳胆比赛赔率输入
+    st.markdown("### 📊 稳胆比赛赔率设置")
+    
+    # 使用标签页组织不同类型的赔率
+    tab1, tab2 = st.tabs(["标准盘口 (胜平负)", "亚洲盘口 (让球)"])
+    
+    with tab1:
+        st.markdown('<div class="tab-container">', unsafe_allow_html=True)
+        st.write("##### 标准胜平负赔率")
+        # 胜平负三个赔率组件的 key 与实时赔率/多庄家比价的盘口列同名，默认值取自策略 schema
+        s2_odds = []
+        result_labels = [f"{s2_home_team} 胜", "平局", f"{s2_away_team} 胜"]
+        default_odds = strategy.defaults({})["s2_odds"]
+        for col, key, label, default in zip(st.columns(3), S2_STRONG_COLUMNS, result_labels, default_odds):
+            with col:
+                seed_state(key, default)
+                s2_odds.append(st.number_input(label, min_value=1.01, step=0.01, key=key))
+        
+        # 选择稳胆选项
+        st.write("##### 选择稳胆选项")
+        s2_choice = st.radio("请选择稳胆投注选项:", result_labels, horizontal=True, key="s2_selection")
+        pick = result_labels.index(s2_choice)
+        st.info(f"选择的稳胆选项: **{s2_choice}**，赔率: **{s2_odds[pick]}**")
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    with tab2:
+        st.markdown('<div class="tab-container">', unsafe_allow_html=True)
+        st.write("##### 亚洲让球盘口")
+        
+        # 让球数选择
+        col_handicap1, col_handicap2 = st.columns(2)
+        with col_handicap1:
+            handicap_value = st.selectbox("让球数", ["-2.5", "-2", "-1.5", "-1", "-0.5", "0", "+0.5", "+1", "+1.5", "+2", "+2.5"], index=5)
+        
+        # 解释让球
+        if handicap_value.startswith("-"):
+            st.info(f"{s2_home_team} 让 {handicap_value[1:]} 球")
+        elif handicap_value.startswith("+"):
+            st.info(f"{s2_away_team} 让 {handicap_value[1:]} 球")
+        else:
+            st.info("平手盘")
         
-        # 创建图表
-        chart_data = df_s1.set_index("模拟赛果")["净盈亏"]
-        st.bar_chart(chart_data)
+        # 让球赔率
+        col_hdp1, col_hdp2 = st.columns(2)
+        with col_hdp1:
+            st.number_input(f"{s2_home_team} 让球胜", value=1.80, min_value=1.01, step=0.01, key="s2_hdp_home")
+        with col_hdp2:
+            st.number_input(f"{s2_away_team} 让球胜", value=2.05, min_value=1.01, step=0.01, key="s2_hdp_away")
         
-        # 显示详细表格
-        st.write("##### 📋 详细盈亏表")
-        st.dataframe(df_s1, use_container_width=True, hide_index=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    odds_history.record_changes(f"{s2_home_team} vs {s2_away_team}", dict(zip(S2_STRONG_COLUMNS, s2_odds)))
+    # 分隔符
+    st.markdown("---")
+    return {"s2_home_team": s2_home_team, "s2_away_team": s2_away_team, "s2_league": s2_league,
+            "s2_selection": S2_RESULTS[pick], "s2_odds": s2_odds}
 
-else:  # 策略 2：总进球复式流
-    with col_in:
-        st.markdown('<div class="strategy-note">🎯 <strong>策略说明</strong>：本策略包含两部分投注：<br>1. 单独大球投注<br>2. 2串1复式投注（稳胆比赛 × 总进球选项）</div>', unsafe_allow_html=True)
-        
-        # 第一场比赛：稳胆比赛（独立比赛）
-        st.write("### 🏆 稳胆比赛设置")
-        col_s2a1, col_s2a2, col_s2a3 = st.columns([2, 1, 2])
-        with col_s2a1:
-            s2_home_team = st.text_input("🏠 稳胆主队", value="利物浦", placeholder="输入稳胆主队", key="s2_home")
-        with col_s2a2:
-            st.markdown("<h4 style='text-align: center; margin-top: 10px;'>VS</h4>", unsafe_allow_html=True)
-        with col_s2a3:
-            s2_away_team = st.text_input("✈️ 稳胆客队", value="诺丁汉森林", placeholder="输入稳胆客队", key="s2_away")
-        
-        # 稳胆比赛联赛
-        s2_league = st.selectbox("📋 稳胆联赛", ["英超", "欧冠", "西甲", "德甲", "意甲", "法甲", "其他"], key="s2_league")
-        
-        # 显示稳胆比赛信息卡
-        st.markdown(f"""
-        <div class="match-info-secondary">
-            <div style="display: flex; justify-content: space-between; align-items: center;">
-                <div style="font-size: 16px; font-weight: bold;">
-                    {s2_home_team} <span style="color: #666; font-weight: normal;">vs</span> {s2_away_team}
-                </div>
-                <div style="font-size: 12px; color: #666;">
-                    {s2_league}
-                </div>
+def goal_parlay_editor(strategy, fields):
+    """主比赛总进球选项与每注2串1金额 -> goal_odds, parlay_stake（稳胆字段已填时显示组合详情）"""
+    st.write("### ⚽ 主比赛总进球选项")
+    st.info(f"**注意**: 总进球比赛与主比赛为同一场: {home_team} vs {away_team}")
+    
+    # 显示主比赛信息卡
+    st.markdown(f"""
+    <div class="match-info">
+        <div style="display: flex; justify-content: space-between; align-items: center;">
+            <div style="font-size: 16px; font-weight: bold;">
+                {home_team} <span style="color: #666; font-weight: normal;">vs</span> {away_team}
+            </div>
+            <div style="font-size: 12px; color: #666;">
+                {league} · 大球赔率: {o25_odds}
             </div>
         </div>
-        """, unsafe_allow_html=True)
-        
-        # 稳胆比赛赔率输入
-        st.markdown("### 📊 稳胆比赛赔率设置")
-        
-        # 使用标签页组织不同类型的赔率
-        tab1, tab2 = st.tabs(["标准盘口 (胜平负)", "亚洲盘口 (让球)"])
-        
-        with tab1:
-            st.markdown('<div class="tab-container">', unsafe_allow_html=True)
-            st.write("##### 标准胜平负赔率")
-            col_std1, col_std2, col_std3 = st.columns(3)
-            with col_std1:
-                s2_win_odds = st.number_input(f"{s2_home_team} 胜", value=1.35, min_value=1.01, step=0.01, key="s2_win_odds")
-            with col_std2:
-                s2_draw_odds = st.number_input("平局", value=4.50, min_value=1.01, step=0.01, key="s2_draw_odds")
-            with col_std3:
-                s2_lose_odds = st.number_input(f"{s2_away_team} 胜", value=8.00, min_value=1.01, step=0.01, key="s2_lose_odds")
-            
-            # 选择稳胆选项
-            st.write("##### 选择稳胆选项")
-            s2_selection = st.radio(
-                "请选择稳胆投注选项:",
-                [f"{s2_home_team} 胜", "平局", f"{s2_away_team} 胜"],
-                horizontal=True,
-                key="s2_selection"
-            )
-            
-            # 根据选择获取赔率
-            if s2_selection == f"{s2_home_team} 胜":
-                strong_win = s2_win_odds
-                strong_win_type = "胜"
-            elif s2_selection == "平局":
-                strong_win = s2_draw_odds
-                strong_win_type = "平"
-            else:
-                strong_win = s2_lose_odds
-                strong_win_type = "负"
-                
-            st.info(f"选择的稳胆选项: **{s2_selection}**，赔率: **{strong_win}**")
-            st.markdown('</div>', unsafe_allow_html=True)
-        
-        with tab2:
-            st.markdown('<div class="tab-container">', unsafe_allow_html=True)
-            st.write("##### 亚洲让球盘口")
-            
-            # 让球数选择
-            col_handicap1, col_handicap2 = st.columns(2)
-            with col_handicap1:
-                handicap_value = st.selectbox("让球数", ["-2.5", "-2", "-1.5", "-1", "-0.5", "0", "+0.5", "+1", "+1.5", "+2", "+2.5"], index=5)
-            
-            # 解释让球
-            if handicap_value.startswith("-"):
-                st.info(f"{s2_home_team} 让 {handicap_value[1:]} 球")
-            elif handicap_value.startswith("+"):
-                st.info(f"{s2_away_team} 让 {handicap_value[1:]} 球")
-            else:
-                st.info("平手盘")
-            
-            # 让球赔率
-            col_hdp1, col_hdp2 = st.columns(2)
-            with col_hdp1:
-                s2_hdp_home_odds = st.number_input(f"{s2_home_team} 让球胜", value=1.80, min_value=1.01, step=0.01, key="s2_hdp_home")
-            with col_hdp2:
-                s2_hdp_away_odds = st.number_input(f"{s2_away_team} 让球胜", value=2.05, min_value=1.01, step=0.01, key="s2_hdp_away")
-            
-            st.markdown('</div>', unsafe_allow_html=True)
-        
-        # 分隔符
-        st.markdown("---")
-        
-        # 第二场比赛：主比赛的总进球选项
-        st.write("### ⚽ 主比赛总进球选项")
-        st.info(f"**注意**: 总进球比赛与主比赛为同一场: {home_team} vs {away_team}")
-        
-        # 显示主比赛信息卡
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # 总进球选项
+    st.write("##### 选择总进球选项 (0-2球)")
+    total_labels = [f"0球 (无进球)", f"1球 (总进球=1)", f"2球 (总进球=2)"]
+    
+    default_odds = {"0球": 7.20, "1球": 3.55, "2球": 3.00}
+    
+    goal_odds = {}
+    for i, g in enumerate(S2_TOTALS):
+        col_check, col_odd = st.columns([3, 1])
+        with col_check: 
+            is_on = st.checkbox(total_labels[i], key=f"s2_{g}", value=(g != "0球"))
+        with col_odd: 
+            seed_state(f"s2_od_{g}", default_odds[g])
+            g_odd = st.number_input(f"赔率", key=f"s2_od_{g}", 
+                                  label_visibility="collapsed", min_value=1.01, step=0.1) if is_on else 0.0
+        if is_on: 
+            goal_odds[g] = g_odd
+    odds_history.record_changes(f"{home_team} vs {away_team}",
+                                {c: st.session_state[f"s2_od_{g}"] for c, g in zip(S2_TOTAL_COLUMNS, S2_TOTALS)
+                                 if f"s2_od_{g}" in st.session_state})
+    
+    # 2串1复式投注设置
+    st.write("##### 🎯 2串1复式投注设置")
+    
+    # 每注金额
+    parlay_stake = st.number_input("每注2串1投入金额 ($)", value=strategy.defaults({})["parlay_stake"], min_value=0.0,
+                                   step=10.0, key="parlay_stake")
+    
+    if goal_odds and "s2_odds" in fields:
+        strong = fields["s2_odds"][S2_RESULTS.index(fields["s2_selection"])]
+        # 显示复式投注详情
         st.markdown(f"""
-        <div class="match-info">
-            <div style="display: flex; justify-content: space-between; align-items: center;">
-                <div style="font-size: 16px; font-weight: bold;">
-                    {home_team} <span style="color: #666; font-weight: normal;">vs</span> {away_team}
-                </div>
-                <div style="font-size: 12px; color: #666;">
-                    {league} · 大球赔率: {o25_odds}
-                </div>
-            </div>
+        <div class="strategy-note">
+        📊 <strong>2串1复式投注详情</strong><br>
+        1. 稳胆比赛: {fields['s2_home_team']} vs {fields['s2_away_team']} ({fields['s2_selection']}, 赔率: {strong})<br>
+        2. 总进球比赛: {home_team} vs {away_team}<br>
+        3. 选择 {len(goal_odds)} 个总进球选项，共 {len(goal_odds)} 注2串1<br>
+        4. 每注金额: ${parlay_stake:.2f}<br>
+        5. 2串1总投入: ${parlay_stake * len(goal_odds):.2f}<br>
+        6. 组合赔率 = 稳胆赔率 × 总进球赔率
         </div>
         """, unsafe_allow_html=True)
-        
-        # 总进球选项
-        st.write("##### 选择总进球选项 (0-2球)")
-        totals = ["0球", "1球", "2球"]
-        total_labels = [f"0球 (无进球)", f"1球 (总进球=1)", f"2球 (总进球=2)"]
-        
-        default_odds = {"0球": 7.20, "1球": 3.55, "2球": 3.00}
-        
-        selected_goals = []
-        for i, g in enumerate(totals):
-            col_check, col_odd = st.columns([3, 1])
-            with col_check: 
-                is_on = st.checkbox(total_labels[i], key=f"s2_{g}", value=(g != "0球"))
-            with col_odd: 
-                g_odd = st.number_input(f"赔率", value=default_odds[g], key=f"s2_od_{g}", 
-                                      label_visibility="collapsed", min_value=1.01, step=0.1) if is_on else 0.0
-            if is_on: 
-                selected_goals.append({"goal": g, "odds": g_odd})
-        
-        # 2串1复式投注设置
-        st.write("##### 🎯 2串1复式投注设置")
-        
-        # 每注金额
-        per_parlay_stake = st.number_input("每注2串1投入金额 ($)", value=50.0, min_value=0.0, step=10.0, key="parlay_stake")
-        
-        if selected_goals:
-            # 计算总注数
-            total_parlays = len(selected_goals)
-            total_parlay_cost = per_parlay_stake * total_parlays
-            
-            # 显示复式投注详情
-            st.markdown(f"""
-            <div class="strategy-note">
-            📊 <strong>2串1复式投注详情</strong><br>
-            1. 稳胆比赛: {s2_home_team} vs {s2_away_team} ({s2_selection}, 赔率: {strong_win})<br>
-            2. 总进球比赛: {home_team} vs {away_team}<br>
-            3. 选择 {len(selected_goals)} 个总进球选项，共 {total_parlays} 注2串1<br>
-            4. 每注金额: ${per_parlay_stake:.2f}<br>
-            5. 2串1总投入: ${total_parlay_cost:.2f}<br>
-            6. 组合赔率 = 稳胆赔率 × 总进球赔率
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # 创建2串1投注
-            for goal_item in selected_goals:
-                combined_odd = round(goal_item['odds'] * strong_win, 2)
-                parlay_bets.append({
-                    "goal": goal_item['goal'],
-                    "parlay_odds": combined_odd,
-                    "stake": per_parlay_stake,
-                    "description": f"2串1: {s2_selection} × {goal_item['goal']}",
-                    "components": {
-                        "strong_win": {
-                            "match": f"{s2_home_team} vs {s2_away_team}",
-                            "selection": s2_selection,
-                            "odds": strong_win
-                        },
-                        "total_goals": {
-                            "match": f"{home_team} vs {away_team}",
-                            "selection": goal_item['goal'],
-                            "odds": goal_item['odds']
-                        }
-                    }
-                })
-        
-        # 单独大球投注
-        st.write("##### ⚽ 单独大球投注")
-        st.info(f"单独投注 {home_team} vs {away_team} 大球(3球+)，赔率: {o25_odds}")
-        
-        # 计算总投入
-        total_cost = total_parlay_cost + o25_stake
-        
-        # 显示投入统计
-        col_cost1, col_cost2, col_cost3 = st.columns(3)
-        with col_cost1:
-            st.metric("💰 大球投入", f"${o25_stake:.2f}")
-        with col_cost2:
-            st.metric("💰 2串1总投入", f"${total_parlay_cost:.2f}")
-        with col_cost3:
-            st.metric("💰 方案总投入", f"${total_cost:.2f}")
-
-    with col_out:
-        st.write("### 📊 模拟盈亏校验 (2串1复式流)")
-        
-        # 根据您的说明，盈利情况只有两种：
-        # 1. 曼城比赛直接出大球（3球+）→ 大球赢，2串1全输
-        # 2. 曼城比赛打出总进球1或2球 + 利物浦胜 → 对应的2串1赢，其他2串1输，大球输
-        
-        # 不能盈利的情况：
-        # 1. 曼城比赛出现0球（没投注0球）→ 2串1全输，大球输
-        # 2. 利物浦比赛出现平局或负（没投注平/负）→ 2串1全输，大球只有曼城大球才赢
-        
-        # 计算各种情况的收益
-        res_list = []
-        
-        # 获取投注的总进球选项
-        bet_goals = [bet["goal"] for bet in parlay_bets]
-        
-        # 情况1: 稳胆赢(利物浦胜) + 主比赛0球
-        # 2串1全输（因为没投注0球），大球输
-        if "0球" not in bet_goals:
-            income = 0
-            net_profit = income - total_cost
-            res_list.append({
-                "模拟赛果": f"① 稳胆赢 + 主比赛0球\n(2串1全输，大球输)",
-                "净盈亏": round(net_profit, 2),
-                "类型": "全输",
-                "稳胆结果": "赢",
-                "主比赛结果": "0球"
-            })
-        
-        # 情况2: 稳胆赢 + 主比赛1球
-        if "1球" in bet_goals:
-            # 找到对应的2串1投注
-            parlay_1goal = next(bet for bet in parlay_bets if bet["goal"] == "1球")
-            # 只有这个2串1赢，其他2串1输，大球输
-            income = parlay_1goal["stake"] * parlay_1goal["parlay_odds"]
-            net_profit = income - total_cost
-            res_list.append({
-                "模拟赛果": f"② 稳胆赢 + 主比赛1球\n(1球2串1赢，其他输，大球输)",
-                "净盈亏": round(net_profit, 2),
-                "类型": "部分赢",
-                "稳胆结果": "赢",
-                "主比赛结果": "1球"
-            })
-        else:
-            # 如果没投注1球，则全输
-            income = 0
-            net_profit = income - total_cost
-            res_list.append({
-                "模拟赛果": f"② 稳胆赢 + 主比赛1球\n(未投注1球，全输)",
-                "净盈亏": round(net_profit, 2),
-                "类型": "全输",
-                "稳胆结果": "赢",
-                "主比赛结果": "1球"
-            })
-        
-        # 情况3: 稳胆赢 + 主比赛2球
-        if "2球" in bet_goals:
-            # 找到对应的2串1投注
-            parlay_2goal = next(bet for bet in parlay_bets if bet["goal"] == "2球")
-            # 只有这个2串1赢，其他2串1输，大球输
-            income = parlay_2goal["stake"] * parlay_2goal["parlay_odds"]
-            net_profit = income - total_cost
-            res_list.append({
-                "模拟赛果": f"③ 稳胆赢 + 主比赛2球\n(2球2串1赢，其他输，大球输)",
-                "净盈亏": round(net_profit, 2),
-                "类型": "部分赢",
-                "稳胆结果": "赢",
-                "主比赛结果": "2球"
-            })
+    return {"goal_odds": goal_odds, "parlay_stake": parlay_stake}
+
+# (字段组, 编辑器)：策略的 schema 含有整组字段时用该编辑器
+FIELD_EDITORS = [
+    (("score_bets",), score_market_editor),
+    (("s2_home_team", "s2_away_team", "s2_league", "s2_selection", "s2_odds"), strong_leg_editor),
+    (("goal_odds", "parlay_stake"), goal_parlay_editor),
+]
+
+def schema_widget(strategy, name, kind, default, label):
+    """没有专门编辑器的 schema 字段：数值、文本直接输入，列表/字典按 JSON 填写"""
+    key = f"field_{strategy.name}_{name}"
+    if kind is float:
+        return st.number_input(label, value=float(default), step=1.0, key=key)
+    if kind is str:
+        return st.text_input(label, value=default, key=key)
+    text = st.text_input(f"{label} (JSON)", value=json.dumps(default, ensure_ascii=False), key=key)
+    try:
+        value = json.loads(text)
+    except ValueError:
+        value = None
+    if not isinstance(value, kind):
+        st.warning(f"⚠️ {label} 不是有效的 JSON {kind.__name__}，按默认值计算")
+        return default
+    return value
+
+def strategy_inputs(strategy):
+    """按 strategy.schema 生成输入组件，返回比赛字典里该策略自己的字段"""
+    names = {name for name, *_ in strategy.schema}
+    fields = {}
+    for name, kind, default, label in strategy.schema:
+        if name in fields:
+            continue
+        editor = next((e for group, e in FIELD_EDITORS if name in group and names.issuperset(group)), None)
+        if editor is not None:
+            fields.update(editor(strategy, fields))
         else:
-            # 如果没投注2球，则全输
-            income = 0
-            net_profit = income - total_cost
-            res_list.append({
-                "模拟赛果": f"③ 稳胆赢 + 主比赛2球\n(未投注2球，全输)",
-                "净盈亏": round(net_profit, 2),
-                "类型": "全输",
-                "稳胆结果": "赢",
-                "主比赛结果": "2球"
-            })
-        
-        # 情况4: 稳胆赢 + 主比赛3球+
-        # 2串1全输（因为投的是0/1/2球），大球赢
-        income = o25_stake * o25_odds
-        net_profit = income - total_cost
-        res_list.append({
-            "模拟赛果": f"④ 稳胆赢 + 主比赛3球+\n(2串1全输，大球赢)",
-            "净盈亏": round(net_profit, 2),
-            "类型": "部分赢",
-            "稳胆结果": "赢",
-            "主比赛结果": "3球+"
-        })
-        
-        # 情况5: 稳胆平 + 主比赛0/1/2球
-        # 2串1全输（因为稳胆没赢），大球输
-        income = 0
-        net_profit = income - total_cost
-        res_list.append({
-            "模拟赛果": f"⑤ 稳胆平 + 主比赛0/1/2球\n(2串1全输，大球输)",
-            "净盈亏": round(net_profit, 2),
-            "类型": "全输",
-            "稳胆结果": "平",
-            "主比赛结果": "0/1/2球"
-        })
-        
-        # 情况6: 稳胆平 + 主比赛3球+
-        # 2串1全输，大球赢
-        income = o25_stake * o25_odds
-        net_profit = income - total_cost
-        res_list.append({
-            "模拟赛果": f"⑥ 稳胆平 + 主比赛3球+\n(2串1全输，大球赢)",
-            "净盈亏": round(net_profit, 2),
-            "类型": "部分赢",
-            "稳胆结果": "平",
-            "主比赛结果": "3球+"
-        })
-        
-        # 情况7: 稳胆负 + 主比赛0/1/2球
-        # 2串1全输，大球输
-        income = 0
-        net_profit = income - total_cost
-        res_list.append({
-            "模拟赛果": f"⑦ 稳胆负 + 主比赛0/1/2球\n(2串1全输，大球输)",
-            "净盈亏": round(net_profit, 2),
-            "类型": "全输",
-            "稳胆结果": "负",
-            "主比赛结果": "0/1/2球"
-        })
-        
-        # 情况8: 稳胆负 + 主比赛3球+
-        # 2串1全输，大球赢
-        income = o25_stake * o25_odds
-        net_profit = income - total_cost
-        res_list.append({
-            "模拟赛果": f"⑧ 稳胆负 + 主比赛3球+\n(2串1全输，大球赢)",
-            "净盈亏": round(net_profit, 2),
-            "类型": "部分赢",
-            "稳胆结果": "负",
-            "主比赛结果": "3球+"
-        })
-        
-        df_s2 = pd.DataFrame(res_list)
-        
-        # 创建图表
-        chart_data = df_s2.set_index("模拟赛果")["净盈亏"]
-        st.bar_chart(chart_data)
-        
-        # 显示详细表格
-        st.write("##### 📋 详细盈亏表")
-        st.dataframe(df_s2[["模拟赛果", "净盈亏", "类型"]], use_container_width=True, hide_index=True)
-        
-        # 显示2串1投注详情
-        st.write("##### 🎯 2串1投注组合详情")
-        if parlay_bets:
-            bet_details = []
-            for i, bet in enumerate(parlay_bets):
-                bet_details.append({
-                    "注号": f"第{i+1}注",
-                    "稳胆比赛": f"{s2_home_team} vs {s2_away_team}",
-                    "稳胆选项": s2_selection,
-                    "稳胆赔率": strong_win,
-                    "总进球比赛": f"{home_team} vs {away_team}",
-                    "总进球选项": bet["goal"],
-                    "总进球赔率": bet["components"]["total_goals"]["odds"],
-                    "2串1赔率": bet["parlay_odds"],
-                    "投入金额": f"${bet['stake']:.2f}",
-                    "潜在回报": f"${bet['stake'] * bet['parlay_odds']:.2f}"
-                })
-            
-            bet_details.append({
-                "注号": "单独大球",
-                "稳胆比赛": "-",
-                "稳胆选项": "-",
-                "稳胆赔率": "-",
-                "总进球比赛": f"{home_team} vs {away_team}",
-                "总进球选项": "3球+",
-                "总进球赔率": o25_odds,
-                "2串1赔率": "-",
-                "投入金额": f"${o25_stake:.2f}",
-                "潜在回报": f"${o25_stake * o25_odds:.2f}"
-            })
-            
-            bet_df = pd.DataFrame(bet_details)
-            st.dataframe(bet_df, use_container_width=True, hide_index=True)
+            fields[name] = schema_widget(strategy, name, kind, default, label)
+    return fields
+
+st.divider()
+col_in, col_out = st.columns([1.6, 2], gap="large")
+
+strategy = get_strategy(mode)
+with col_in:
+    st.markdown(f'<div class="strategy-note">🎯 <strong>策略说明</strong>：{strategy.__doc__}</div>',
+                unsafe_allow_html=True)
+    strategy_fields = strategy_inputs(strategy)
+    
+    # 当前比赛的投注参数（主客进球占比在评级/进球模型之后补上，见 current_fixture）
+    strategy_fixture = {
+        "league": league,
+        "date": match_date.strftime('%Y-%m-%d'),
+        "time": match_time.strftime('%H:%M'),
+        "home_team": home_team,
+        "away_team": away_team,
+        "strategy": mode,
+        "pred_prob": pred_prob,
+        "o25_odds": o25_odds,
+        "o25_stake": o25_stake,
+        **strategy_fields,
+    }
+    # 注单与金额取自策略的收益矩阵，大球项以外都算对冲/组合投入
+    strategy_bets, _ = fixture_payoff(strategy_fixture)
+    total_cost = sum(b["stake"] for b in strategy_bets)
+    
+    # 显示投入统计
+    col_cost1, col_cost2, col_cost3 = st.columns(3)
+    with col_cost1:
+        st.metric("💰 大球投入", f"${o25_stake:.2f}")
+    with col_cost2:
+        st.metric("💰 对冲/组合投入", f"${total_cost - o25_stake:.2f}")
+    with col_cost3:
+        st.metric("💰 方案总投入", f"${total_cost:.2f}")
+    # 关联腿（另一场比赛的胜平负）：评级/进球模型、多庄家比价、对冲都按它取那场比赛
+    strategy_legs = strategy.leg_results(strategy.defaults(strategy_fixture))
+    leg_match = None if strategy_legs is None else strategy_legs[0]
+
 
 # --- 5. EV计算 ---
+def results_source():
+    """赛果数据的缓存键和读取函数（上传文件按内容指纹，本地文件按路径+修改时间）"""
+    if elo_file is not None:
+        return fingerprint(elo_file.getvalue()), lambda: pd.read_csv(elo_file)
+    path = os.path.abspath(elo_path)
+    return (path, os.path.getmtime(path)), lambda: pd.read_csv(path)
+
+rating_engine = None
+goal_model = None
+source_key, read_results = None, None
+if show_ratings:
+    from goal_model import GoalModelCache, fit_from_frame
+    from ratings import engine_from_frame
+    try:
+        # 同一份数据 + 联赛所有会话只算一次
+        source_key, read_results = results_source()
+        rating_engine = shared.get("elo", (source_key, league), lambda: engine_from_frame(read_results(), league))
+        if fit_goals:
+            goal_model = shared.get(
+                "league_goal_model", (source_key, league, match_date, goal_half_life, goal_cache_dir),
+                lambda: fit_from_frame(read_results(), league, match_date, float(goal_half_life),
+                                       GoalModelCache(goal_cache_dir)))
+    except (OSError, ValueError, KeyError) as e:
+        st.warning(f"⚠️ 无法建立评级模型: {e}")
+
+# 主客进球占比优先取联赛进球模型，其次历史交锋，都没有时各占一半（与预计算补齐赛程的规则相同）
+goal_pred = None if goal_model is None else goal_model.predict(home_team, away_team)
+home_share = home_share_from(goal_pred, shrunk_stats, stats if 'stats' in locals() else None)
+flow.set(home_share=home_share)
+
+# --- 整场分析（页面与开赛前预计算共用） ---
+# 缓存键 = 规范化比赛的指纹 + 数据来源；页面和赛程都经 analysis_fixture 规范化，
+# 后台预计算过的比赛，页面打开时直接命中共享层。
+analysis_context = (source_key, priors_path if league_priors_table is not None else None,
+                    None if goal_model is None else (goal_model.league, goal_model.as_of))
+
+def build_analysis(fixture, source_key=source_key, read_results=read_results, priors=league_priors_table,
+                   goal_model=goal_model):
+    """一场比赛的赛前分析；数据来源按默认参数绑定，后台线程在之后的重跑里调用也不受影响"""
+    results = None if read_results is None else shared.get("results_frame", source_key, read_results)
+    return analyse_fixture(fixture, shared, results, priors, goal_model)
+
+def fixture_analysis(fixture):
+    fixture = analysis_fixture(fixture, goal_model)
+    return shared.get(ANALYSIS_KIND, analysis_key(fixture, analysis_context), lambda: build_analysis(fixture))
+
+@st.cache_resource
+def precompute_scheduler():
+    """进程级开赛前预计算调度器（所有会话共用）"""
+    return PrecomputeScheduler(shared)
+
+precompute = precompute_scheduler()
+
+# 当前比赛的投注参数（EV、破产概率、报告、组合盈亏分布共用，按策略注册表统一计算）
+current_fixture = dict(strategy_fixture, home_share=home_share)
+flow.set(fixture=current_fixture)
+
+with col_out:
+    st.write("### 📊 模拟盈亏校验 (按净盈亏合并的结果)")
+    
+    outcome_df = flow.get("outcome_table")
+    
+    # 创建图表
+    chart_data = outcome_df.set_index("模拟赛果")["净盈亏"]
+    st.bar_chart(chart_data)
+    
+    # 显示详细表格
+    st.write("##### 📋 详细盈亏表")
+    st.dataframe(outcome_df.assign(概率=np.round(outcome_df["概率"] * 100, 2)).rename(columns={"概率": "概率%"}),
+                 use_container_width=True, hide_index=True)
+    
+    # 显示注单详情
+    st.write("##### 🎯 注单详情")
+    st.dataframe(pd.DataFrame([{
+        "注单": b["label"], "赔率": b["odds"], "投入金额": f"${b['stake']:.2f}",
+        "潜在回报": f"${b['stake'] * b['odds']:.2f}",
+    } for b in strategy_bets]), use_container_width=True, hide_index=True)
+
 st.divider()
 st.header("📉 数学期望分析")
 
 # 计算EV
-if mode == "策略 1：比分精准流":
-    current_df = df_s1
-    # 策略1：3球+概率 = pred_prob，每个具体比分平分剩余概率
-    prob_per_score = (1 - pred_prob) / 6 if 6 > 0 else 0
-    
-    ev = 0
-    for _, row in current_df.iterrows():
-        if "3球或以上" in row["模拟赛果"]:
-            ev += row["净盈亏"] * pred_prob
-        else:
-            ev += row["净盈亏"] * prob_per_score
-else:
-    # 策略2的EV计算
-    # 需要稳胆比赛的概率分布
-    # 假设：胜率 = 1/强胜赔率，平率 = 1/平赔率，负率 = 1/负赔率，然后归一化
-    win_prob_raw = 1 / s2_win_odds
-    draw_prob_raw = 1 / s2_draw_odds
-    lose_prob_raw = 1 / s2_lose_odds
-    
-    total_raw = win_prob_raw + draw_prob_raw + lose_prob_raw
-    win_prob = win_prob_raw / total_raw
-    draw_prob = draw_prob_raw / total_raw
-    lose_prob = lose_prob_raw / total_raw
-    
-    # 主比赛的概率分布
-    # 基于用户预测的大球概率，分配0/1/2球的概率
-    # 简单分配：0球:30%，1球:40%，2球:30% 的剩余概率
-    small_ball_prob = 1 - pred_prob
-    goal_0_prob = small_ball_prob * 0.3
-    goal_1_prob = small_ball_prob * 0.4
-    goal_2_prob = small_ball_prob * 0.3
-    goal_3plus_prob = pred_prob
-    
-    # 计算EV
-    ev = 0
-    for _, row in df_s2.iterrows():
-        scenario = row["模拟赛果"]
-        net_profit = row["净盈亏"]
-        
-        # 提取场景信息
-        if "稳胆赢" in scenario:
-            strong_result_prob = win_prob
-        elif "稳胆平" in scenario:
-            strong_result_prob = draw_prob
-        elif "稳胆负" in scenario:
-            strong_result_prob = lose_prob
-        else:
-            strong_result_prob = 0
-        
-        # 提取主比赛结果
-        if "主比赛0球" in scenario:
-            main_prob = goal_0_prob
-        elif "主比赛1球" in scenario:
-            main_prob = goal_1_prob
-        elif "主比赛2球" in scenario:
-            main_prob = goal_2_prob
-        elif "主比赛3球+" in scenario:
-            main_prob = goal_3plus_prob
-        elif "主比赛0/1/2球" in scenario:
-            # 这是三种情况的组合
-            main_prob = goal_0_prob + goal_1_prob + goal_2_prob
-        else:
-            main_prob = 0
-        
-        # 计算联合概率
-        joint_prob = strong_result_prob * main_prob
-        ev += net_profit * joint_prob
+analysis = fixture_analysis(current_fixture)
+ev = analysis["ev"]
+flow.set(ev=ev)
+simple_ev = flow.get("simple_ev")
+hedge_effect = flow.get("hedge_effect")
 
 # 显示EV
 col1, col2, col3 = st.columns(3)
@@ -1015,7 +1126,6 @@ with col1:
 
 with col2:
     # 简单大球投注的EV
-    simple_ev = (pred_prob * o25_odds - 1) * o25_stake
     st.metric("单纯大球投注EV", f"${simple_ev:.2f}")
     simple_roi = simple_ev / o25_stake * 100
     if simple_ev > 0:
@@ -1024,8 +1134,7 @@ with col2:
         st.warning(f"单纯投注亏损率: {abs(simple_roi):.1f}%")
 
 with col3:
-    # 计算对冲效果
-    hedge_effect = (abs(ev) - abs(simple_ev)) / abs(simple_ev) * 100 if simple_ev != 0 else 0
+    # 对冲效果
     st.metric("对冲效果", f"{hedge_effect:.1f}%")
     if hedge_effect < 0:
         st.success("✅ 对冲降低了风险")
@@ -1034,22 +1143,28 @@ with col3:
 
 # EV解释
 st.write("##### 💭 策略分析")
-if mode == "策略 2：总进球复式流":
-    # 显示稳胆比赛概率
-    st.markdown(f"""
-    <div class="strategy-note">
-    🎲 <strong>策略2概率假设</strong><br>
-    1. 稳胆比赛 ({s2_home_team} vs {s2_away_team}) 概率分布:<br>
-       &nbsp;&nbsp;- {s2_home_team}胜: {win_prob*100:.1f}%<br>
-       &nbsp;&nbsp;- 平局: {draw_prob*100:.1f}%<br>
-       &nbsp;&nbsp;- {s2_away_team}胜: {lose_prob*100:.1f}%<br>
-    2. 主比赛 ({home_team} vs {away_team}) 进球分布:<br>
-       &nbsp;&nbsp;- 0球: {goal_0_prob*100:.1f}%<br>
-       &nbsp;&nbsp;- 1球: {goal_1_prob*100:.1f}%<br>
-       &nbsp;&nbsp;- 2球: {goal_2_prob*100:.1f}%<br>
-       &nbsp;&nbsp;- 3球+: {goal_3plus_prob*100:.1f}%
-    </div>
-    """, unsafe_allow_html=True)
+# 概率假设：结果空间 = 关联腿状态 × 主比赛比分网格，任何策略都一样
+state_names, state_probs = strategy.states(strategy.defaults(current_fixture))
+goal_probs = total_goal_probs(current_fixture)
+assumption_lines = [
+    f"总进球率由大球概率 {pred_prob*100:.0f}% 反解，按主队进球占比 {home_share*100:.0f}% 拆成主客两队的 Poisson 分布，"
+    "每个结果（含「其他」项覆盖的比分）按该比分网格的概率计入期望。"
+]
+if strategy_legs is not None:
+    leg_home, leg_away = leg_match
+    leg_probs = state_probs @ strategy_legs[1]
+    assumption_lines.append(f"关联比赛 ({leg_home} vs {leg_away}) 概率分布: {leg_home}胜 {leg_probs[0]*100:.1f}% · "
+                            f"平局 {leg_probs[1]*100:.1f}% · {leg_away}胜 {leg_probs[2]*100:.1f}%")
+elif len(state_names) > 1:
+    assumption_lines.append("关联腿: " + " · ".join(f"{s} {p*100:.1f}%" for s, p in zip(state_names, state_probs)))
+assumption_lines.append(f"主比赛 ({home_team} vs {away_team}) 进球分布: " + " · ".join(
+    f"{g} {p*100:.1f}%" for g, p in zip(S2_TOTALS + ["3球+"], goal_probs)))
+st.markdown(f"""
+<div class="strategy-note">
+🎲 <strong>概率假设</strong><br>
+{"<br>".join(assumption_lines)}
+</div>
+""", unsafe_allow_html=True)
 
 if ev > simple_ev:
     st.success(f"**策略优化成功** | 比单纯投注多赚 ${ev - simple_ev:.2f} 每注")
@@ -1058,6 +1173,416 @@ elif ev > 0 and ev <= simple_ev:
 else:
     st.error(f"**策略需要调整** | 当前策略负期望值")
 
+with st.expander("🧾 每注期望（注单 × 结果收益矩阵）"):
+    st.dataframe(analysis["bets"], use_container_width=True, hide_index=True)
+    # 交锋统计与EV同属一份整场分析（预计算过的比赛不再重算）
+    pre_history = analysis.get("history")
+    if pre_history is not None:
+        st.caption(f"赛果数据中的交锋 {pre_history['total_matches']} 场（时间衰减）：大球 {pre_history['over_25_rate']:.1f}% · "
+                   f"场均进球 {pre_history['avg_goals']:.2f} · 主胜/平/客胜 {pre_history['home_win_rate']:.0f}/"
+                   f"{pre_history['draw_rate']:.0f}/{pre_history['away_win_rate']:.0f}%"
+                   + (f" · 已向「{pre_history['prior_league']}」先验收缩（先验权重 {float(pre_history['prior_weight']):.2f}）"
+                      if "prior_weight" in pre_history else ""))
+
+def model_ev(over_prob, model, share):
+    """按模型给出的大球概率和主客进球占比（有关联比赛时再加上模型对那场的胜平负）重算当前策略的EV"""
+    leg_pred = None if leg_match is None else model.predict(*leg_match)
+    result_probs = None if leg_pred is None else [leg_pred["home_win"], leg_pred["draw"], leg_pred["away_win"]]
+    return fixture_ev(dict(current_fixture, pred_prob=over_prob, home_share=share, leg_result_probs=result_probs))
+
+# 评级模型：用 Elo 评级差换算的胜平负与预期进球重新计算EV
+if rating_engine is not None:
+    st.write("##### 📈 评级模型 (Elo)")
+    st.caption(f"{rating_engine.league or '全部联赛'} · {rating_engine.n_matches}场赛果 · "
+               f"{len(rating_engine.teams)}支球队")
+    rating_pred = rating_engine.predict(home_team, away_team)
+    if rating_pred is None:
+        st.info(f"评级数据中找不到 {home_team} 或 {away_team}")
+    else:
+        from ratings import over_25_probability
+        rating_over = over_25_probability(rating_pred["exp_home_goals"], rating_pred["exp_away_goals"])
+        rating_ev = model_ev(rating_over, rating_engine,
+                             rating_pred["exp_home_goals"] / (rating_pred["exp_home_goals"] + rating_pred["exp_away_goals"]))
+        col_r1, col_r2, col_r3, col_r4 = st.columns(4)
+        with col_r1:
+            st.metric("评级", f"{rating_pred['home_rating']:.0f} : {rating_pred['away_rating']:.0f}")
+        with col_r2:
+            st.metric("主胜 / 平 / 客胜", f"{rating_pred['home_win']*100:.0f}% / {rating_pred['draw']*100:.0f}% / "
+                                         f"{rating_pred['away_win']*100:.0f}%")
+        with col_r3:
+            st.metric("预期进球", f"{rating_pred['exp_home_goals']:.2f} - {rating_pred['exp_away_goals']:.2f}",
+                      delta=f"大球 {rating_over*100:.1f}%（你的预测 {pred_prob*100:.0f}%）", delta_color="off")
+        with col_r4:
+            st.metric("评级模型EV", f"${rating_ev:.2f}", delta=f"{rating_ev - ev:+.2f} vs 当前", delta_color="off")
+    with st.expander("🏅 评级榜"):
+        st.dataframe(rating_engine.table(top=30), use_container_width=True, hide_index=True)
+
+# 联赛进球模型：整季赛果拟合的进攻/防守参数，比几场交锋的场均进球稳定得多
+if goal_model is not None:
+    st.write("##### ⚽ 联赛进球模型 (Dixon–Coles)")
+    fit_info = goal_model.info
+    st.caption(f"{goal_model.league} · 截至 {goal_model.as_of} · 主场优势 ×{np.exp(goal_model.home):.2f} · "
+               f"ρ = {goal_model.rho:.3f} · " +
+               ("读取缓存参数" if fit_info.get("cached") else
+                f"{fit_info['matches']}场 · {fit_info['iterations']}次迭代 · {fit_info['seconds']*1000:.0f} ms"
+                + ("（热启动）" if fit_info["warm_start"] else "")))
+    if goal_pred is None:
+        st.info(f"进球模型中找不到 {home_team} 或 {away_team}")
+    else:
+        goal_ev = model_ev(goal_pred["over_25"], goal_model, home_share)
+        col_g1, col_g2, col_g3, col_g4 = st.columns(4)
+        with col_g1:
+            st.metric("预期进球", f"{goal_pred['exp_home_goals']:.2f} - {goal_pred['exp_away_goals']:.2f}")
+        with col_g2:
+            st.metric("主胜 / 平 / 客胜", f"{goal_pred['home_win']*100:.0f}% / {goal_pred['draw']*100:.0f}% / "
+                                         f"{goal_pred['away_win']*100:.0f}%")
+        with col_g3:
+            st.metric("大球概率", f"{goal_pred['over_25']*100:.1f}%",
+                      delta=f"你的预测 {pred_prob*100:.0f}%", delta_color="off")
+        with col_g4:
+            st.metric("进球模型EV", f"${goal_ev:.2f}", delta=f"{goal_ev - ev:+.2f} vs 当前", delta_color="off")
+    with st.expander("🧮 球队进攻/防守参数"):
+        st.dataframe(goal_model.table(top=30), use_container_width=True, hide_index=True)
+
+def run_season_simulation(season_start, n_seasons, workers, tie_breakers):
+    """本赛季已赛场次按实际比分、剩余双循环场次按联赛进球模型的比分矩阵，批量模拟整季积分榜"""
+    from season import position_table, season_inputs, simulate_season
+    df = read_results()
+    if "league" in df.columns:
+        df = df[df["league"] == goal_model.league]
+    days = pd.to_datetime(df["date"], dayfirst=True, errors="coerce")
+    played = df[(days >= pd.Timestamp(season_start)) & (days < pd.Timestamp(match_date))]
+    played = played.dropna(subset=["home_goals", "away_goals"])
+    if played.empty:
+        raise ValueError("赛季开始日期之后没有赛果")
+    inputs = season_inputs(played, goal_model.score_matrix)
+    result = simulate_season(inputs, n_seasons, tie_breakers, workers)
+    return {"table": position_table(inputs, result), "seconds": result["seconds"],
+            "played": len(played), "remaining": len(inputs["home"])}
+
+# --- 5.0 赛季模拟（冠军/前四/降级等长线盘口） ---
+if goal_model is not None:
+    with st.expander("🏆 赛季模拟（冠军 / 前四 / 降级概率）"):
+        # 进球模型按全部联赛拟合（赛果CSV里没有所选联赛）时，无法确定该联赛的赛程与球队
+        if goal_model.league != league:
+            st.info(f"赛果数据中没有「{league}」的赛果，赛季模拟需要按单个联赛拟合的进球模型")
+        elif section_enabled("运行赛季模拟", "show_season"):
+            from season import DEFAULT_TIE_BREAKERS, TIE_BREAKER_LABELS, TIE_BREAKERS
+            season_rules = TIE_BREAKERS.get(league, DEFAULT_TIE_BREAKERS)
+            col_season1, col_season2, col_season3 = st.columns(3)
+            with col_season1:
+                season_start = st.date_input("赛季开始日期", key="season_start",
+                                             value=match_date.replace(year=match_date.year - (match_date.month < 7),
+                                                                      month=8, day=1))
+            with col_season2:
+                season_n = st.number_input("模拟赛季数", value=20000, min_value=1000, step=10000, key="season_n")
+            with col_season3:
+                season_workers = st.number_input("进程数", value=1, min_value=1, max_value=os.cpu_count() or 1,
+                                                 key="season_workers")
+            st.caption("排名规则：积分 > " + " > ".join(TIE_BREAKER_LABELS[r] for r in season_rules) + " > 抽签")
+            try:
+                # 结果与进程数无关（每块赛季的随机流固定），同一份数据所有会话只模拟一次
+                season = shared.get("season_simulation", (source_key, goal_model.league, season_start, match_date,
+                                                          int(season_n), season_rules),
+                                    lambda: run_season_simulation(season_start, int(season_n), int(season_workers),
+                                                                  season_rules))
+                st.caption(f"已赛 {season['played']} 场 · 剩余 {season['remaining']} 场 · "
+                           f"{int(season_n)} 个赛季 · {season['seconds']:.2f} s")
+                st.dataframe(season["table"], use_container_width=True, hide_index=True)
+            except ValueError as e:
+                st.warning(f"⚠️ 无法模拟赛季: {e}")
+
+# --- 5.1 滚球实时分析 ---
+def build_inplay_model(over_prob, home_share):
+    """按赛前参数预计算滚球模型（每分钟的剩余进球分布），存放在共享层"""
+    return goal_model_for(shared, over_prob, home_share)
+
+if show_inplay:
+    st.divider()
+    st.header(f"⏱️ 滚球实时分析 · {inplay_minute}' {home_team} {inplay_home_score}-{inplay_away_score} {away_team}")
+    
+    inplay_model = build_inplay_model(round(pred_prob, 4), round(home_share, 4))
+    live_probs = inplay_model.outcome_probs(inplay_minute, inplay_home_score, inplay_away_score)
+    live_totals = live_probs["totals"][0]
+    
+    # 与滚球EV同一结果空间：关联腿状态 × 按当前比分条件化的比分网格
+    live_df = pd.DataFrame(outcome_rows(current_fixture, minute=inplay_minute, home_score=inplay_home_score,
+                                        away_score=inplay_away_score))
+    live_df["滚球概率%"] = np.round(live_df.pop("概率") * 100, 2)
+    live_ev = fixture_ev(current_fixture, minute=inplay_minute, home_score=inplay_home_score,
+                         away_score=inplay_away_score)
+    live_simple_ev = (live_totals[3] * o25_odds - 1) * o25_stake
+    
+    col_live_ev1, col_live_ev2, col_live_ev3 = st.columns(3)
+    with col_live_ev1:
+        st.metric("滚球大球概率", f"{live_totals[3]*100:.1f}%", delta=f"{(live_totals[3] - pred_prob)*100:+.1f}% vs 赛前")
+    with col_live_ev2:
+        st.metric("滚球策略EV", f"${live_ev:.2f}", delta=f"{live_ev - ev:+.2f} vs 赛前")
+    with col_live_ev3:
+        st.metric("滚球单纯大球EV", f"${live_simple_ev:.2f}", delta=f"{live_simple_ev - simple_ev:+.2f} vs 赛前")
+    
+    st.write("##### 📋 滚球盈亏与概率")
+    st.dataframe(live_df, use_container_width=True, hide_index=True)
+    st.caption(f"终场总进球分布：0球 {live_totals[0]*100:.1f}% · 1球 {live_totals[1]*100:.1f}% · "
+               f"2球 {live_totals[2]*100:.1f}% · 3球+ {live_totals[3]*100:.1f}%")
+
+# --- 5.2 比分盈亏热力图 ---
+with st.expander("🗺️ 完整比分盈亏热力图"):
+    if section_enabled("绘制热力图", "show_heatmap"):
+        from charts import fixture_score_grids, multi_fixture_scatter, score_heatmap
+        # 结果空间是 状态 × 比分网格，热力图取第一个状态（策略2即稳胆命中）
+        heat_net = analysis["net"].reshape(-1, MAX_GRID_GOALS + 1, MAX_GRID_GOALS + 1)[0]
+        if len(state_names) > 1:
+            st.caption(f"热力图为「{state_names[0]}」情形；其余状态下的盈亏见上方盈亏表。")
+        if show_inplay:
+            heat_model = build_inplay_model(round(pred_prob, 4), round(home_share, 4))
+            heat_prob = heat_model.final_score_matrix(inplay_minute, inplay_home_score, inplay_away_score, MAX_GRID_GOALS)[0]
+        else:
+            heat_prob = analysis["score_matrix"]
+    
+        # 图对象缓存在会话中，只改投注金额/赔率时原地更新数据
+        heat_cache = session_space.setdefault("score_heatmap_cache", {})
+        st.plotly_chart(score_heatmap(heat_cache, heat_net, heat_prob, home_team, away_team),
+                        use_container_width=True, key="score_heatmap")
+    
+        heat_fixtures = st.session_state.get("matchday_fixtures", [])
+        if heat_fixtures:
+            st.write(f"##### 📦 比赛日全部比分（{len(heat_fixtures)} 场，WebGL）")
+            heat_grids = [fixture_score_grids(f, lambda p: build_inplay_model(round(p, 4), 0.5), MAX_GRID_GOALS)
+                          for f in heat_fixtures]
+            st.plotly_chart(multi_fixture_scatter(
+                [f"{f['home_team']} vs {f['away_team']}" for f in heat_fixtures],
+                [g[0] for g in heat_grids], [g[1] for g in heat_grids],
+            ), use_container_width=True, key="multi_fixture_heatmap")
+
+# --- 5.3 半全场盘口 ---
+with st.expander("🕐 半全场 (HT/FT) 盘口"):
+    htft_hist = flow.get("htft_stats") if history_data else None
+    # 上半场进球占比优先取历史交锋的半场数据
+    first_half_share = htft_hist["first_half_share"] if htft_hist else DEFAULT_FIRST_HALF_SHARE
+    st.caption(f"按 (半场比分, 全场比分) 联合网格计算；上半场进球占比 {first_half_share * 100:.0f}%"
+               f"{'（来自历史交锋）' if htft_hist else '（默认值）'}")
+    htft_table = st.data_editor(
+        pd.DataFrame({"半全场": HTFT_OUTCOMES, "赔率": [4.5, 15.0, 26.0, 6.0, 5.0, 6.0, 26.0, 15.0, 4.5],
+                      "投入": [0.0] * 9}),
+        disabled=["半全场"], hide_index=True, use_container_width=True, key="htft_bets",
+    )
+    htft_bets = {r["半全场"]: (float(r["赔率"]), float(r["投入"]))
+                 for r in htft_table.to_dict("records") if r["赔率"] > 1}
+    htft_result = htft_market(htft_bets, pred_prob, home_share, first_half_share)
+    st.dataframe(pd.DataFrame(htft_result["rows"]).round(2), use_container_width=True, hide_index=True)
+    if any(stake > 0 for _, stake in htft_bets.values()):
+        col_htft1, col_htft2 = st.columns(2)
+        with col_htft1:
+            st.metric("半全场投注EV", f"${htft_result['ev']:.2f}")
+        with col_htft2:
+            st.metric("亏损概率", f"{htft_result['loss_prob'] * 100:.1f}%")
+
+# 补记本次运行的盘口赔率（与该序列最新一点相同则不追加）
+# （波胆、总进球、稳胆胜平负的赔率由对应的策略输入编辑器记录）
+odds_history.record_changes(f"{home_team} vs {away_team}", {"o25_odds": o25_odds})
+
+# --- 5.4 多庄家比价与套利扫描 ---
+if odds_book is not None:
+    with st.expander("🏦 多庄家比价与套利扫描"):
+        col_book1, col_book2 = st.columns(2)
+        with col_book1:
+            st.write(f"##### {home_team} vs {away_team}")
+            main_prices = odds_book.price_table(home_team, away_team)
+            if main_prices.empty:
+                st.info("赔率表中没有这场比赛")
+            else:
+                st.dataframe(main_prices, use_container_width=True, hide_index=True)
+        with col_book2:
+            if leg_match is not None:
+                st.write(f"##### 关联比赛：{leg_match[0]} vs {leg_match[1]}")
+                strong_prices = odds_book.price_table(*leg_match)
+                if strong_prices.empty:
+                    st.info("赔率表中没有关联比赛")
+                else:
+                    st.dataframe(strong_prices, use_container_width=True, hide_index=True)
+        
+        st.write(f"##### 🔎 全部 {len(odds_book.fixtures)} 场的套利 / 低抽水组合")
+        col_arb1, col_arb2 = st.columns(2)
+        with col_arb1:
+            arb_threshold = st.number_input("Σ1/赔率 门槛（<1 为套利）", value=1.0, min_value=0.9, max_value=1.2,
+                                            step=0.005, format="%.3f", key="book_arb_threshold")
+        with col_arb2:
+            arb_stake = st.number_input("每组总投入 ($)", value=100.0, min_value=1.0, step=10.0, key="book_arb_stake")
+        arb_table = odds_book.scan(arb_threshold, arb_stake)
+        if arb_table.empty:
+            st.info("没有低于门槛的组合")
+        else:
+            st.dataframe(arb_table, use_container_width=True, hide_index=True)
+            st.caption("各结果按最优价等回报分配，任一赛果的回报都相同；实际下注受限额、赔率变动和规则差异影响。")
+
+# --- 5.5 赔率走势与异动 ---
+with st.expander("📈 赔率走势与异动"):
+    trend_table = odds_history.summary()
+    if trend_table.empty:
+        st.info("还没有赔率记录：修改盘口赔率或在侧边栏接入实时赔率后，这里会显示走势")
+    else:
+        st.caption(f"{len(odds_history)} 条序列 · 每条保留最近 {odds_history.capacity} 点 · "
+                   f"缓冲 {format_bytes(odds_history.nbytes)}；异动 = {odds_history.steam_window:.0f} 秒内"
+                   f"隐含概率变化 ≥ {odds_history.steam_threshold * 100:.0f} 个百分点")
+        st.dataframe(trend_table, use_container_width=True, hide_index=True)
+        col_trend1, col_trend2 = st.columns([3, 1])
+        with col_trend1:
+            trend_series = st.selectbox("走势", list(zip(trend_table["比赛"], trend_table["盘口"])),
+                                        format_func=lambda s: f"{s[0]} · {s[1]}", key="trend_series")
+        with col_trend2:
+            trend_points = st.number_input("最近点数", value=100, min_value=2, max_value=odds_history.capacity,
+                                           step=10, key="trend_points")
+        trend_times, trend_odds = odds_history.latest(*trend_series, trend_points)
+        st.line_chart(pd.DataFrame({"隐含概率%": 100 / trend_odds},
+                                   index=pd.to_datetime(trend_times, unit="s")), height=220)
+        trend_alerts = odds_history.recent_alerts()
+        if trend_alerts:
+            st.write("##### ⚠️ 最近异动")
+            st.dataframe(pd.DataFrame([{
+                "时间": datetime.fromtimestamp(a["time"]).strftime("%H:%M:%S"), "比赛": a["fixture"],
+                "盘口": a["market"], "赔率": a["odds"], "变化(百分点)": round(a["change"] * 100, 2),
+                "用时(秒)": round(a["seconds"], 1),
+            } for a in trend_alerts]), use_container_width=True, hide_index=True)
+
+# --- 5.6 对冲 / 锁定 ---
+with st.expander("🛡️ 对冲 / 锁定计算（按当前赔率追加投注）"):
+    col_hedge1, col_hedge2, col_hedge3 = st.columns(3)
+    with col_hedge1:
+        hedge_market = st.selectbox("对冲市场", [m for m in HEDGE_MARKETS
+                                                 if fixture_hedge_outcomes(current_fixture, m)[0] is not None],
+                                    key="hedge_market")
+    with col_hedge2:
+        hedge_mode = st.radio("目标", ["锁定最高保底", "止损到指定保底"], key="hedge_mode")
+    with col_hedge3:
+        hedge_target = st.number_input("保底盈亏 ($)", value=-50.0, step=10.0, key="hedge_target",
+                                       disabled=hedge_mode == "锁定最高保底")
+    target = None if hedge_mode == "锁定最高保底" else hedge_target
+    
+    # 当前赔率：默认取本场已有的盘口赔率，总进球缺价时用策略2的总进球赔率，可直接修改
+    hedge_names, _ = fixture_hedge_outcomes(current_fixture, hedge_market)
+    hedge_default = fixture_hedge_odds(current_fixture, hedge_market, hedge_names)
+    if hedge_market == "总进球 0/1/2/3+":
+        for j, g in enumerate(S2_TOTALS):
+            if np.isnan(hedge_default[j]) and f"s2_od_{g}" in st.session_state:
+                hedge_default[j] = st.session_state[f"s2_od_{g}"]
+    hedge_odds_table = st.data_editor(
+        pd.DataFrame({"选项": hedge_names, "当前赔率": hedge_default}), hide_index=True, use_container_width=True,
+        disabled=["选项"], key=f"hedge_odds_{hedge_market}",
+        column_config={"当前赔率": st.column_config.NumberColumn("当前赔率", min_value=1.0, step=0.01, format="%.2f")},
+    )
+    hedge_summary, hedge_details = book_hedge([current_fixture], hedge_market, target,
+                                              odds_override=[hedge_odds_table["当前赔率"].to_numpy(dtype=float)])
+    hedge_row = hedge_summary.iloc[0]
+    if pd.isna(hedge_row["追加投入"]):
+        st.warning("按当前赔率无法把保底抬到目标（缺价的选项无法对冲，或合成抽水太高）")
+    else:
+        col_hm1, col_hm2, col_hm3 = st.columns(3)
+        with col_hm1:
+            st.metric("追加投入", f"${hedge_row['追加投入']:.2f}")
+        with col_hm2:
+            st.metric("保底盈亏", f"${hedge_row['对冲后保底']:.2f}",
+                      delta=f"{hedge_row['对冲后保底'] - hedge_row['对冲前保底']:+.2f}")
+        with col_hm3:
+            st.metric("模型EV", f"${hedge_row['对冲后EV']:.2f}", delta=f"{hedge_row['对冲后EV'] - hedge_row['对冲前EV']:+.2f}")
+        st.dataframe(hedge_details[0], use_container_width=True, hide_index=True)
+        st.caption("「最差」为该选项覆盖的所有结果里的最差净盈亏；锁定即把需要对冲的选项拉平到同一保底，"
+                   "代价是追加投注按庄家赔率计价（EV 通常下降）。")
+    
+    hedge_book = st.session_state.get("matchday_fixtures", [])
+    if hedge_book:
+        st.write(f"##### 📦 比赛日投注簿（{len(hedge_book)} 场，按各场保存的赔率）")
+        book_summary, _ = book_hedge(hedge_book, hedge_market, target)
+        if book_summary.empty:
+            st.info("比赛日里没有适用该对冲市场的比赛")
+        else:
+            st.dataframe(book_summary, use_container_width=True, hide_index=True)
+
+# --- 5.7 投注台账 ---
+@st.cache_resource
+def open_ledger(directory):
+    """每个台账目录在进程里只加载一次（所有会话共用，写入由台账自己加锁）"""
+    from ledger import BetLedger
+    return BetLedger(directory)
+
+with st.expander("📒 投注台账（实际盈亏 vs 期望）"):
+    if section_enabled("打开投注台账", "show_ledger"):
+        from ledger import OPEN, REPORT_GROUPS
+        ledger_dir = st.text_input("台账目录", value="bet_ledger", key="ledger_dir")
+        bet_ledger = open_ledger(os.path.abspath(ledger_dir))
+        col_ledger1, col_ledger2 = st.columns(2)
+        with col_ledger1:
+            if st.button("📝 记录本场当前投注", key="ledger_place"):
+                try:
+                    placed = bet_ledger.place_fixture(current_fixture)
+                    st.success(f"已记录 {len(placed)} 注")
+                except ValueError as e:
+                    st.error(f"无法记录: {e}")
+        with col_ledger2:
+            st.metric("台账注数", len(bet_ledger))
+        fixture_legs = bet_ledger.select(home_team, away_team)
+        if len(fixture_legs):
+            st.caption(f"本场已记录 {fixture_legs['bet_id'].nunique()} 注")
+            st.dataframe(fixture_legs[["bet_id", "placed_at", "market", "selection", "leg_odds", "stake", "bet_odds"]],
+                         use_container_width=True, hide_index=True)
+    
+        st.write("##### 按赛果结算")
+        st.caption("赛果CSV（列：date, home_team, away_team, home_goals, away_goals），按 (主队, 客队, 日期) 对上各注")
+        settle_file = st.file_uploader("上传赛果CSV", type=["csv"], key="ledger_results_file")
+        settle_path = st.text_input("或本地文件路径", value="results.csv", key="ledger_results_path")
+        if st.button("✅ 批量结算未结算注单", key="ledger_settle"):
+            try:
+                settle_frame = pd.read_csv(settle_file if settle_file is not None else settle_path)
+                settled = bet_ledger.settle(settle_frame)
+                st.success(f"赢 {settled['won']} 注 / 输 {settled['lost']} 注"
+                           f"（{settled['matched']}/{settled['legs']} 个组成部分对上赛果）")
+            except (OSError, ValueError) as e:
+                st.error(f"无法结算: {e}")
+    
+        ledger_by = st.selectbox("报告分组", list(REPORT_GROUPS), key="ledger_report_by")
+        ledger_report = bet_ledger.report(ledger_by)
+        if len(ledger_report):
+            st.dataframe(ledger_report, use_container_width=True, hide_index=True)
+            st.caption("期望盈亏按下注时的模型概率计算；z值 = (实际 − 期望) / 标准差，|z| > 2 说明模型概率与实际结果明显不符。")
+            ledger_curve = bet_ledger.cumulative()
+            if len(ledger_curve):
+                st.line_chart(ledger_curve)
+            open_count = int((bet_ledger.bets()["status"] == OPEN).sum())
+            if open_count:
+                st.caption(f"另有 {open_count} 注未结算，不计入实际/期望对比")
+        else:
+            st.info("台账为空：点「记录本场当前投注」开始记录")
+
+# --- 5.8 开赛前预计算 ---
+# 每次重跑把上传的赛程、比赛日列表和当前比赛交给调度器：结果已是最新的比赛直接跳过，
+# 赔率或投注变了的比赛按开球时间重新排队，算好后页面打开即命中共享层。
+with st.expander("⏰ 开赛前预计算（按开球时间后台排队）"):
+    precompute_file = st.file_uploader("上传即将开赛的赛程CSV（列同比赛日CSV）", type=["csv"], key="precompute_file")
+    precompute_fixtures = []
+    if precompute_file is not None:
+        from reports import fixtures_from_frame
+        try:
+            precompute_fixtures = fixtures_from_frame(pd.read_csv(precompute_file))
+        except (ValueError, KeyError) as e:
+            st.warning(f"⚠️ 无法读取赛程: {e}")
+    precompute.submit([analysis_fixture(f, goal_model) for f in precompute_fixtures +
+                       list(st.session_state.get("matchday_fixtures", [])) + [current_fixture]],
+                      build_analysis, analysis_context)
+    pre_metrics = precompute.metrics()
+    col_pre1, col_pre2, col_pre3, col_pre4 = st.columns(4)
+    with col_pre1:
+        st.metric("队列深度", pre_metrics["queue_depth"])
+    with col_pre2:
+        st.metric("计算中", pre_metrics["running"])
+    with col_pre3:
+        st.metric("已就绪", pre_metrics["ready"])
+    with col_pre4:
+        st.metric("最长陈旧", f"{pre_metrics['max_staleness']:.1f} 秒")
+    st.caption(f"累计计算 {pre_metrics['computed']} 次 · 赔率变化刷新 {pre_metrics['refreshed']} 次 · "
+               f"失败 {pre_metrics['failed']} 次 · 最久排队 {pre_metrics['max_wait']:.1f} 秒 · "
+               f"最早的结果 {pre_metrics['oldest_result_age']:.0f} 秒前")
+    st.dataframe(precompute.status(), use_container_width=True, hide_index=True)
+
 # --- 6. 蒙特卡洛实验已移除 ---
 if show_monte_carlo:
     st.divider()
@@ -1074,113 +1599,330 @@ if show_monte_carlo:
         
         **如需启用，请联系管理员或从历史版本恢复。**
         """)
+    
+    # 破产概率改用确定性求解：资金状态上的马尔可夫链，所有投注倍数一次算完
+    st.write("##### 💀 破产概率（马尔可夫链求解）")
+    from ruin import fixture_ruin_curve
+    col_ruin1, col_ruin2, col_ruin3 = st.columns(3)
+    with col_ruin1:
+        ruin_bankroll = st.number_input("初始资金 ($)", value=1000.0, min_value=1.0, step=100.0, key="ruin_bankroll")
+    with col_ruin2:
+        ruin_bets = st.number_input("连续投注场数", value=200, min_value=1, max_value=2000, step=50, key="ruin_bets")
+    with col_ruin3:
+        ruin_max_scale = st.slider("投注倍数上限", 0.5, 5.0, 3.0, step=0.5, key="ruin_max_scale")
+    
+    ruin_scales = np.linspace(0.1, ruin_max_scale, 30)
+    ruin = fixture_ruin_curve(current_fixture, ruin_bankroll, int(ruin_bets), ruin_scales, home_share)
+    current_idx = int(np.abs(ruin_scales - 1.0).argmin())
+    col_ruin4, col_ruin5, col_ruin6 = st.columns(3)
+    with col_ruin4:
+        st.metric("当前方案破产概率", f"{ruin['ruin_prob'][current_idx] * 100:.2f}%",
+                  help=f"按倍数 {ruin_scales[current_idx]:.2f} 估算")
+    with col_ruin5:
+        st.metric("期望存活场数", f"{ruin['expected_bets'][current_idx]:.1f}")
+    with col_ruin6:
+        mean_ruin = ruin['mean_ruin_time'][current_idx]
+        st.metric("破产时平均场数", "-" if np.isnan(mean_ruin) else f"{mean_ruin:.1f}")
+    st.line_chart(pd.DataFrame({"破产概率%": ruin["ruin_prob"] * 100},
+                               index=pd.Index(np.round(ruin_scales * total_cost, 2), name="每场总投入 ($)")))
+
+# --- 6.1 历史回测 ---
+def parse_number_list(text, default):
+    """把逗号分隔的数字解析为列表，解析失败时返回默认值"""
+    values = []
+    for part in re.split(r'[,，\s]+', text.strip()):
+        try:
+            values.append(float(part))
+        except ValueError:
+            continue
+    return values or [default]
+
+@st.cache_resource
+def load_archive(path):
+    """每个进程只打开一次归档（内存映射，多会话共享）"""
+    from archive import open_archive
+    return open_archive(path)
+
+@st.cache_resource
+def local_eval_service():
+    """本机内置计算服务（进程池在独立进程中执行任务），返回服务地址"""
+    from eval_service import service_url, start_service
+    server, _ = start_service(port=0)
+    return service_url(server)
+
+def remote_job(kind, **params):
+    """把任务交给计算服务并轮询：参数不变时复用已提交的任务，完成返回结果，否则返回None"""
+    from eval_service import EvalClient, QueueFull
+    client = EvalClient(eval_url or local_eval_service())
+    jobs = session_space.setdefault("eval_jobs", {})
+    job_fp = fingerprint((kind, params))
+    try:
+        if kind not in jobs or jobs[kind][0] != job_fp:
+            jobs[kind] = (job_fp, client.submit(kind, **params))
+        try:
+            status = client.status(jobs[kind][1])
+        except HTTPError as e:
+            if e.code != 404:
+                raise
+            # 服务重启后旧任务已不存在，重新提交
+            jobs[kind] = (job_fp, client.submit(kind, **params))
+            status = client.status(jobs[kind][1])
+    except QueueFull:
+        jobs.pop(kind, None)
+        st.warning("⚠️ 计算服务繁忙，稍后自动重试…")
+        status = {"status": "queued"}
+    except (URLError, HTTPError, OSError) as e:
+        jobs.pop(kind, None)
+        st.error(f"无法连接计算服务: {e}")
+        return None
+    
+    if status["status"] == "done":
+        st.caption(f"由计算服务完成，用时 {status['elapsed']:.2f} 秒")
+        return status["result"]
+    if status["status"] == "error":
+        st.error(f"计算服务任务失败: {status['error']}")
+        return None
+    st.info("⏳ 计算服务处理中…")
+    
+    # 任务结束（或繁忙重试）时整页刷新
+    @st.fragment(run_every=1.0)
+    def eval_job_watcher():
+        job = session_space.get("eval_jobs", {}).get(kind)
+        if job is None or client.status(job[1])["status"] in ("done", "error"):
+            st.rerun()
+    
+    eval_job_watcher()
+    return None
+
+if show_backtest:
+    from archive import league_priors, slice_statistics
+    from backtest import run_backtest, score_selections, sweep_grid
+    from eval_service import backtest_from_json
+    st.divider()
+    st.header("🧪 历史回测")
+    st.caption("上传赛果+赔率CSV（列：league, date, home_goals, away_goals, o25_odds, "
+               "cs_0-0…cs_0-2, s2_result, s2_win_odds, s2_draw_odds, s2_lose_odds, tg_0, tg_1, tg_2）")
+    bt_source = st.radio("数据来源", ["上传CSV", "列式归档"], horizontal=True, key="bt_source")
+    bt_data = None
+    if bt_source == "上传CSV":
+        bt_file = st.file_uploader("回测数据集", type=["csv"], key="bt_file")
+        if bt_file is not None:
+            bt_data = pd.read_csv(bt_file)
+            bt_job_data = {"columns": bt_data.to_dict("list")}
+    else:
+        bt_path = st.text_input("归档目录", value="archive", key="bt_archive_path")
+        try:
+            bt_archive = load_archive(bt_path)
+        except (OSError, ValueError, KeyError) as e:
+            st.warning(f"⚠️ 无法打开归档: {e}")
+            bt_archive = None
+        if bt_archive is not None:
+            col_arc1, col_arc2, col_arc3 = st.columns(3)
+            with col_arc1:
+                bt_leagues = st.multiselect("联赛", bt_archive.league_names,
+                                            default=bt_archive.league_names[:1], key="bt_leagues")
+            with col_arc2:
+                bt_start = st.date_input("开始日期", value=datetime(2015, 1, 1).date(), key="bt_start")
+            with col_arc3:
+                bt_end = st.date_input("结束日期", value=datetime.now().date(), key="bt_end")
+            if bt_leagues:
+                bt_data = bt_archive.select(bt_leagues, bt_start, bt_end)
+                bt_job_data = {"archive": {"path": os.path.abspath(bt_path), "leagues": bt_leagues,
+                                           "start": str(bt_start), "end": str(bt_end)}}
+                arc_stats = slice_statistics(bt_data)
+                if arc_stats:
+                    st.caption(f"切片: {arc_stats['total_matches']}场 · 大球比例 {arc_stats['over_25_rate']:.1f}% · "
+                               f"场均进球 {arc_stats['avg_goals']:.2f}")
+            with st.expander("📐 联赛先验（全部会话共享）"):
+                st.dataframe(shared.get("league_priors", bt_path, lambda: league_priors(bt_archive)),
+                             use_container_width=True, hide_index=True)
+    
+    # 回测参数组取自策略（当前比赛的投注 -> settle_history 参数），金额按扫描值展开
+    bt_params = strategy.backtest_params(strategy.defaults(current_fixture))
+    if bt_params is None:
+        st.info(f"「{mode}」不支持历史回测")
+    else:
+        leg_param, leg_label = strategy.sweep_stake
+        col_bt1, col_bt2 = st.columns(2)
+        with col_bt1:
+            bt_o25_stakes = parse_number_list(
+                st.text_input("大球投入扫描值", value=f"{o25_stake:g}", key="bt_o25"), o25_stake)
+        with col_bt2:
+            bt_leg_stakes = parse_number_list(
+                st.text_input(f"{leg_label}扫描值", value=f"{bt_params[leg_param]:g}", key="bt_leg"),
+                bt_params[leg_param])
+    
+    bt_result = None
+    if bt_params is not None and bt_data is not None and len(bt_data["date"]) > 0:
+        if "scores" in bt_params:
+            # 数据集里有 cs_<选项> 赔率列的选项才能回测，其余的列出来提示
+            bt_offered = (score_selections(bt_data) if isinstance(bt_data, pd.DataFrame)
+                          else bt_data["score_selections"])
+            bt_missing = [s for s in bt_params["scores"] if s not in bt_offered]
+            if bt_missing:
+                st.warning(f"回测数据集没有以下选项的赔率列（cs_<选项>），回测中不下注：{'、'.join(bt_missing)}")
+        bt_options = {k: [v] for k, v in bt_params.items()}
+        bt_options.update({leg_param: bt_leg_stakes, "o25_stake": bt_o25_stakes})
+        if bt_remote:
+            bt_payload = remote_job("backtest", strategy=mode, options=bt_options, **bt_job_data)
+            bt_result = None if bt_payload is None else backtest_from_json(bt_payload)
+        else:
+            try:
+                bt_result = run_backtest(bt_data, mode, sweep_grid(**bt_options))
+            except (ValueError, KeyError) as e:
+                st.error(f"无法回测: {e}")
+    
+    if bt_result is not None:
+        if bt_result["dropped"]:
+            st.caption(f"已跳过 {bt_result['dropped']} 场比分缺失的比赛")
+        st.write("##### 📋 参数扫描结果")
+        st.dataframe(bt_result["summary"], use_container_width=True, hide_index=True)
+        
+        best = int(bt_result["summary"]["累计盈亏"].idxmax())
+        st.write(f"##### 📈 累计盈亏曲线（最佳参数组：{bt_result['summary']['参数组'][best]}）")
+        st.line_chart(pd.DataFrame({"累计盈亏": bt_result["cumulative_pnl"][best]},
+                                   index=pd.to_datetime(bt_result["dates"])))
+        
+        st.write("##### 🏆 分联赛明细")
+        st.dataframe(bt_result["by_league"], use_container_width=True, hide_index=True)
 
 # --- 7. 策略报告生成 ---
 st.divider()
 st.header("📄 策略分析报告")
 
-col_report1, col_report2 = st.columns(2)
+if section_enabled("生成策略报告与批量工具", "show_report_section"):
+    from distribution import cross_check, fixture_outcomes, portfolio_distribution
+    from reports import bundle_zip, fixtures_from_frame, submit_reports
+    col_report1, col_report2 = st.columns(2)
 
-with col_report1:
-    if mode == "策略 1：比分精准流":
-        st.markdown(f"""
-        ### 📋 策略报告摘要
-        
-        **比赛信息**
-        - 🏆 联赛: {league}
-        - 🏠 主队: {home_team}
-        - ✈️ 客队: {away_team}
-        - 📅 时间: {match_date.strftime('%Y-%m-%d')} {match_time.strftime('%H:%M')}
-        
-        **策略参数**
-        - 🎯 选择策略: {mode}
-        - 📊 预测大球概率: {pred_prob*100:.1f}%
-        - 💰 总投入金额: ${total_cost:.2f}
-        - ⚖️ 大球赔率: {o25_odds}
-        
-        **风险评估**
-        - 📈 策略期望值: ${ev:.2f}
-        - 🎲 对冲效果: {hedge_effect:.1f}%
-        """)
-    else:
-        bet_goals_str = ", ".join([goal_item["goal"] for goal_item in selected_goals]) if selected_goals else "无"
-        st.markdown(f"""
-        ### 📋 策略报告摘要
-        
-        **涉及两场比赛**
-        
-        **1. 稳胆比赛**
-        - 🏆 {s2_league}: {s2_home_team} vs {s2_away_team}
-        - 📊 选择选项: {s2_selection}
-        - ⚖️ 稳胆赔率: {strong_win}
-        
-        **2. 主比赛 (大球+总进球)**
-        - 🏆 {league}: {home_team} vs {away_team}
-        - 📊 预测大球概率: {pred_prob*100:.1f}%
-        - ⚖️ 大球赔率: {o25_odds}
-        - 🎯 总进球选项: {bet_goals_str}
-        
-        **投注详情**
-        - 💰 单独大球投入: ${o25_stake:.2f}
-        - 🎯 2串1复式注数: {len(parlay_bets)} 注
-        - 💰 每注2串1投入: ${per_parlay_stake:.2f}
-        - 💰 2串1总投入: ${total_parlay_cost:.2f}
-        - 💰 策略总投入: ${total_cost:.2f}
-        
-        **风险评估**
-        - 📈 策略期望值: ${ev:.2f}
-        - 🎲 对冲效果: {hedge_effect:.1f}%
-        """)
+    with col_report1:
+        st.markdown(flow.get("report_text"))
 
-with col_report2:
-    # 蒙特卡洛模块已移除 — 在此显示说明而非运行模拟
-    if show_monte_carlo:
-        st.markdown("### 📊 蒙特卡洛模拟结果\n\n已从本工具中移除。如需恢复，请从版本控制还原对应代码块。")
+    with col_report2:
+        # 蒙特卡洛模块已移除 — 在此显示说明而非运行模拟
+        if show_monte_carlo:
+            st.markdown("### 📊 蒙特卡洛模拟结果\n\n已从本工具中移除。如需恢复，请从版本控制还原对应代码块。")
+
+    with st.expander("📦 比赛日批量报告 (HTML / Markdown / CSV)"):
+        if 'matchday_fixtures' not in st.session_state:
+            st.session_state.matchday_fixtures = []
+    
+        col_md1, col_md2 = st.columns(2)
+        with col_md1:
+            if st.button("➕ 加入当前比赛", key="md_add"):
+                st.session_state.matchday_fixtures.append(dict(current_fixture))
+        with col_md2:
+            if st.button("🗑️ 清空列表", key="md_clear"):
+                st.session_state.matchday_fixtures = []
+    
+        md_file = st.file_uploader("或上传比赛日CSV", type=["csv"], key="md_file")
+        md_fixtures = list(st.session_state.matchday_fixtures)
+        if md_file is not None:
+            try:
+                md_fixtures += fixtures_from_frame(pd.read_csv(md_file))
+            except (ValueError, KeyError) as e:
+                st.error(f"无法读取比赛日CSV: {e}")
+        st.caption(f"待生成报告：{len(md_fixtures)} 场")
+    
+        if st.button("🚀 后台生成报告", key="md_generate", disabled=not md_fixtures):
+            session_space["report_job"] = submit_reports(md_fixtures)
+    
+        report_job = session_space.get("report_job")
+        if report_job is not None:
+            if report_job.done():
+                report_bundle = report_job.result()
+                col_dl1, col_dl2, col_dl3 = st.columns(3)
+                with col_dl1:
+                    st.download_button("⬇️ 全部 (zip)", bundle_zip(report_bundle), file_name="matchday_reports.zip")
+                with col_dl2:
+                    st.download_button("⬇️ HTML汇总", report_bundle["html"], file_name="report.html")
+                with col_dl3:
+                    st.download_button("⬇️ CSV汇总", report_bundle["csv"].encode("utf-8-sig"), file_name="summary.csv")
+            else:
+                st.info("⏳ 报告生成中…")
+            
+                # 生成期间定期检查，完成后整页刷新以显示下载按钮
+                @st.fragment(run_every=1.0)
+                def report_job_watcher():
+                    if registry.space(session_id)["report_job"].done():
+                        st.rerun()
+            
+                report_job_watcher()
+
+    with st.expander("📐 组合盈亏分布（精确卷积）"):
+        book = list(st.session_state.get("matchday_fixtures", [])) or [current_fixture]
+        st.caption(f"投注簿：{len(book)} 场（未加入比赛日时只含本场）。各场独立，按 $1 金额网格做 FFT 卷积得到精确分布。")
+        book_dist = portfolio_distribution([fixture_outcomes(f) for f in book])
+        col_var1, col_var2, col_var3, col_var4 = st.columns(4)
+        with col_var1:
+            st.metric("期望盈亏", f"${book_dist.mean:.2f}")
+        with col_var2:
+            st.metric("亏损概率", f"{book_dist.loss_prob * 100:.1f}%")
+        with col_var3:
+            st.metric("VaR 95%", f"${book_dist.var(0.95):.2f}")
+        with col_var4:
+            st.metric("CVaR 95%", f"${book_dist.cvar(0.95):.2f}")
+        st.area_chart(pd.DataFrame({"概率": book_dist.pmf}, index=book_dist.values), height=220)
+        if st.checkbox("与蒙特卡洛抽样对照（2万次）", key="dist_mc_check"):
+            st.dataframe(pd.DataFrame(cross_check([fixture_outcomes(f) for f in book], n_trials=20000)).round(4),
+                         use_container_width=True, hide_index=True)
+
+    with st.expander("🔁 派生结果重算统计"):
+        st.caption("每个派生结果按输入指纹缓存，只有依赖的输入变化时才会重算")
+        st.dataframe(pd.DataFrame(flow.counts()), use_container_width=True, hide_index=True)
+
+    with st.expander("🧮 会话内存占用"):
+        mem = memory_report(shared, registry, session_id, st.session_state)
+        col_mem1, col_mem2, col_mem3 = st.columns(3)
+        with col_mem1:
+            st.metric("共享层", format_bytes(mem["shared_bytes"]))
+        with col_mem2:
+            st.metric(f"全部会话增量（{len(mem['sessions'])} 个）", format_bytes(mem["sessions_bytes"]))
+        with col_mem3:
+            st.metric("已回收空闲会话", registry.evicted)
+        st.write("##### 当前会话")
+        st.dataframe(pd.DataFrame(mem["current"]), use_container_width=True, hide_index=True)
+        st.write("##### 共享产物")
+        st.dataframe(pd.DataFrame(mem["shared"]), use_container_width=True, hide_index=True)
+        st.write("##### 全部会话")
+        st.dataframe(pd.DataFrame(mem["sessions"]), use_container_width=True, hide_index=True)
+
+with st.expander("⏱️ 启动与渲染耗时"):
+    st.caption(f"快速启动模式：{'开' if fast_start else '关'}。可复现的冷启动基准：python startup.py")
+    col_timing1, col_timing2 = st.columns(2)
+    with col_timing1:
+        st.write("##### 本进程冷启动（第一次运行）")
+        if cold_run() is not None:
+            st.dataframe(pd.DataFrame(timing_rows(cold_run())), use_container_width=True, hide_index=True)
+        else:
+            st.info("本进程的第一次运行尚未结束")
+    with col_timing2:
+        st.write("##### 本会话上一次运行")
+        if "last_run_timing" in st.session_state:
+            st.dataframe(pd.DataFrame(timing_rows(st.session_state.last_run_timing)),
+                         use_container_width=True, hide_index=True)
 
 # --- 8. 教育总结 ---
 st.divider()
 st.header("📚 核心教育总结")
 
-col_summary1, col_summary2 = st.columns(2)
+if section_enabled("显示核心教育总结", "show_education"):
+    col_summary1, col_summary2 = st.columns(2)
 
-with col_summary1:
-    st.markdown("""
-    ### 🎓 数学原理
-    
-    1. **2串1赔率计算**
-    ```
-    2串1赔率 = 第一场比赛赔率 × 第二场比赛赔率
-    
-    收益 = 投注金额 × 2串1赔率
-    条件：两场比赛都必须正确
-    ```
-    
-    2. **复式投注原理**
-    ```
-    复式投注 = 多个2串1组合
-    总投入 = 每注金额 × 注数
-    
-    优点：增加中奖机会
-    缺点：总投入增加
-    ```
-    
-    3. **对冲策略本质**
-    - 通过不同投注组合降低风险
-    - 大球投注覆盖3球+情况
-    - 2串1覆盖稳胆赢+小球情况
-    """)
+    with col_summary1:
+        # 固定文字在进程内只整理一次（见 assets.py）
+        st.markdown(EDUCATION_PRINCIPLES_MD)
 
-with col_summary2:
-    if mode == "策略 1：比分精准流":
+    with col_summary2:
         # 尝试获取历史统计数据
         history_stats_available = False
         stats_info = None
         
-        # 检查是否有历史数据输入
+        # 检查是否有历史数据输入（依赖图缓存命中，不会重新解析）
         if 'history_data' in locals() and history_data:
-            matches = parse_history_data(history_data, home_team, away_team)
+            matches = flow.get("matches")
             if matches:
-                stats = calculate_statistics(matches, home_team, away_team)
+                stats = flow.get("stats")
                 if stats:
                     history_stats_available = True
                     stats_info = stats
@@ -1188,75 +1930,56 @@ with col_summary2:
         if history_stats_available and stats_info:
             st.markdown(f"""
             ### 💡 针对本场比赛的建议
-            
+        
             **{home_team} vs {away_team}**
-            
+        
             1. **历史战绩分析**
             - 总比赛场数: {stats_info['total_matches']}场
             - {home_team}胜率: {stats_info['home_win_rate']:.1f}%
             - {away_team}胜率: {stats_info['away_win_rate']:.1f}%
             - 场均总进球: {stats_info['avg_goals']:.2f}
-            
+        
             2. **策略建议**
             基于历史数据，两队交锋大球比例为 {stats_info['over_25_rate']:.1f}%，当前预测概率为 {pred_prob*100:.1f}%。
             """)
         else:
             st.markdown(f"""
             ### 💡 针对本场比赛的建议
-            
+        
             **{home_team} vs {away_team}**
-            
+        
             1. **分析建议**
             - 请在侧边栏输入两队历史交锋记录，以获得更准确的分析
             - 当前预测大球概率: {pred_prob*100:.1f}%
-            
+        
             2. **策略建议**
             """)
-    else:
-        # 策略2部分保持不变
-        st.markdown(f"""
-        ### 💡 2串1复式投注建议
-        
-        **盈利条件**
-        1. **情况A**: {home_team} vs {away_team} 大球(3球+)
-           - 大球投注赢
-           - 2串1全输
-        
-        2. **情况B**: {home_team} vs {away_team} 1球或2球 + {s2_home_team}胜
-           - 对应2串1赢
-           - 其他2串1输
-           - 大球输
-        
-        **风险提示**
-        - 稳胆比赛平或负 → 所有2串1输
-        - 主比赛0球 → 所有2串1输
-        - 需要两场比赛都判断正确
-        """)
+        # 盈利 / 亏损的结果由收益矩阵合并得出（与盈亏表同一份数据，任何策略都一样）
+        profit_lines = [f"- {r['模拟赛果']}：${r['净盈亏']:.2f}（概率 {r['概率']*100:.1f}%）"
+                        for r in outcome_df.to_dict("records") if r["净盈亏"] > 0]
+        loss_prob = outcome_df.loc[outcome_df["净盈亏"] < 0, "概率"].sum()
+        st.markdown("**盈利条件**\n\n" + ("\n".join(profit_lines) or "- 没有任何结果能盈利") +
+                    f"\n\n**风险提示**\n\n- 亏损概率 {loss_prob*100:.1f}%，"
+                    f"最差结果净盈亏 ${outcome_df['净盈亏'].min():.2f}")
     
-    # 风险评估部分
-    if 'ev' in locals() and ev > 0:
-        if 'bankruptcy_rate' in locals() and bankruptcy_rate < 15:
-            st.success("当前策略参数合理，可考虑小规模执行")
+        # 风险评估部分
+        if 'ev' in locals() and ev > 0:
+            if 'bankruptcy_rate' in locals() and bankruptcy_rate < 15:
+                st.success("当前策略参数合理，可考虑小规模执行")
+            else:
+                st.warning("策略有盈利可能，但风险较高，建议降低仓位")
+        elif 'ev' in locals() and ev < 0:
+            st.error("策略负期望值，建议放弃或大幅调整")
         else:
-            st.warning("策略有盈利可能，但风险较高，建议降低仓位")
-    elif 'ev' in locals() and ev < 0:
-        st.error("策略负期望值，建议放弃或大幅调整")
-    else:
-        st.info("策略期望值为零，需要进一步分析")
+            st.info("策略期望值为零，需要进一步分析")
     
-    st.markdown("""
-    3. **最佳选择**
-    - 享受足球比赛本身
-    - 参与无金钱风险的足球活动
-    - 将分析能力用于建设性用途
-    """)
+        st.markdown(EDUCATION_CLOSING_MD)
 
 # --- 9. 最终免责声明 ---
 st.divider()
-if mode == "策略 1：比分精准流":
-    match_info = f"{home_team} vs {away_team}"
-else:
-    match_info = f"1. {home_team} vs {away_team} (大球) | 2. {s2_home_team} vs {s2_away_team} (稳胆)"
+match_info = f"{home_team} vs {away_team}"
+if leg_match is not None:
+    match_info = f"1. {match_info} (大球) | 2. {leg_match[0]} vs {leg_match[1]} (关联比赛)"
 
 st.markdown(f"""
 <div style='text-align: center; padding: 1.5rem; background-color: #f8d7da; border-radius: 10px;'>
@@ -1282,3 +2005,5 @@ st.caption(f"""
 *如果你需要赌博问题帮助，请联系专业机构。*  
 *报告生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*
 """)
+
+st.session_state.last_run_timing = run_timer.finish()
@@ -0,0 +1,173 @@
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from backtest import prepare_fixtures
+from payoff import S1_SCORES
+
+# --- 列式赛果/赔率归档 ---
+# 目录结构：每一列一个 .npy 文件 + 一个 meta.json 索引。
+# 行按 (联赛, 日期) 排序，meta.json 记录每个联赛的 [起, 止) 偏移，
+# 打开时全部列用内存映射加载，只有真正访问的切片才会进入内存。
+
+META_FILE = "meta.json"
+ARCHIVE_VERSION = 1
+
+# 与 prepare_fixtures 输出一致的数组列
+ARRAY_COLUMNS = [
+    "league", "date", "home_goals", "away_goals", "total_goals", "score_idx",
+    "o25_odds", "score_odds", "strong_result", "strong_odds", "total_odds",
+]
+
+
+def build_archive(df, path):
+    """把赛果+赔率DataFrame写成列式归档目录"""
+    fixtures = prepare_fixtures(df)
+    # 联赛名按字母序重新编码，行按 (联赛, 日期) 稳定排序
+    names = sorted(fixtures["league_names"])
+    remap = np.array([names.index(n) for n in fixtures["league_names"]], dtype=np.int32)
+    league = remap[fixtures["league"]]
+    order = np.lexsort((fixtures["date"], league))
+
+    os.makedirs(path, exist_ok=True)
+    columns = {}
+    for name in ARRAY_COLUMNS:
+        arr = league if name == "league" else fixtures[name]
+        arr = np.ascontiguousarray(arr[order])
+        np.save(os.path.join(path, f"{name}.npy"), arr)
+        columns[name] = {"dtype": str(arr.dtype), "shape": list(arr.shape)}
+
+    # 预先计算每个联赛的行偏移
+    bounds = np.searchsorted(league[order], np.arange(len(names) + 1))
+    meta = {
+        "version": ARCHIVE_VERSION,
+        "n_rows": int(len(order)),
+        "columns": columns,
+        "score_selections": fixtures["score_selections"],
+        "leagues": {n: [int(bounds[i]), int(bounds[i + 1])] for i, n in enumerate(names)},
+    }
+    with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+
+class OddsArchive:
+    """只读的内存映射归档，按联赛和日期区间返回零拷贝切片"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.league_names = list(self.meta["leagues"])
+        self.columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in self.meta["columns"]
+        }
+
+    def __len__(self):
+        return self.meta["n_rows"]
+
+    def league_range(self, league, start=None, end=None):
+        """返回某联赛在日期区间 [start, end] 内的行偏移 (起, 止)"""
+        lo, hi = self.meta["leagues"][league]
+        dates = self.columns["date"][lo:hi]
+        if start is not None:
+            lo_off = int(np.searchsorted(dates, np.datetime64(start, "D"), side="left"))
+        else:
+            lo_off = 0
+        if end is not None:
+            hi_off = int(np.searchsorted(dates, np.datetime64(end, "D"), side="right"))
+        else:
+            hi_off = hi - lo
+        return lo + lo_off, lo + hi_off
+
+    def select(self, leagues=None, start=None, end=None):
+        """按联赛和日期筛选，返回与 prepare_fixtures 结构相同的数组字典
+
+        单个联赛时所有数组都是内存映射上的切片（零拷贝）；
+        多个联赛时按日期合并，只复制被选中的行。
+        """
+        if leagues is None:
+            leagues = self.league_names
+        elif isinstance(leagues, str):
+            leagues = [leagues]
+        ranges = [self.league_range(lg, start, end) for lg in leagues]
+
+        if len(ranges) == 1:
+            lo, hi = ranges[0]
+            out = {name: col[lo:hi] for name, col in self.columns.items()}
+        else:
+            idx = np.concatenate([np.arange(lo, hi) for lo, hi in ranges]) if ranges else np.arange(0)
+            idx = idx[np.argsort(self.columns["date"][idx], kind="stable")]
+            out = {name: col[idx] for name, col in self.columns.items()}
+        out["league_names"] = self.league_names
+        # score_odds 的列顺序；旧归档只有固定6个比分
+        out["score_selections"] = self.meta.get("score_selections", S1_SCORES)
+        return out
+
+
+def open_archive(path):
+    """打开归档（只读取 meta.json 并建立内存映射）"""
+    return OddsArchive(path)
+
+
+def slice_statistics(fixtures):
+    """对切片做向量化汇总统计（场数、胜平负、大球比例、场均进球）"""
+    hg = np.asarray(fixtures["home_goals"])
+    ag = np.asarray(fixtures["away_goals"])
+    n = len(hg)
+    if n == 0:
+        return None
+    total = hg + ag
+    return {
+        "total_matches": n,
+        "home_win_rate": float((hg > ag).mean() * 100),
+        "away_win_rate": float((hg < ag).mean() * 100),
+        "draw_rate": float((hg == ag).mean() * 100),
+        "over_25_rate": float((total > 2).mean() * 100),
+        "avg_goals": float(total.mean()),
+        "avg_home_goals": float(hg.mean()),
+        "avg_away_goals": float(ag.mean()),
+    }
+
+
+def league_priors(archive):
+    """整个归档按联赛的先验统计（一次 bincount 完成全部联赛）"""
+    league = np.asarray(archive.columns["league"])
+    hg = np.asarray(archive.columns["home_goals"])
+    ag = np.asarray(archive.columns["away_goals"])
+    n_leagues = len(archive.league_names)
+    count = np.bincount(league, minlength=n_leagues)
+    safe = np.maximum(count, 1)
+
+    def rate(mask):
+        return np.bincount(league, weights=mask.astype(float), minlength=n_leagues) / safe * 100
+
+    return pd.DataFrame({
+        "联赛": archive.league_names,
+        "场数": count,
+        "主胜%": rate(hg > ag).round(1),
+        "平局%": rate(hg == ag).round(1),
+        "客胜%": rate(hg < ag).round(1),
+        "大球%": rate(hg + ag > 2).round(1),
+        "场均进球": (np.bincount(league, weights=hg + ag, minlength=n_leagues) / safe).round(2),
+    })
+
+
+if __name__ == "__main__":
+    # 批处理用法：
+    #   python archive.py build results.csv archive_dir
+    #   python archive.py info archive_dir
+    if len(sys.argv) >= 4 and sys.argv[1] == "build":
+        meta = build_archive(pd.read_csv(sys.argv[2]), sys.argv[3])
+        print(f"已写入 {meta['n_rows']} 行，{len(meta['leagues'])} 个联赛 -> {sys.argv[3]}")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "info":
+        arc = open_archive(sys.argv[2])
+        print(f"{len(arc)} 行")
+        for lg, (lo, hi) in arc.meta["leagues"].items():
+            print(f"  {lg}: {hi - lo} 场 [{lo}, {hi})")
+    else:
+        print("用法: python archive.py build <csv> <目录> | info <目录>")
@@ -0,0 +1,137 @@
+import re
+import sys
+import textwrap
+import time
+
+# --- 静态页面资源 ---
+# 样式表和教育总结里的固定文字不随输入变化：模块导入时整理一次（去缩进、压缩空白），
+# 之后同一进程里的所有会话、每次重跑都直接复用这些字符串。
+
+_CSS_SOURCE = """
+<style>
+    .team-header {
+        background: linear-gradient(90deg, #1e3c72, #2a5298);
+        color: white;
+        padding: 15px;
+        border-radius: 10px;
+        text-align: center;
+        margin-bottom: 20px;
+    }
+    .match-info {
+        background-color: #f0f2f6;
+        padding: 12px;
+        border-radius: 8px;
+        border-left: 4px solid #1e3c72;
+        margin: 10px 0;
+    }
+    .match-info-secondary {
+        background-color: #e9ecef;
+        padding: 12px;
+        border-radius: 8px;
+        border-left: 4px solid #6c757d;
+        margin: 10px 0;
+    }
+    .stMetric {
+        background-color: white;
+        padding: 10px;
+        border-radius: 8px;
+        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+    }
+    .strategy-note {
+        background-color: #fff3cd;
+        border-left: 4px solid #ffc107;
+        padding: 10px;
+        margin: 10px 0;
+        border-radius: 5px;
+    }
+    .odds-input-section {
+        background-color: #f8f9fa;
+        padding: 15px;
+        border-radius: 8px;
+        border: 1px solid #dee2e6;
+        margin: 10px 0;
+    }
+    .tab-container {
+        background-color: white;
+        border-radius: 8px;
+        box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+        padding: 10px;
+        margin: 10px 0;
+    }
+    .parlay-badge {
+        background-color: #17a2b8;
+        color: white;
+        padding: 4px 8px;
+        border-radius: 4px;
+        font-size: 12px;
+        font-weight: bold;
+        margin-right: 5px;
+    }
+    .history-stats {
+        background-color: #e7f3ff;
+        border-radius: 8px;
+        padding: 10px;
+        margin: 10px 0;
+    }
+</style>
+"""
+
+_EDUCATION_PRINCIPLES_SOURCE = """
+    ### 🎓 数学原理
+    
+    1. **2串1赔率计算**
+    ```
+    2串1赔率 = 第一场比赛赔率 × 第二场比赛赔率
+    
+    收益 = 投注金额 × 2串1赔率
+    条件：两场比赛都必须正确
+    ```
+    
+    2. **复式投注原理**
+    ```
+    复式投注 = 多个2串1组合
+    总投入 = 每注金额 × 注数
+    
+    优点：增加中奖机会
+    缺点：总投入增加
+    ```
+    
+    3. **对冲策略本质**
+    - 通过不同投注组合降低风险
+    - 大球投注覆盖3球+情况
+    - 2串1覆盖稳胆赢+小球情况
+"""
+
+_EDUCATION_CLOSING_SOURCE = """
+    3. **最佳选择**
+    - 享受足球比赛本身
+    - 参与无金钱风险的足球活动
+    - 将分析能力用于建设性用途
+"""
+
+
+def minify_css(css):
+    """去掉样式表里的多余空白（保留 <style> 标签）"""
+    css = re.sub(r"\s+", " ", css).strip()
+    return re.sub(r"\s*([{}:;,>])\s*", r"\1", css)
+
+
+def clean_markdown(text):
+    """去掉源码缩进和首尾空行"""
+    return textwrap.dedent(text).strip("\n")
+
+
+APP_CSS = minify_css(_CSS_SOURCE)
+EDUCATION_PRINCIPLES_MD = clean_markdown(_EDUCATION_PRINCIPLES_SOURCE)
+EDUCATION_CLOSING_MD = clean_markdown(_EDUCATION_CLOSING_SOURCE)
+
+
+if __name__ == "__main__":
+    # 基准：python assets.py
+    start = time.perf_counter()
+    for _ in range(1000):
+        minify_css(_CSS_SOURCE)
+        clean_markdown(_EDUCATION_PRINCIPLES_SOURCE)
+    per_build = (time.perf_counter() - start) / 1000 * 1e6
+    print(f"样式表 {len(_CSS_SOURCE)} -> {len(APP_CSS)} 字符；整理一次 {per_build:.0f} µs（每进程只做一次）")
+    sys.stdout.write(APP_CSS[:120] + " ...\n")
@@ -0,0 +1,174 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from payoff import CS_OTHER, S1_SCORES, parse_scoreline, score_index
+from strategies import get_strategy
+
+# --- 历史回测引擎 ---
+# 把「赛果 + 赔率」数据集按策略插件（strategies.py）的下注规则逐场结算。
+# 所有计算都在比赛维度上向量化，参数组合一次性批量结算。
+
+# 回测数据集的列约定（CSV/DataFrame）
+#   league, date, home_goals, away_goals, o25_odds      -- 必需
+#   cs_0-0 ... cs_0-2                                    -- 策略1比分赔率
+#   cs_<比分或其他项>（如 cs_2-1、cs_其他主胜）          -- 可选，策略1其余波胆选项的赔率
+#   s2_result, s2_win_odds, s2_draw_odds, s2_lose_odds   -- 策略2稳胆比赛
+#   tg_0, tg_1, tg_2                                     -- 策略2总进球赔率
+S1_ODDS_COLUMNS = [f"cs_{s}" for s in S1_SCORES]
+S2_STRONG_COLUMNS = ["s2_win_odds", "s2_draw_odds", "s2_lose_odds"]
+S2_TOTAL_COLUMNS = ["tg_0", "tg_1", "tg_2"]
+
+# 稳胆赛果的多种写法
+_RESULT_CODES = {
+    "胜": 0, "平": 1, "负": 2,
+    "H": 0, "D": 1, "A": 2,
+    "0": 0, "1": 1, "2": 2,
+}
+
+
+def _odds_matrix(df, columns):
+    """取出赔率列组成二维数组，缺失的列填NaN"""
+    out = np.full((len(df), len(columns)), np.nan)
+    for j, c in enumerate(columns):
+        if c in df.columns:
+            out[:, j] = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float)
+    return out
+
+
+def score_selections(df):
+    """数据集里有赔率列的波胆选项：固定6个比分在前，其余 cs_<比分或其他项> 按列顺序追加"""
+    extra = [c[3:] for c in df.columns if str(c).startswith("cs_") and c not in S1_ODDS_COLUMNS
+             and (parse_scoreline(c[3:]) or c[3:] in CS_OTHER)]
+    return S1_SCORES + extra
+
+
+def prepare_fixtures(df):
+    """把回测DataFrame转换为按列存放的NumPy数组（按日期排序）
+
+    比分缺失或不是数字的行（未开赛、录入空白）无法结算，直接丢弃，丢弃的行数记在 dropped；
+    一行都不剩时抛出 ValueError。
+    """
+    df = df.copy()
+    for col in ("home_goals", "away_goals"):
+        if col not in df.columns:
+            raise ValueError(f"回测数据集缺少 {col} 列")
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    played = df["home_goals"].notna() & df["away_goals"].notna()
+    dropped = int((~played).sum())
+    if not played.any():
+        raise ValueError(f"回测数据集中没有带比分的比赛（{dropped} 行比分缺失）")
+    df = df[played]
+    df["date"] = pd.to_datetime(df["date"], dayfirst=True, errors="coerce")
+    df = df.sort_values("date", kind="stable").reset_index(drop=True)
+
+    league_codes, league_names = pd.factorize(df["league"].astype(str))
+    selections = score_selections(df)
+    home_goals = df["home_goals"].to_numpy(dtype=np.int64)
+    away_goals = df["away_goals"].to_numpy(dtype=np.int64)
+
+    if "s2_result" in df.columns:
+        strong_result = (
+            df["s2_result"].astype(str).str.strip().map(_RESULT_CODES)
+            .fillna(-1).to_numpy(dtype=np.int8)
+        )
+    else:
+        strong_result = np.full(len(df), -1, dtype=np.int8)
+
+    return {
+        "league": league_codes.astype(np.int32),
+        "league_names": list(league_names),
+        "date": df["date"].to_numpy(dtype="datetime64[D]"),
+        "home_goals": home_goals,
+        "away_goals": away_goals,
+        "total_goals": home_goals + away_goals,
+        "score_idx": score_index(home_goals, away_goals),
+        "o25_odds": pd.to_numeric(df["o25_odds"], errors="coerce").to_numpy(dtype=float),
+        "score_selections": selections,
+        "score_odds": _odds_matrix(df, [f"cs_{s}" for s in selections]),
+        "strong_result": strong_result,
+        "strong_odds": _odds_matrix(df, S2_STRONG_COLUMNS),
+        "total_odds": _odds_matrix(df, S2_TOTAL_COLUMNS),
+        "dropped": dropped,
+    }
+
+
+def sweep_grid(**options):
+    """把每个参数的候选值列表展开为参数组合列表（笛卡尔积）"""
+    keys = list(options)
+    values = [v if isinstance(v, (list, tuple)) else [v] for v in options.values()]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+
+def settle(fixtures, strategy, params):
+    """按策略结算全部比赛，返回 (净盈亏, 投入)，形状为 (参数组数, 比赛数)；结算由策略插件提供"""
+    return get_strategy(strategy).settle_history(fixtures, params)
+
+
+def max_drawdown(cum_pnl):
+    """逐行计算累计盈亏曲线的最大回撤（起点资金视为0）"""
+    peak = np.maximum.accumulate(np.maximum(cum_pnl, 0.0), axis=1)
+    return (peak - cum_pnl).max(axis=1) if cum_pnl.shape[1] else np.zeros(len(cum_pnl))
+
+
+def _param_label(prm):
+    """参数组的可读描述"""
+    parts = []
+    for k, v in prm.items():
+        if isinstance(v, (list, tuple)):
+            v = "、".join(map(str, v)) or "无"
+        parts.append(f"{k}={v}")
+    return " | ".join(parts)
+
+
+def summarize(fixtures, params, net, cost):
+    """汇总回测指标：累计盈亏、ROI、命中率、最大回撤与分联赛明细"""
+    total_pnl = net.sum(axis=1)
+    total_cost = cost.sum(axis=1)
+    placed = cost > 0
+    n_placed = placed.sum(axis=1)
+    hits = ((net > 0) & placed).sum(axis=1)
+    cum_pnl = np.cumsum(net, axis=1)
+
+    summary = pd.DataFrame({
+        "参数组": [_param_label(p) for p in params],
+        "下注场数": n_placed,
+        "总投入": np.round(total_cost, 2),
+        "累计盈亏": np.round(total_pnl, 2),
+        "ROI%": np.round(np.divide(total_pnl, total_cost, out=np.zeros_like(total_pnl), where=total_cost > 0) * 100, 2),
+        "命中率%": np.round(np.divide(hits, n_placed, out=np.zeros(len(params)), where=n_placed > 0) * 100, 2),
+        "最大回撤": np.round(max_drawdown(cum_pnl), 2),
+    })
+
+    # 分联赛：用 参数组×联赛 的扁平下标一次 bincount
+    n_params, n_leagues = len(params), len(fixtures["league_names"])
+    flat = (np.arange(n_params)[:, None] * n_leagues + fixtures["league"][None, :]).ravel()
+    size = n_params * n_leagues
+    league_pnl = np.bincount(flat, weights=net.ravel(), minlength=size).reshape(n_params, n_leagues)
+    league_cost = np.bincount(flat, weights=cost.ravel(), minlength=size).reshape(n_params, n_leagues)
+    league_bets = np.bincount(flat, weights=placed.ravel(), minlength=size).reshape(n_params, n_leagues)
+    by_league = pd.DataFrame({
+        "参数组": np.repeat(summary["参数组"].to_numpy(), n_leagues),
+        "联赛": np.tile(fixtures["league_names"], n_params),
+        "下注场数": league_bets.ravel().astype(int),
+        "总投入": np.round(league_cost.ravel(), 2),
+        "累计盈亏": np.round(league_pnl.ravel(), 2),
+        "ROI%": np.round(np.divide(league_pnl, league_cost, out=np.zeros_like(league_pnl), where=league_cost > 0).ravel() * 100, 2),
+    })
+    # 筛选后的切片可能不包含全部联赛，去掉没有下注的行
+    by_league = by_league[by_league["下注场数"] > 0].reset_index(drop=True)
+
+    return {"summary": summary, "by_league": by_league, "cumulative_pnl": cum_pnl}
+
+
+def run_backtest(data, strategy, params):
+    """回测入口：data 可以是DataFrame或 prepare_fixtures 的结果"""
+    fixtures = prepare_fixtures(data) if isinstance(data, pd.DataFrame) else data
+    if isinstance(params, dict):
+        params = [params]
+    net, cost = settle(fixtures, strategy, params)
+    result = summarize(fixtures, params, net, cost)
+    result["dates"] = fixtures["date"]
+    result["dropped"] = fixtures.get("dropped", 0)
+    return result
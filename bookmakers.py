@@ -0,0 +1,199 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from backtest import S2_STRONG_COLUMNS, S2_TOTAL_COLUMNS
+from payoff import DEFAULT_CS_ODDS
+from ratings import normalize_team
+
+# --- 多庄家比价与套利扫描 ---
+# 全部报价放进一个 (比赛, 庄家, 结果) 的赔率立方体，缺价为 NaN：
+#   最优价      -- 沿庄家轴取最大值（同时记下是哪家）；
+#   合成返还率  -- 把互斥且覆盖全部赛果的一组结果（胜平负、大小球、0/1/2/3+球、波胆）
+#                 的 Σ 1/最优价 做成一次 (F, O) @ (O, M) 的矩阵乘法，< 1 即为套利；
+#   等回报分配  -- 每个结果投入 T × (1/赔率) / Σ(1/赔率)，任一赛果的回报都是 T / Σ(1/赔率)。
+# 结果名沿用实时行情和回测数据集的盘口名（o25_odds、cs_1-1、tg_0、s2_win_odds……），
+# 另加 u25_odds（小球2.5）；赔率表为长表，每行一条报价：
+#   home_team, away_team, bookmaker, market, odds
+
+BOOK_COLUMNS = ["home_team", "away_team", "bookmaker", "market", "odds"]
+CS_MARKETS = [f"cs_{s}" for s in DEFAULT_CS_ODDS]
+
+# 互斥且覆盖全部赛果的结果组；同一个结果可以属于多个组（3球+ 就是大球2.5）。
+# 波胆组按默认的比分列表成组，「其他」三项即列表之外的比分。
+MARKET_GROUPS = {
+    "胜平负": S2_STRONG_COLUMNS,
+    "大小球2.5": ["o25_odds", "u25_odds"],
+    "总进球 0/1/2/3+": S2_TOTAL_COLUMNS + ["o25_odds"],
+    "波胆": CS_MARKETS,
+}
+OUTCOMES = list(dict.fromkeys(o for group in MARKET_GROUPS.values() for o in group))
+OUTCOME_INDEX = {o: i for i, o in enumerate(OUTCOMES)}
+GROUP_NAMES = list(MARKET_GROUPS)
+# (O, M) 结果 -> 组 的0/1矩阵
+GROUP_MATRIX = np.zeros((len(OUTCOMES), len(MARKET_GROUPS)))
+for _j, _group in enumerate(MARKET_GROUPS.values()):
+    GROUP_MATRIX[[OUTCOME_INDEX[o] for o in _group], _j] = 1.0
+
+
+def best_prices(cube):
+    """沿庄家轴取最优价：返回 (最优赔率 (F, O)，缺价为 NaN；庄家下标 (F, O)，缺价为 -1)"""
+    filled = np.nan_to_num(cube, nan=0.0)
+    book = filled.argmax(axis=1)
+    best = np.take_along_axis(filled, book[:, None, :], axis=1)[:, 0, :]
+    missing = best <= 1.0
+    return np.where(missing, np.nan, best), np.where(missing, -1, book)
+
+
+def implied(prices):
+    """1/赔率，缺价（NaN 或 ≤1）为 0"""
+    valid = prices > 1.0
+    return np.where(valid, 1.0 / np.where(valid, prices, 1.0), 0.0)
+
+
+def group_overround(prices, groups=GROUP_MATRIX):
+    """每组结果的 Σ 1/赔率（合成返还率的倒数）；prices 的最后一维为结果，组内有缺价时为 NaN"""
+    overround = implied(prices) @ groups
+    complete = (prices > 1.0).astype(float) @ groups == groups.sum(axis=0)
+    return np.where(complete, overround, np.nan)
+
+
+def arbitrage_stakes(prices, overround, groups=GROUP_MATRIX, total_stake=1.0):
+    """等回报分配：(..., M, O) 每组每个结果的投入，任一赛果回报都是 total_stake / overround"""
+    share = implied(prices)[..., None, :] * groups.T
+    return total_stake * share / overround[..., None]
+
+
+class OddsBook:
+    """多庄家赔率立方体及其最优价、各组合成返还率"""
+
+    def __init__(self, fixtures, bookmakers, cube):
+        self.fixtures = fixtures          # [(主队, 客队)]
+        self.bookmakers = bookmakers      # [庄家]
+        self.cube = cube                  # (F, B, O)
+        self._index = {(normalize_team(h), normalize_team(a)): i for i, (h, a) in enumerate(fixtures)}
+        self.best, self.best_book = best_prices(cube)
+        self.overround = group_overround(self.best)    # (F, M) 用各结果最优价组合
+        self.book_overround = group_overround(cube)    # (F, B, M) 每家自己的抽水
+
+    def fixture_index(self, home, away):
+        """比赛下标，没有这场比赛返回 None"""
+        return self._index.get((normalize_team(home), normalize_team(away)))
+
+    def best_for(self, home, away):
+        """一场比赛各结果的 {盘口: (最优赔率, 庄家)}；没有这场比赛时为空字典"""
+        f = self.fixture_index(home, away)
+        if f is None:
+            return {}
+        return {o: (float(self.best[f, i]), self.bookmakers[self.best_book[f, i]])
+                for i, o in enumerate(OUTCOMES) if self.best_book[f, i] >= 0}
+
+    def price_table(self, home, away):
+        """一场比赛的比价表：每个结果的最优价、所在庄家、平均价、报价家数"""
+        f = self.fixture_index(home, away)
+        if f is None:
+            return pd.DataFrame()
+        quotes = self.cube[f]
+        counts = np.isfinite(quotes).sum(axis=0)
+        rows = []
+        for i, o in enumerate(OUTCOMES):
+            if counts[i]:
+                rows.append({"盘口": o, "最优赔率": self.best[f, i], "庄家": self.bookmakers[self.best_book[f, i]],
+                             "平均赔率": round(float(np.nanmean(quotes[:, i])), 3), "报价家数": int(counts[i])})
+        return pd.DataFrame(rows)
+
+    def scan(self, max_overround=1.0, total_stake=100.0):
+        """各组最优价合成返还率低于门槛（< max_overround 即 Σ1/赔率）的组合及等回报投注分配"""
+        hit_f, hit_m = np.nonzero(self.overround < max_overround)
+        order = np.argsort(self.overround[hit_f, hit_m], kind="stable")
+        hit_f, hit_m = hit_f[order], hit_m[order]
+        overround = self.overround[hit_f, hit_m]
+        stakes = arbitrage_stakes(self.best[hit_f], self.overround[hit_f], total_stake=total_stake)
+        stakes = stakes[np.arange(len(hit_f)), hit_m]
+        rows = []
+        for k, (f, m) in enumerate(zip(hit_f.tolist(), hit_m.tolist())):
+            legs = np.nonzero(GROUP_MATRIX[:, m])[0]
+            home, away = self.fixtures[f]
+            rows.append({
+                "比赛": f"{home} vs {away}", "盘口组": GROUP_NAMES[m],
+                "Σ1/赔率": round(float(overround[k]), 4),
+                "保证盈亏": round(total_stake / overround[k] - total_stake, 2),
+                "投注分配": "；".join(f"{OUTCOMES[i]}@{self.best[f, i]:.2f}({self.bookmakers[self.best_book[f, i]]})"
+                                     f" ${stakes[k, i]:.2f}" for i in legs),
+            })
+        return pd.DataFrame(rows, columns=["比赛", "盘口组", "Σ1/赔率", "保证盈亏", "投注分配"])
+
+
+def book_from_frame(df):
+    """用长表报价（home_team, away_team, bookmaker, market, odds）建立赔率立方体
+
+    不认识的盘口和无效赔率（≤1）忽略；同一庄家同一结果有多条报价时以最后一条为准。
+    """
+    missing = [c for c in BOOK_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"赔率表缺少列: {', '.join(missing)}")
+    odds = pd.to_numeric(df["odds"], errors="coerce").to_numpy(dtype=float)
+    outcome = df["market"].astype(str).str.strip().map(OUTCOME_INDEX).to_numpy(dtype=float)
+    keep = (odds > 1.0) & np.isfinite(outcome)
+    df = df[keep]
+    # 先按原始队名去重，只对不同的写法做规范化
+    raw_codes, raw_pairs = pd.factorize(df["home_team"].astype(str) + "\0" + df["away_team"].astype(str))
+    raw_pairs = [pair.split("\0") for pair in raw_pairs]
+    pair_codes, _ = pd.factorize(pd.Index([normalize_team(h) + "\0" + normalize_team(a) for h, a in raw_pairs]))
+    fixture_codes = pair_codes[raw_codes]
+    # 每场比赛的显示名取第一次出现的写法
+    first = np.unique(pair_codes, return_index=True)[1]
+    fixtures = [(raw_pairs[i][0].strip(), raw_pairs[i][1].strip()) for i in first]
+    book_codes, bookmakers = pd.factorize(df["bookmaker"].astype(str).str.strip())
+    cube = np.full((len(fixtures), len(bookmakers), len(OUTCOMES)), np.nan)
+    cube[fixture_codes, book_codes, outcome[keep].astype(np.int64)] = odds[keep]
+    return OddsBook(fixtures, list(bookmakers), cube)
+
+
+def synthetic_cube(n_fixtures, n_books, margin=0.05, noise=0.015, missing=0.1, seed=None):
+    """按公平概率 + 各家抽水 + 报价噪声生成模拟赔率立方体（部分报价缺失）"""
+    rng = np.random.default_rng(seed)
+    fair = np.empty((n_fixtures, len(OUTCOMES)))
+    for group in MARKET_GROUPS.values():
+        idx = [OUTCOME_INDEX[o] for o in group]
+        fair[:, idx] = rng.dirichlet(np.full(len(idx), 2.0), n_fixtures)
+    # 大球同时属于两组：让「总进球」组与大小球组一致
+    over = fair[:, OUTCOME_INDEX["o25_odds"]]
+    fair[:, OUTCOME_INDEX["u25_odds"]] = 1 - over
+    tg = [OUTCOME_INDEX[o] for o in S2_TOTAL_COLUMNS]
+    fair[:, tg] *= ((1 - over) / fair[:, tg].sum(axis=1))[:, None]
+    book_margin = rng.uniform(margin / 2, margin * 1.5, n_books)
+    cube = 1 / (fair[:, None, :] * (1 + book_margin[None, :, None]))
+    cube *= np.exp(rng.normal(0, noise, cube.shape))
+    cube[rng.random(cube.shape) < missing] = np.nan
+    return np.round(np.maximum(cube, 1.01), 2)
+
+
+if __name__ == "__main__":
+    # 基准：python bookmakers.py [比赛数] [庄家数]
+    n_fixtures = int(sys.argv[1]) if len(sys.argv) >= 2 else 500
+    n_books = int(sys.argv[2]) if len(sys.argv) >= 3 else 20
+    cube = synthetic_cube(n_fixtures, n_books, seed=0)
+    fixtures = [(f"Home {i}", f"Away {i}") for i in range(n_fixtures)]
+    bookmakers = [f"Book {b}" for b in range(n_books)]
+
+    start = time.perf_counter()
+    book = OddsBook(fixtures, bookmakers, cube)
+    opportunities = book.scan(max_overround=1.0)
+    scan_ms = (time.perf_counter() - start) * 1000
+    print(f"{n_fixtures} 场 × {n_books} 家 × {len(OUTCOMES)} 个结果：最优价 + 合成返还率 + 套利分配 {scan_ms:.1f} ms，"
+          f"套利组合 {len(opportunities)} 个")
+
+    f, b, o = np.nonzero(np.isfinite(cube))
+    long = pd.DataFrame({"home_team": [fixtures[i][0] for i in f], "away_team": [fixtures[i][1] for i in f],
+                         "bookmaker": [bookmakers[i] for i in b], "market": [OUTCOMES[i] for i in o],
+                         "odds": cube[f, b, o]})
+    start = time.perf_counter()
+    rebuilt = book_from_frame(long)
+    print(f"长表 {len(long)} 条报价 -> 立方体：{(time.perf_counter() - start) * 1000:.0f} ms，"
+          f"与直接构建一致 {np.allclose(rebuilt.overround, book.overround, equal_nan=True)}")
+    if len(opportunities):
+        row = opportunities.iloc[0]
+        print(f"最佳：{row['比赛']} {row['盘口组']} Σ1/赔率 {row['Σ1/赔率']}，每 $100 保证盈利 ${row['保证盈亏']}")
@@ -0,0 +1,119 @@
+import numpy as np
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from strategies import fixture_net
+
+# --- 比分盈亏热力图 ---
+# 单场：净盈亏 + 概率 两张 (主队进球 × 客队进球) 热力图。
+# 多场：每个比分格子是一个点，用 WebGL (Scattergl) 绘制，上千个格子也能流畅缩放。
+# 图对象缓存在调用方（session_state），只有投注金额/赔率变化时原地替换 z 值，不重建图。
+
+PNL_COLORSCALE = [[0.0, "#ff6b6b"], [0.5, "#f8f9fa"], [1.0, "#1dd1a1"]]
+
+
+def _cell_text(net_grid, prob_grid):
+    """每个格子的悬浮提示"""
+    return [[f"净盈亏 ${n:.2f}<br>概率 {p * 100:.2f}%" for n, p in zip(nr, pr)]
+            for nr, pr in zip(net_grid, prob_grid)]
+
+
+def _pnl_range(net_grid):
+    """让0落在颜色刻度中间"""
+    bound = float(np.abs(net_grid).max()) or 1.0
+    return -bound, bound
+
+
+def build_score_heatmap(net_grid, prob_grid, home_team, away_team):
+    """新建单场比分热力图（左：净盈亏，右：概率）"""
+    goals = list(range(net_grid.shape[0]))
+    zmin, zmax = _pnl_range(net_grid)
+    fig = make_subplots(rows=1, cols=2, subplot_titles=("净盈亏 ($)", "比分概率 (%)"),
+                        horizontal_spacing=0.12)
+    fig.add_trace(go.Heatmap(
+        z=net_grid, x=goals, y=goals, colorscale=PNL_COLORSCALE, zmin=zmin, zmax=zmax,
+        text=_cell_text(net_grid, prob_grid), hoverinfo="text",
+        colorbar=dict(x=0.44, title="$"),
+    ), row=1, col=1)
+    fig.add_trace(go.Heatmap(
+        z=prob_grid * 100, x=goals, y=goals, colorscale="Blues",
+        text=_cell_text(net_grid, prob_grid), hoverinfo="text",
+        colorbar=dict(title="%"),
+    ), row=1, col=2)
+    for col in (1, 2):
+        fig.update_xaxes(title_text=f"{away_team} 进球", dtick=1, row=1, col=col)
+        fig.update_yaxes(title_text=f"{home_team} 进球", dtick=1, row=1, col=col)
+    fig.update_layout(height=420, margin=dict(l=40, r=20, t=40, b=40))
+    return fig
+
+
+def update_score_heatmap(fig, net_grid, prob_grid):
+    """原地更新已有热力图的数据（网格大小不变时使用）"""
+    zmin, zmax = _pnl_range(net_grid)
+    text = _cell_text(net_grid, prob_grid)
+    fig.data[0].update(z=net_grid, zmin=zmin, zmax=zmax, text=text)
+    fig.data[1].update(z=prob_grid * 100, text=text)
+    return fig
+
+
+def score_heatmap(cache, net_grid, prob_grid, home_team, away_team):
+    """取缓存的热力图并更新；球队或网格大小变化时才重建
+
+    cache 是可变字典（通常是 st.session_state 中的一项）
+    """
+    key = (home_team, away_team, net_grid.shape)
+    fig = cache.get("fig")
+    if fig is None or cache.get("key") != key:
+        fig = build_score_heatmap(net_grid, prob_grid, home_team, away_team)
+        cache["fig"], cache["key"] = fig, key
+    else:
+        update_score_heatmap(fig, net_grid, prob_grid)
+    return fig
+
+
+def multi_fixture_scatter(fixture_labels, net_grids, prob_grids):
+    """多场比赛的比分盈亏散点图（WebGL）
+
+    net_grids / prob_grids 形状为 (比赛数, G+1, G+1)；
+    x 轴为比赛，y 轴为比分，颜色为净盈亏，点大小为概率。
+    """
+    net_grids = np.asarray(net_grids, dtype=float)
+    prob_grids = np.asarray(prob_grids, dtype=float)
+    n_fix, size = net_grids.shape[0], net_grids.shape[1]
+    h, a = np.meshgrid(np.arange(size), np.arange(size), indexing="ij")
+    score_labels = np.array([f"{i}-{j}" for i, j in zip(h.ravel(), a.ravel())])
+
+    x = np.repeat(np.arange(n_fix), size * size)
+    y = np.tile(np.arange(size * size), n_fix)
+    net = net_grids.reshape(-1)
+    prob = prob_grids.reshape(-1)
+    zmin, zmax = _pnl_range(net_grids)
+    fig = go.Figure(go.Scattergl(
+        x=x, y=y, mode="markers",
+        marker=dict(
+            color=net, colorscale=PNL_COLORSCALE, cmin=zmin, cmax=zmax,
+            size=4 + 40 * np.sqrt(prob), colorbar=dict(title="$"),
+        ),
+        customdata=np.column_stack([
+            np.repeat(np.asarray(fixture_labels, dtype=object), size * size),
+            np.tile(score_labels, n_fix), np.round(net, 2), np.round(prob * 100, 2),
+        ]),
+        hovertemplate="%{customdata[0]}<br>比分 %{customdata[1]}<br>"
+                      "净盈亏 $%{customdata[2]}<br>概率 %{customdata[3]}%<extra></extra>",
+    ))
+    fig.update_xaxes(tickvals=list(range(n_fix)), ticktext=list(fixture_labels), title_text="比赛")
+    fig.update_yaxes(tickvals=list(range(size * size)), ticktext=list(score_labels), title_text="比分")
+    fig.update_layout(height=max(420, 12 * size * size), margin=dict(l=40, r=20, t=20, b=40))
+    return fig
+
+
+def fixture_score_grids(fixture, prob_model, max_goals):
+    """按比赛日报告的比赛字典计算 (净盈亏网格, 概率网格)；策略2取稳胆命中情形
+
+    prob_model(pred_prob) 返回该大球概率对应的 InPlayModel
+    """
+    size = (max_goals + 1) ** 2
+    # 结果空间的第一个状态即稳胆命中（没有关联腿的策略只有这一个状态）
+    net = fixture_net(fixture, max_goals)[:size].reshape(max_goals + 1, max_goals + 1)
+    prob = prob_model(fixture["pred_prob"]).final_score_matrix(0, 0, 0, max_goals)[0]
+    return net, prob
@@ -0,0 +1,89 @@
+import hashlib
+import pickle
+from collections import Counter
+
+# --- 派生结果依赖图 ---
+# 页面上的每个派生量都声明自己的输入（源输入或其他派生量），
+# 结果按输入指纹缓存：某个组件变化时，只有依赖它的下游节点指纹改变并重算，
+# 其余节点直接命中缓存。计算是惰性的，只在 get() 时按需进行。
+
+
+def fingerprint(value):
+    """计算任意值的指纹（不可pickle的对象退回到repr）"""
+    try:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        data = repr(value).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class DataflowGraph:
+    """带指纹缓存的依赖图：源输入用 set() 写入，派生量用 get() 读取"""
+
+    def __init__(self):
+        self._funcs = {}
+        self._inputs = {}
+        self._sources = {}   # 源输入 -> (指纹, 值)
+        self._cache = {}     # 派生量 -> (输入指纹, 值)
+        self.recompute_counts = Counter()
+        self.hit_counts = Counter()
+
+    def define(self, name, inputs, func):
+        """注册派生量；重复注册只替换函数，保留已有缓存"""
+        self._funcs[name] = func
+        self._inputs[name] = list(inputs)
+
+    def set(self, **values):
+        """写入（或更新）源输入"""
+        for name, value in values.items():
+            fp = fingerprint(value)
+            current = self._sources.get(name)
+            if current is None or current[0] != fp:
+                self._sources[name] = (fp, value)
+
+    def fingerprint_of(self, name, _memo=None):
+        """源输入的指纹，或派生量全部上游源输入指纹的组合"""
+        memo = {} if _memo is None else _memo
+        if name in memo:
+            return memo[name]
+        if name in self._sources:
+            fp = self._sources[name][0]
+        elif name in self._funcs:
+            parts = [name] + [f"{i}={self.fingerprint_of(i, memo)}" for i in self._inputs[name]]
+            fp = hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+        else:
+            raise KeyError(f"未设置的输入: {name}")
+        memo[name] = fp
+        return fp
+
+    def get(self, name):
+        """读取源输入或派生量；输入指纹未变时直接返回缓存"""
+        if name in self._sources:
+            return self._sources[name][1]
+        fp = self.fingerprint_of(name)
+        cached = self._cache.get(name)
+        if cached is not None and cached[0] == fp:
+            self.hit_counts[name] += 1
+            return cached[1]
+        value = self._funcs[name](*[self.get(i) for i in self._inputs[name]])
+        self._cache[name] = (fp, value)
+        self.recompute_counts[name] += 1
+        return value
+
+    def downstream(self, source):
+        """依赖某个输入的全部派生量（用于检查失效范围）"""
+        found = set()
+        frontier = {source}
+        while frontier:
+            frontier = {n for n, ins in self._inputs.items()
+                        if n not in found and frontier.intersection(ins)}
+            found |= frontier
+        return found
+
+    def counts(self):
+        """每个派生量的重算/命中次数"""
+        return [
+            {"节点": name, "输入": ", ".join(self._inputs[name]),
+             "重算次数": self.recompute_counts[name], "缓存命中": self.hit_counts[name]}
+            for name in self._funcs
+        ]
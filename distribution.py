@@ -0,0 +1,187 @@
+import sys
+import time
+
+import numpy as np
+
+from payoff import MAX_GRID_GOALS
+from strategies import fixture_net, outcome_probs
+
+# --- 组合盈亏的精确分布（FFT卷积） ---
+# 每场比赛的结果是离散的（比分网格 × 稳胆命中与否），各场之间相互独立，
+# 所以组合的盈亏分布就是各场分布的卷积，不需要抽样。
+# 做法：把每场的净盈亏落到固定步长的金额网格上，得到一个概率向量，
+# 再按二叉树两两做 FFT 卷积（每一层的总长度不变，总代价约 N·logN·log场数）。
+# 误差只来自金额取整：每场最多半个步长。
+
+DEFAULT_STEP = 1.0
+# 金额网格上限（格数），超过时自动放大步长
+MAX_BINS = 1 << 21
+DEFAULT_ALPHAS = (0.95, 0.99)
+DEFAULT_QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+def fixture_outcomes(fixture, home_share=None, minute=0, home_score=0, away_score=0, max_goals=MAX_GRID_GOALS):
+    """把比赛字典展开为 (每个结果的净盈亏, 概率) 两个一维数组，概率和为1
+
+    结果空间和收益由策略插件给出（strategies.py）：策略1是完整比分网格，
+    策略2再乘上稳胆命中/未命中两种情形，稳胆命中概率取所选选项的赔率隐含概率（去水）。
+    home_share 不给时取比赛字典里的主队进球占比，与页面EV一致。
+    """
+    return (fixture_net(fixture, max_goals),
+            outcome_probs(fixture, home_share, minute, home_score, away_score, max_goals))
+
+
+def _on_grid(net, prob, step):
+    """单场分布落到金额网格：返回 (起始格号, 概率向量)"""
+    idx = np.rint(np.asarray(net, dtype=float) / step).astype(np.int64)
+    lo = int(idx.min())
+    return lo, np.bincount(idx - lo, weights=prob)
+
+
+def _fft_convolve(a, b):
+    """两个概率向量的线性卷积（FFT），去掉舍入产生的微小负数"""
+    n = len(a) + len(b) - 1
+    size = 1 << (n - 1).bit_length()
+    out = np.fft.irfft(np.fft.rfft(a, size) * np.fft.rfft(b, size), size)[:n]
+    return np.clip(out, 0.0, None)
+
+
+def convolve_all(pmfs):
+    """按二叉树两两卷积全部概率向量"""
+    pmfs = list(pmfs)
+    if not pmfs:
+        return np.ones(1)
+    while len(pmfs) > 1:
+        nxt = [_fft_convolve(pmfs[i], pmfs[i + 1]) for i in range(0, len(pmfs) - 1, 2)]
+        if len(pmfs) % 2:
+            nxt.append(pmfs[-1])
+        pmfs = nxt
+    return pmfs[0]
+
+
+class PnLDistribution:
+    """金额网格上的组合盈亏分布：values[i] 的概率为 pmf[i]"""
+
+    def __init__(self, values, pmf, step):
+        self.values = values
+        self.pmf = pmf / pmf.sum()
+        self.cdf = np.cumsum(self.pmf)
+        self.step = step
+
+    @property
+    def mean(self):
+        return float(self.values @ self.pmf)
+
+    @property
+    def std(self):
+        return float(np.sqrt(((self.values - self.mean) ** 2) @ self.pmf))
+
+    @property
+    def loss_prob(self):
+        return float(self.pmf[self.values < 0].sum())
+
+    def quantile(self, q):
+        """最小的 v 使 P(盈亏 ≤ v) ≥ q"""
+        i = min(int(np.searchsorted(self.cdf, q - 1e-12)), len(self.values) - 1)
+        return float(self.values[i])
+
+    def var(self, alpha):
+        """在险价值（以正数表示亏损）"""
+        return -self.quantile(1 - alpha)
+
+    def cvar(self, alpha):
+        """条件在险价值：最差 (1-alpha) 尾部的平均亏损，边界格按比例计入"""
+        tail = 1 - alpha
+        i = min(int(np.searchsorted(self.cdf, tail - 1e-12)), len(self.values) - 1)
+        below = self.cdf[i - 1] if i > 0 else 0.0
+        tail_sum = self.values[:i] @ self.pmf[:i] + (tail - below) * self.values[i]
+        return float(-tail_sum / tail)
+
+    def summary(self, alphas=DEFAULT_ALPHAS, quantiles=DEFAULT_QUANTILES):
+        out = {"期望": self.mean, "标准差": self.std, "亏损概率": self.loss_prob}
+        for a in alphas:
+            out[f"VaR {a:.0%}"] = self.var(a)
+            out[f"CVaR {a:.0%}"] = self.cvar(a)
+        for q in quantiles:
+            out[f"分位数 {q:.0%}"] = self.quantile(q)
+        return out
+
+
+def portfolio_distribution(outcomes, step=DEFAULT_STEP):
+    """多场比赛组合盈亏的精确分布
+
+    outcomes -- [(净盈亏数组, 概率数组), ...]，每场一项（见 fixture_outcomes）
+    step     -- 金额网格步长；总格数超过 MAX_BINS 时自动放大
+    """
+    span = sum(float(np.ptp(net)) for net, _ in outcomes)
+    step = max(step, span / MAX_BINS)
+    grids = [_on_grid(net, prob, step) for net, prob in outcomes]
+    pmf = convolve_all(g[1] for g in grids)
+    lo = sum(g[0] for g in grids)
+    values = (lo + np.arange(len(pmf))) * step
+    return PnLDistribution(values, pmf, step)
+
+
+def monte_carlo_pnl(outcomes, n_trials=100000, seed=None):
+    """抽样得到组合盈亏样本（用于和精确分布交叉核对）"""
+    rng = np.random.default_rng(seed)
+    total = np.zeros(int(n_trials))
+    for net, prob in outcomes:
+        total += np.asarray(net)[rng.choice(len(net), size=int(n_trials), p=prob)]
+    return total
+
+
+def sample_summary(samples, alphas=DEFAULT_ALPHAS, quantiles=DEFAULT_QUANTILES):
+    """样本的同口径统计"""
+    samples = np.sort(np.asarray(samples, dtype=float))
+    n = len(samples)
+    out = {"期望": float(samples.mean()), "标准差": float(samples.std()),
+           "亏损概率": float((samples < 0).mean())}
+    for a in alphas:
+        k = max(1, int(np.ceil((1 - a) * n)))
+        out[f"VaR {a:.0%}"] = -float(samples[k - 1])
+        out[f"CVaR {a:.0%}"] = -float(samples[:k].mean())
+    for q in quantiles:
+        out[f"分位数 {q:.0%}"] = float(samples[min(n - 1, max(0, int(np.ceil(q * n)) - 1))])
+    return out
+
+
+def cross_check(outcomes, n_trials=100000, step=DEFAULT_STEP, seed=None):
+    """精确分布与蒙特卡洛逐项对照，返回表格行"""
+    exact = portfolio_distribution(outcomes, step).summary()
+    sampled = sample_summary(monte_carlo_pnl(outcomes, n_trials, seed))
+    return [{"指标": k, "精确卷积": exact[k], "蒙特卡洛": sampled[k], "差值": sampled[k] - exact[k]}
+            for k in exact]
+
+
+def random_book(n_fixtures, seed=0):
+    """基准测试用的随机投注簿（策略1/2各半）"""
+    rng = np.random.default_rng(seed)
+    book = []
+    for i in range(n_fixtures):
+        base = {"pred_prob": float(rng.uniform(0.35, 0.65)), "o25_odds": float(rng.uniform(1.7, 2.3)),
+                "o25_stake": float(rng.choice([50, 100]))}
+        if i % 2 == 0:
+            base["score_bets"] = {s: (float(o * rng.uniform(0.9, 1.1)), 10.0) for s, o in
+                                  {"0-0": 10, "1-0": 8.5, "0-1": 8, "1-1": 7}.items()}
+        else:
+            base.update(s2_selection="胜", s2_odds=[1.5, 4.0, 6.0], goal_odds={"1球": 4.5, "2球": 3.4},
+                        parlay_stake=10.0)
+        book.append(base)
+    return book
+
+
+if __name__ == "__main__":
+    # 基准：python distribution.py [比赛数]
+    n = int(sys.argv[1]) if len(sys.argv) >= 2 else 300
+    outcomes = [fixture_outcomes(f) for f in random_book(n)]
+    start = time.perf_counter()
+    dist = portfolio_distribution(outcomes)
+    exact_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    rows = cross_check(outcomes, n_trials=100000, seed=1)
+    mc_ms = (time.perf_counter() - start) * 1000 - exact_ms
+    print(f"{n} 场：精确卷积 {exact_ms:.1f} ms（{len(dist.pmf)} 格，步长 ${dist.step:g}），"
+          f"蒙特卡洛 10万次 {mc_ms:.0f} ms")
+    for r in rows:
+        print(f"  {r['指标']:<10} 精确 {r['精确卷积']:>12.4f}  抽样 {r['蒙特卡洛']:>12.4f}  差 {r['差值']:>9.4f}")
@@ -0,0 +1,372 @@
+import json
+import multiprocessing
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.parse import parse_qs, urlsplit
+from urllib.request import Request, urlopen
+
+import numpy as np
+import pandas as pd
+
+from archive import open_archive
+from backtest import run_backtest, sweep_grid
+from distribution import fixture_outcomes, portfolio_distribution
+from payoff import MAX_GRID_GOALS
+from strategies import fixture_net, get_strategy
+
+# --- 本地计算服务（仅标准库 HTTP/JSON） ---
+# 参数扫描、回测、模拟等重计算不再占用 Streamlit 的脚本线程：
+# 页面把任务 POST 到本服务，服务放进有界队列交给进程池执行，页面随后轮询结果。
+# 队列满时直接返回 503，由调用方稍后重试，不会把一个用户的大任务堆到所有人头上。
+#
+#   POST /jobs        {"kind": "payoff|ev|simulate|distribution|backtest", ...} -> 202 {"job_id"}
+#   GET  /jobs/<id>   -> {"status": "queued|running|done|error", "result"|"error", "elapsed"}
+#                        加 ?wait=秒 时长轮询：任务结束或超时才返回
+#   GET  /health      -> 队列深度、工作进程数、完成数等
+
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_QUEUE = 32
+# 保留最近完成的任务结果条数
+KEEP_FINISHED = 1000
+# 长轮询单次最多等待的秒数
+MAX_WAIT = 30.0
+
+
+# --- 任务函数（在工作进程中执行，输入输出都是可JSON化的基本类型） ---
+
+def job_payoff(fixture, max_goals=MAX_GRID_GOALS):
+    """每个关联腿状态下完整比分网格上的净盈亏（策略2为稳胆命中/未命中）"""
+    strategy = get_strategy(fixture)
+    states, _ = strategy.states(strategy.defaults(fixture))
+    net = fixture_net(fixture, max_goals).reshape(len(states), max_goals + 1, max_goals + 1)
+    return {"states": states, "net": net.tolist()}
+
+
+def job_ev(fixture, home_share=None, minute=0, home_score=0, away_score=0):
+    """按进球模型计算期望值、标准差和亏损概率"""
+    net, prob = fixture_outcomes(fixture, home_share, minute, home_score, away_score)
+    ev = float(net @ prob)
+    return {"ev": ev, "std": float(np.sqrt(((net - ev) ** 2) @ prob)),
+            "loss_prob": float(prob[net < 0].sum())}
+
+
+def job_simulate(fixture, n_matches=100, n_trials=10000, bankroll=1000.0, home_share=None, seed=None):
+    """重复投注同一方案 n_matches 场，模拟 n_trials 条资金曲线"""
+    net, prob = fixture_outcomes(fixture, home_share)
+    rng = np.random.default_rng(seed)
+    draws = rng.choice(len(net), size=(int(n_trials), int(n_matches)), p=prob)
+    paths = bankroll + np.cumsum(net[draws], axis=1)
+    final = paths[:, -1]
+    return {
+        "mean_final": float(final.mean()),
+        "quantiles": {str(q): float(v) for q, v in zip((5, 25, 50, 75, 95), np.percentile(final, [5, 25, 50, 75, 95]))},
+        "loss_prob": float((final < bankroll).mean()),
+        "ruin_prob": float((paths.min(axis=1) <= 0).mean()),
+    }
+
+
+def job_distribution(fixtures, step=1.0):
+    """多场投注簿的精确盈亏分布统计（VaR/CVaR/亏损概率/分位数）"""
+    return portfolio_distribution([fixture_outcomes(f) for f in fixtures], step).summary()
+
+
+# 工作进程内按路径复用已打开的归档
+_ARCHIVES = {}
+
+
+def job_backtest(strategy, options, columns=None, archive=None):
+    """参数扫描回测；数据为按列的字典 columns，或归档 {"path", "leagues", "start", "end"}"""
+    if archive is not None:
+        arc = _ARCHIVES.get(archive["path"])
+        if arc is None:
+            arc = _ARCHIVES[archive["path"]] = open_archive(archive["path"])
+        data = arc.select(archive.get("leagues"), archive.get("start"), archive.get("end"))
+    else:
+        data = pd.DataFrame(columns)
+    result = run_backtest(data, strategy, sweep_grid(**options))
+    return {
+        "summary": result["summary"].to_dict("list"),
+        "by_league": result["by_league"].to_dict("list"),
+        "cumulative_pnl": np.asarray(result["cumulative_pnl"]).tolist(),
+        "dates": np.datetime_as_string(np.asarray(result["dates"], dtype="datetime64[D]")).tolist(),
+        "dropped": result["dropped"],
+    }
+
+
+def backtest_from_json(payload):
+    """把回测任务的JSON结果还原为 run_backtest 的结构"""
+    return {
+        "summary": pd.DataFrame(payload["summary"]),
+        "by_league": pd.DataFrame(payload["by_league"]),
+        "cumulative_pnl": np.asarray(payload["cumulative_pnl"], dtype=float),
+        "dates": np.asarray(payload["dates"], dtype="datetime64[D]"),
+        "dropped": payload.get("dropped", 0),
+    }
+
+
+JOB_KINDS = {
+    "payoff": job_payoff,
+    "ev": job_ev,
+    "simulate": job_simulate,
+    "distribution": job_distribution,
+    "backtest": job_backtest,
+}
+
+
+def _run_job(kind, params):
+    return JOB_KINDS[kind](**params)
+
+
+# --- 服务端 ---
+
+class QueueFull(Exception):
+    """排队任务已达上限"""
+
+
+class EvalService:
+    """有界任务队列 + 进程池；任务状态保存在内存中"""
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_queue=DEFAULT_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        # 进程池用 spawn，避免在多线程的服务进程里 fork
+        self._pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self.completed = 0
+        self.rejected = 0
+
+    def submit(self, kind, params):
+        """提交任务，返回任务id；队列满时抛出 QueueFull"""
+        if kind not in JOB_KINDS:
+            raise ValueError(f"未知任务类型: {kind}")
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise QueueFull(f"排队任务已达上限 ({self.workers + self.max_queue})")
+        job_id = uuid.uuid4().hex
+        job = {"kind": kind, "submitted": time.perf_counter(), "finished": None, "future": None}
+        with self._lock:
+            self._jobs[job_id] = job
+        job["future"] = self._pool.submit(_run_job, kind, params)
+        job["future"].add_done_callback(lambda _f, j=job: self._finish(j))
+        return job_id
+
+    def _finish(self, job):
+        job["finished"] = time.perf_counter()
+        self._slots.release()
+        with self._lock:
+            self.completed += 1
+            finished = [k for k, j in self._jobs.items() if j["finished"] is not None]
+            for key in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+                del self._jobs[key]
+
+    def status(self, job_id, wait_seconds=0.0):
+        """任务状态；完成时附带结果或错误信息。wait_seconds>0 时最多等待这么久"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        future = job["future"]
+        if future is not None and wait_seconds > 0:
+            wait([future], timeout=min(wait_seconds, MAX_WAIT))
+        if future is None or not future.done():
+            return {"status": "running" if future is not None and future.running() else "queued"}
+        out = {"status": "done", "elapsed": (job["finished"] or time.perf_counter()) - job["submitted"]}
+        error = future.exception()
+        if error is not None:
+            out.update(status="error", error=f"{type(error).__name__}: {error}")
+        else:
+            out["result"] = future.result()
+        return out
+
+    def stats(self):
+        with self._lock:
+            pending = sum(1 for j in self._jobs.values() if j["finished"] is None)
+        return {"workers": self.workers, "max_queue": self.max_queue, "pending": pending,
+                "completed": self.completed, "rejected": self.rejected}
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def _reply(self, code, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path != "/jobs":
+            return self._reply(404, {"error": "not found"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            job_id = self.service.submit(body["kind"], body.get("params", {}))
+        except QueueFull as e:
+            return self._reply(503, {"error": str(e)})
+        except (ValueError, KeyError, TypeError) as e:
+            return self._reply(400, {"error": str(e)})
+        self._reply(202, {"job_id": job_id})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            return self._reply(200, self.service.stats())
+        if url.path.startswith("/jobs/"):
+            try:
+                wait_seconds = float(parse_qs(url.query).get("wait", ["0"])[0])
+                return self._reply(200, self.service.status(url.path[len("/jobs/"):], wait_seconds))
+            except KeyError:
+                return self._reply(404, {"error": "unknown job"})
+            except ValueError as e:
+                return self._reply(400, {"error": str(e)})
+        self._reply(404, {"error": "not found"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_service(host="127.0.0.1", port=DEFAULT_PORT, workers=DEFAULT_WORKERS, max_queue=DEFAULT_MAX_QUEUE):
+    """在后台线程启动服务（port=0 时自动分配端口），返回 (服务器, 服务)"""
+    service = EvalService(workers, max_queue)
+    handler = type("EvalHandler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, service
+
+
+def service_url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+# --- 客户端 ---
+
+class EvalClient:
+    """服务的HTTP客户端：submit() 提交，status() 轮询"""
+
+    def __init__(self, base_url, timeout=10.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _call(self, method, path, body=None):
+        data = None if body is None else json.dumps(body, default=str).encode("utf-8")
+        req = Request(self.base_url + path, data=data, method=method,
+                      headers={"Content-Type": "application/json"})
+        try:
+            with urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read())
+        except HTTPError as e:
+            if e.code == 503:
+                raise QueueFull(json.loads(e.read()).get("error", "")) from None
+            raise
+
+    def submit(self, kind, **params):
+        return self._call("POST", "/jobs", {"kind": kind, "params": params})["job_id"]
+
+    def status(self, job_id, wait_seconds=0.0):
+        path = f"/jobs/{job_id}" + (f"?wait={wait_seconds:g}" if wait_seconds > 0 else "")
+        return self._call("GET", path)
+
+    def health(self):
+        return self._call("GET", "/health")
+
+    def wait(self, job_id, timeout=300.0):
+        """长轮询直到任务结束（脚本和压测使用，页面里用非阻塞的 status() 轮询）"""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            status = self.status(job_id, wait_seconds=min(5.0, self.timeout / 2))
+            if status["status"] in ("done", "error"):
+                return status
+        raise TimeoutError(job_id)
+
+
+# --- 压测 ---
+
+SAMPLE_FIXTURE = {
+    "pred_prob": 0.48, "o25_odds": 2.0, "o25_stake": 100.0,
+    "score_bets": {"0-0": (10.0, 10.0), "1-0": (8.5, 10.0), "0-1": (8.0, 10.0),
+                   "1-1": (7.0, 10.0), "2-0": (13.0, 10.0), "0-2": (12.0, 10.0)},
+}
+
+
+def load_test(base_url, concurrency_levels=(1, 2, 4, 8, 16), jobs_per_level=64,
+              kind="simulate", params=None):
+    """逐级提高并发，统计吞吐量和端到端延迟分位数（提交 -> 拿到结果）"""
+    params = params or {"fixture": SAMPLE_FIXTURE, "n_matches": 50, "n_trials": 2000, "seed": 1}
+    client = EvalClient(base_url)
+
+    def one_job():
+        start = time.perf_counter()
+        retries = 0
+        while True:
+            try:
+                job_id = client.submit(kind, **params)
+                break
+            except QueueFull:
+                retries += 1
+                time.sleep(0.01)
+        status = client.wait(job_id)
+        if status["status"] != "done":
+            raise RuntimeError(status.get("error"))
+        return time.perf_counter() - start, retries
+
+    rows = []
+    for level in concurrency_levels:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(level) as pool:
+            results = list(pool.map(lambda _: one_job(), range(jobs_per_level)))
+        elapsed = time.perf_counter() - start
+        latency = np.array([r[0] for r in results]) * 1000
+        rows.append({
+            "并发": level, "任务数": jobs_per_level, "吞吐量/s": round(jobs_per_level / elapsed, 1),
+            "p50 ms": round(float(np.percentile(latency, 50)), 1),
+            "p95 ms": round(float(np.percentile(latency, 95)), 1),
+            "p99 ms": round(float(np.percentile(latency, 99)), 1),
+            "503重试": sum(r[1] for r in results),
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    # 用法：
+    #   python eval_service.py serve [端口] [工作进程数]
+    #   python eval_service.py loadtest [服务地址]   （不给地址则在本进程内启动一个）
+    if len(sys.argv) >= 2 and sys.argv[1] == "serve":
+        port = int(sys.argv[2]) if len(sys.argv) >= 3 else DEFAULT_PORT
+        workers = int(sys.argv[3]) if len(sys.argv) >= 4 else DEFAULT_WORKERS
+        server, _ = start_service(port=port, workers=workers)
+        print(f"计算服务已启动: {service_url(server)}（{workers} 个工作进程）")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
+    elif len(sys.argv) >= 2 and sys.argv[1] == "loadtest":
+        if len(sys.argv) >= 3:
+            url, service = sys.argv[2], None
+        else:
+            server, service = start_service(port=0, workers=DEFAULT_WORKERS, max_queue=8)
+            url = service_url(server)
+        warm = EvalClient(url)
+        for job_id in [warm.submit("ev", fixture=SAMPLE_FIXTURE) for _ in range(DEFAULT_WORKERS)]:
+            warm.wait(job_id)  # 预热工作进程
+        print(pd.DataFrame(load_test(url)).to_string(index=False))
+        if service is not None:
+            print(service.stats())
+            service.shutdown()
+    else:
+        print("用法: python eval_service.py serve [端口] [工作进程数] | loadtest [服务地址]")
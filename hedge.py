@@ -0,0 +1,224 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from distribution import fixture_outcomes
+from payoff import MAX_GRID_GOALS, S2_RESULTS, S2_TOTALS, correct_score_hits
+from strategies import get_strategy
+
+# --- 对冲 / 提前锁定计算 ---
+# 已下注的投注簿在每个结果上的净盈亏已知（比分网格，策略2再分稳胆命中/未命中），
+# 对冲市场是一组互斥且覆盖全部结果的选项 k（总进球 0/1/2/3+、波胆、稳胆胜平负），当前赔率 o_k。
+# 记 w_k = 选项 k 覆盖的结果里最差的净盈亏，在 k 上追加 x_k 后，k 发生时的盈亏下限为
+#   w_k + x_k·o_k - X,   X = Σ x_k。
+# 令 Y = 保底水平 + X（需要的毛回报），最省的做法是 x_k = max(0, Y - w_k) / o_k，于是
+#   保底 F(Y) = Y - Σ max(0, Y - w_k) / o_k，
+# 这是 Y 的分段线性凹函数，拐点就在各 w_k 处，斜率 1 - Σ_{w_k<Y} 1/o_k。
+# 按 w 排序后用前缀和一次求出所有拐点上的 F：
+#   锁定 -- 取 F 最大的拐点（保底最高，各对冲选项上的盈亏拉平到同一水平）；
+#   止损 -- 在 F 的上升段里反解 F(Y) = 目标保底，得到达到目标所需的最少追加投注。
+# 没有报价的选项按赔率 1 处理（投多少退多少，等于不能对冲）。
+# 多场比赛（以及多个目标）叠成 (场数, 选项数) 的矩阵一起算。
+
+HEDGE_MARKETS = ["总进球 0/1/2/3+", "波胆", "稳胆胜平负"]
+TOTAL_OUTCOMES = S2_TOTALS + ["3球+"]
+
+
+def fixture_hedge_outcomes(fixture, market, score_selections=None, max_goals=MAX_GRID_GOALS):
+    """对冲选项名与「结果 -> 选项」的权重矩阵 (结果数, 选项数)
+
+    结果的排列与 distribution.fixture_outcomes 一致（每个关联腿状态一份比分网格，策略2为 稳胆命中 + 未命中）；
+    状态到胜平负的权重取自策略的 leg_results（稳胆未命中的结果按赔率隐含概率分摊到另外两个选项）。
+    不适用的市场（策略没有胜平负关联腿、没有波胆选项）返回 (None, None)。
+    """
+    h, a = (g.ravel() for g in np.meshgrid(np.arange(max_goals + 1), np.arange(max_goals + 1), indexing="ij"))
+    strategy = get_strategy(fixture)
+    fixture = strategy.defaults(fixture)
+    n_states = len(strategy.states(fixture)[0])
+    if market == "稳胆胜平负":
+        legs = strategy.leg_results(fixture)
+        if legs is None:
+            return None, None
+        return list(S2_RESULTS), np.repeat(legs[1], h.size, axis=0)
+    if market == "总进球 0/1/2/3+":
+        names = TOTAL_OUTCOMES
+        weights = (np.minimum(h + a, 3)[:, None] == np.arange(4)).astype(float)
+    else:
+        names = list(score_selections if score_selections is not None else fixture.get("score_bets", {}))
+        if not names:
+            return None, None
+        weights = correct_score_hits(h, a, names).astype(float)
+    return names, np.tile(weights, (n_states, 1))
+
+
+def fixture_hedge_odds(fixture, market, names):
+    """比赛字典里已有的当前赔率（总进球取策略2的总进球赔率 + 大球赔率，波胆取盘口表，稳胆取胜平负），缺价为 NaN"""
+    if market == "总进球 0/1/2/3+":
+        known = dict(fixture.get("goal_odds", {}), **{"3球+": fixture["o25_odds"]})
+    elif market == "波胆":
+        known = {s: odd for s, (odd, _) in fixture.get("score_bets", {}).items()}
+    else:
+        known = dict(zip(S2_RESULTS, fixture.get("s2_odds", [])))
+    return np.array([float(known.get(n, np.nan)) for n in names])
+
+
+def outcome_floors(net, weights):
+    """(N, C) 净盈亏 + (N, C, K) 权重 -> (N, K) 每个对冲选项覆盖结果里的最差净盈亏
+
+    没有覆盖任何结果的选项取该场的最大净盈亏（不会成为需要对冲的一方）。
+    """
+    covered = weights > 0
+    floors = np.where(covered, net[:, :, None], np.inf).min(axis=1)
+    return np.where(np.isfinite(floors), floors, np.nanmax(np.where(np.isfinite(net), net, np.nan), axis=1)[:, None])
+
+
+def _breakpoints(w, odds):
+    """按 w 排序后的拐点：返回 (排序, 各拐点 Y, 前缀 Σ1/o, 各拐点保底 F)"""
+    odds = np.where(odds > 1.0, odds, 1.0)
+    order = np.argsort(w, axis=1, kind="stable")
+    ws = np.take_along_axis(w, order, axis=1)
+    inv = 1.0 / np.take_along_axis(odds, order, axis=1)
+    r = np.cumsum(inv, axis=1)
+    cost = r * ws - np.cumsum(ws * inv, axis=1)
+    return ws, r, ws - cost
+
+
+def _stakes(w, odds, level):
+    odds = np.where(odds > 1.0, odds, 1.0)
+    stakes = np.maximum(0.0, level[:, None] - w) / odds
+    # 赔率为1的选项投了也只是退回本金，不下注
+    return np.where(odds > 1.0, stakes, 0.0)
+
+
+def lock_hedge(w, odds):
+    """锁定：使保底最高的追加投注 (N, K)、保底 (N,)，以及最优价合成返还率<1（可无限套利）的标记"""
+    ws, r, floor = _breakpoints(w, odds)
+    best = floor.argmax(axis=1)
+    rows = np.arange(len(w))
+    level = ws[rows, best]
+    stakes = _stakes(w, odds, level)
+    return {"stakes": stakes, "total": stakes.sum(axis=1), "floor": floor[rows, best], "arbitrage": r[:, -1] < 1.0}
+
+
+def floor_hedge(w, odds, target):
+    """止损：把保底抬到 target（标量或 (N,)）所需的最少追加投注；做不到的场次为 NaN"""
+    ws, r, floor = _breakpoints(w, odds)
+    n, k = w.shape
+    target = np.broadcast_to(np.asarray(target, dtype=float), (n,))
+    rows = np.arange(n)
+    peak = floor.argmax(axis=1)
+    # 上升段（到最高点为止）里第一个达到目标的拐点；套利时最后一段无限上升
+    rising = np.arange(k)[None, :] <= peak[:, None]
+    reached = rising & (floor >= target[:, None])
+    first = np.where(reached.any(axis=1), reached.argmax(axis=1), peak + 1)
+    prev = np.maximum(first - 1, 0)
+    slope = 1.0 - r[rows, prev]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        level = np.where(first == 0, ws[:, 0], ws[rows, prev] + (target - floor[rows, prev]) / slope)
+    # 目标高于最高保底：只有在最后一段还在上升（套利）时才能达到
+    feasible = (first <= peak) | ((peak == k - 1) & (r[:, -1] < 1.0))
+    feasible &= np.isfinite(level)
+    stakes = _stakes(w, odds, np.where(feasible, level, ws[:, 0]))
+    stakes[~feasible] = np.nan
+    return {"stakes": stakes, "total": stakes.sum(axis=1), "feasible": feasible}
+
+
+def hedged_floors(w, odds, stakes):
+    """追加投注后每个对冲选项发生时的盈亏下限 (N, K)"""
+    odds = np.where(odds > 1.0, odds, 1.0)
+    return w + stakes * odds - stakes.sum(axis=1, keepdims=True)
+
+
+def book_hedge(fixtures, market, target=None, home_share=0.5, odds_override=None):
+    """整个投注簿按同一对冲市场批量求解
+
+    每场按比赛字典里的当前赔率（odds_override[i] 可替换为 (K,) 数组）。
+    target 为 None 时求锁定，否则求把保底抬到 target 的止损方案。
+    返回 (每场汇总表, 明细字典列表)。
+    """
+    items = []
+    for i, fixture in enumerate(fixtures):
+        names, weights = fixture_hedge_outcomes(fixture, market)
+        if names is None:
+            continue
+        net, prob = fixture_outcomes(fixture, fixture.get("home_share", home_share))
+        odds = fixture_hedge_odds(fixture, market, names)
+        if odds_override is not None and odds_override[i] is not None:
+            odds = np.asarray(odds_override[i], dtype=float)
+        items.append((i, names, weights, net, prob, odds))
+    if not items:
+        return pd.DataFrame(), []
+
+    # 不同场次的结果数/选项数不同：补齐成矩阵，补的结果净盈亏为 +inf、权重为0，补的选项无报价
+    n_cells = max(len(it[3]) for it in items)
+    n_out = max(len(it[1]) for it in items)
+    net = np.full((len(items), n_cells), np.inf)
+    prob = np.zeros((len(items), n_cells))
+    weights = np.zeros((len(items), n_cells, n_out))
+    odds = np.full((len(items), n_out), np.nan)
+    for row, (_, names, wts, nt, pb, od) in enumerate(items):
+        net[row, :len(nt)] = nt
+        prob[row, :len(pb)] = pb
+        weights[row, :wts.shape[0], :wts.shape[1]] = wts
+        odds[row, :len(od)] = od
+    w = outcome_floors(net, weights)
+    if target is None:
+        result = lock_hedge(w, odds)
+        stakes = result["stakes"]
+    else:
+        result = floor_hedge(w, odds, target)
+        stakes = np.nan_to_num(result["stakes"])
+    after = hedged_floors(w, odds, stakes)
+    outcome_prob = np.einsum("nc,nck->nk", prob, weights)
+    ev_before = np.nansum(np.where(np.isfinite(net), net, 0.0) * prob, axis=1)
+    ev_change = np.nansum(stakes * (np.where(odds > 1.0, odds, 1.0) * outcome_prob - 1.0), axis=1)
+
+    rows, details = [], []
+    for row, (i, names, *_rest) in enumerate(items):
+        k = len(names)
+        fixture = fixtures[i]
+        ok = target is None or bool(result["feasible"][row])
+        rows.append({
+            "比赛": f"{fixture['home_team']} vs {fixture['away_team']}",
+            "对冲前保底": round(float(w[row, :k].min()), 2),
+            "追加投入": round(float(stakes[row].sum()), 2) if ok else np.nan,
+            "对冲后保底": round(float(after[row, :k].min()), 2) if ok else np.nan,
+            "对冲前EV": round(float(ev_before[row]), 2),
+            "对冲后EV": round(float(ev_before[row] + ev_change[row]), 2) if ok else np.nan,
+        })
+        details.append(pd.DataFrame({
+            "选项": names, "当前赔率": odds[row, :k], "模型概率%": np.round(outcome_prob[row, :k] * 100, 2),
+            "对冲前最差": np.round(w[row, :k], 2), "追加投注": np.round(stakes[row, :k], 2),
+            "对冲后最差": np.round(after[row, :k], 2),
+        }))
+    return pd.DataFrame(rows), details
+
+
+if __name__ == "__main__":
+    # 基准：python hedge.py [场数] [选项数]
+    n = int(sys.argv[1]) if len(sys.argv) >= 2 else 10000
+    k = int(sys.argv[2]) if len(sys.argv) >= 3 else 25
+    rng = np.random.default_rng(0)
+    w = rng.normal(0, 100, (n, k))
+    p = rng.dirichlet(np.ones(k), n)
+    odds = np.round(1 / (p * 1.05), 2).clip(1.01)
+    start = time.perf_counter()
+    locked = lock_hedge(w, odds)
+    lock_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    capped = floor_hedge(w, odds, w.min(axis=1) + 20)
+    floor_ms = (time.perf_counter() - start) * 1000
+    print(f"{n} 场 × {k} 个选项：锁定 {lock_ms:.1f} ms，止损 {floor_ms:.1f} ms，"
+          f"止损可行 {capped['feasible'].mean() * 100:.0f}%")
+
+    # 核对：锁定后的保底与逐场网格搜索 Y 的结果一致
+    grid = np.linspace(w.min(), w.max(), 20001)
+    i = 0
+    brute = max(y - (np.maximum(0, y - w[i]) / odds[i]).sum() for y in grid)
+    after = hedged_floors(w, odds, locked["stakes"])
+    print(f"第0场 锁定保底 {locked['floor'][0]:.3f}（网格搜索 {brute:.3f}，对冲后各选项最差 {after[0].min():.3f}）")
+    ok = capped["feasible"]
+    reached = hedged_floors(w[ok], odds[ok], capped["stakes"][ok]).min(axis=1) - (w[ok].min(axis=1) + 20)
+    print(f"止损方案达到目标的最大误差 {np.abs(reached).max():.2e}")
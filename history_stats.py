@@ -0,0 +1,207 @@
+import math
+import re
+import sys
+import time
+from collections import deque
+from datetime import date
+
+import numpy as np
+
+# --- 按日期加权的历史交锋统计 ---
+# 两种口径：
+#   时间衰减 -- 每场权重 2^(-距今天数 / 半衰期)，近期交锋影响更大；
+#   滚动窗口 -- 只看最近 N 场或最近 K 个月。
+# 向量化函数一次处理整段历史（可同时给多个半衰期）；
+# 累加器版本按场追加，每次追加 O(1)（窗口淘汰均摊 O(1)），适合持续写入的数据源。
+
+DEFAULT_HALF_LIFE_DAYS = 365.0
+DAYS_PER_MONTH = 30.4375
+
+_DATE_DMY = re.compile(r"^(\d{1,2})[/.-](\d{1,2})[/.-](\d{4})$")
+_DATE_YMD = re.compile(r"^(\d{4})[/.-](\d{1,2})[/.-](\d{1,2})$")
+
+
+def parse_match_date(text):
+    """解析历史行里的日期（日/月/年 或 年-月-日），无法解析返回 None"""
+    if not text:
+        return None
+    m = _DATE_YMD.match(text)
+    try:
+        if m:
+            return date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+        m = _DATE_DMY.match(text)
+        if m:
+            return date(int(m.group(3)), int(m.group(2)), int(m.group(1)))
+    except ValueError:
+        return None
+    return None
+
+
+def history_arrays(matches):
+    """带日期的比赛按日期排序后转成数组 (日期 datetime64[D], 主队进球, 客队进球)"""
+    dated = sorted((m for m in matches if m.get("date") is not None), key=lambda m: m["date"])
+    days = np.array([m["date"] for m in dated], dtype="datetime64[D]")
+    hg = np.array([m["home_goals"] for m in dated], dtype=float)
+    ag = np.array([m["away_goals"] for m in dated], dtype=float)
+    return days, hg, ag
+
+
+def _weighted_summary(w, hg, ag):
+    """按权重汇总；w 的最后一维对应比赛，可带前导维（如多个半衰期）"""
+    total = w.sum(axis=-1)
+    safe = np.where(total > 0, total, 1.0)
+    goals = hg + ag
+    return {
+        "weight": total,
+        "effective_matches": np.where(total > 0, total ** 2 / np.maximum((w ** 2).sum(axis=-1), 1e-300), 0.0),
+        "home_win_rate": (w @ (hg > ag)) / safe * 100,
+        "draw_rate": (w @ (hg == ag)) / safe * 100,
+        "away_win_rate": (w @ (hg < ag)) / safe * 100,
+        "over_25_rate": (w @ (goals > 2)) / safe * 100,
+        "avg_goals": (w @ goals) / safe,
+        "avg_home_goals": (w @ hg) / safe,
+        "avg_away_goals": (w @ ag) / safe,
+    }
+
+
+def decay_statistics(days, hg, ag, half_life_days=DEFAULT_HALF_LIFE_DAYS, as_of=None):
+    """时间衰减统计；half_life_days 可为数组，一次算出多个半衰期（结果每项的形状与其相同）"""
+    days = np.asarray(days, dtype="datetime64[D]")
+    as_of = days.max() if as_of is None and len(days) else np.datetime64(as_of, "D")
+    age = (as_of - days).astype(float)
+    half = np.asarray(half_life_days, dtype=float)
+    w = np.exp2(-age / half[..., None])
+    return _weighted_summary(w, np.asarray(hg, dtype=float), np.asarray(ag, dtype=float))
+
+
+def window_statistics(days, hg, ag, last_n=None, last_months=None, as_of=None):
+    """滚动窗口统计：最近 last_n 场，或最近 last_months 个月（days 需已排序）"""
+    days = np.asarray(days, dtype="datetime64[D]")
+    w = np.ones(len(days))
+    if last_n is not None:
+        w[:max(0, len(days) - int(last_n))] = 0.0
+    if last_months is not None and len(days):
+        as_of = days.max() if as_of is None else np.datetime64(as_of, "D")
+        w[(as_of - days).astype(float) > last_months * DAYS_PER_MONTH] = 0.0
+    return _weighted_summary(w, np.asarray(hg, dtype=float), np.asarray(ag, dtype=float))
+
+
+# --- 增量累加器 ---
+
+_FIELDS = ("home_win", "draw", "away_win", "over_25", "goals", "home_goals", "away_goals")
+
+
+def _match_terms(home_goals, away_goals):
+    goals = home_goals + away_goals
+    return (float(home_goals > away_goals), float(home_goals == away_goals), float(home_goals < away_goals),
+            float(goals > 2), float(goals), float(home_goals), float(away_goals))
+
+
+def _rates(sums, weight, weight_sq):
+    safe = weight or 1.0
+    return {
+        "weight": weight,
+        "effective_matches": weight ** 2 / weight_sq if weight_sq else 0.0,
+        "home_win_rate": sums[0] / safe * 100,
+        "draw_rate": sums[1] / safe * 100,
+        "away_win_rate": sums[2] / safe * 100,
+        "over_25_rate": sums[3] / safe * 100,
+        "avg_goals": sums[4] / safe,
+        "avg_home_goals": sums[5] / safe,
+        "avg_away_goals": sums[6] / safe,
+    }
+
+
+class DecayAccumulator:
+    """时间衰减累加器：所有加权和都以最近一场的日期为基准，追加一场 O(1)
+
+    比率类统计里公共的衰减因子会约掉，所以读取时不需要再按当前日期重算。
+    """
+
+    def __init__(self, half_life_days=DEFAULT_HALF_LIFE_DAYS):
+        self.half_life_days = half_life_days
+        self.anchor = None
+        self.sums = [0.0] * len(_FIELDS)
+        self.weight = 0.0
+        self.weight_sq = 0.0
+
+    def add(self, match_date, home_goals, away_goals):
+        day = np.datetime64(match_date, "D")
+        if self.anchor is None:
+            self.anchor = day
+        gap = float((day - self.anchor).astype(float))
+        if gap > 0:
+            # 新的一场更晚：已有的和整体衰减到新基准
+            decay = math.exp2(-gap / self.half_life_days)
+            self.sums = [s * decay for s in self.sums]
+            self.weight *= decay
+            self.weight_sq *= decay * decay
+            self.anchor = day
+            w = 1.0
+        else:
+            # 补录更早的比赛：按距基准的天数直接折算权重
+            w = math.exp2(gap / self.half_life_days)
+        for i, term in enumerate(_match_terms(home_goals, away_goals)):
+            self.sums[i] += w * term
+        self.weight += w
+        self.weight_sq += w * w
+
+    def snapshot(self):
+        return _rates(self.sums, self.weight, self.weight_sq)
+
+
+class WindowAccumulator:
+    """滚动窗口累加器：最近 last_n 场和/或最近 last_months 个月，按日期顺序追加"""
+
+    def __init__(self, last_n=None, last_months=None):
+        self.last_n = last_n
+        self.max_age = None if last_months is None else last_months * DAYS_PER_MONTH
+        self.items = deque()
+        self.sums = [0.0] * len(_FIELDS)
+
+    def _drop_left(self):
+        _, terms = self.items.popleft()
+        for i, term in enumerate(terms):
+            self.sums[i] -= term
+
+    def add(self, match_date, home_goals, away_goals):
+        day = np.datetime64(match_date, "D")
+        terms = _match_terms(home_goals, away_goals)
+        self.items.append((day, terms))
+        for i, term in enumerate(terms):
+            self.sums[i] += term
+        if self.last_n is not None and len(self.items) > self.last_n:
+            self._drop_left()
+        if self.max_age is not None:
+            while float((day - self.items[0][0]).astype(float)) > self.max_age:
+                self._drop_left()
+
+    def snapshot(self):
+        n = float(len(self.items))
+        return _rates(self.sums, n, n)
+
+
+if __name__ == "__main__":
+    # 基准：python history_stats.py [场数]
+    n = int(sys.argv[1]) if len(sys.argv) >= 2 else 1000000
+    rng = np.random.default_rng(0)
+    days = np.datetime64("2000-01-01") + np.sort(rng.integers(0, 9000, n)).astype("timedelta64[D]")
+    hg = rng.poisson(1.4, n).astype(float)
+    ag = rng.poisson(1.1, n).astype(float)
+
+    halves = np.array([90.0, 180.0, 365.0, 730.0])
+    start = time.perf_counter()
+    vec = decay_statistics(days, hg, ag, halves)
+    print(f"{n} 场 × {len(halves)} 个半衰期：向量化 {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    acc = DecayAccumulator(365.0)
+    win = WindowAccumulator(last_n=20, last_months=24)
+    m = min(n, 200000)
+    start = time.perf_counter()
+    for i in range(m):
+        acc.add(days[i], hg[i], ag[i])
+        win.add(days[i], hg[i], ag[i])
+    per_add = (time.perf_counter() - start) / m * 1e6
+    check = decay_statistics(days[:m], hg[:m], ag[:m], 365.0)
+    print(f"累加器：每场追加 {per_add:.1f} µs；大球比例 {acc.snapshot()['over_25_rate']:.4f}% "
+          f"(向量化 {float(check['over_25_rate']):.4f}%)")
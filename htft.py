@@ -0,0 +1,156 @@
+import math
+import re
+import sys
+import time
+
+import numpy as np
+
+from inplay import prematch_rates
+
+# --- 半场/全场 (HT/FT) ---
+# 历史战绩每行形如「02/05/2025 Rayo Vallecano 1 - 0 (1 - 0) Getafe」，
+# 一个预编译的正则对整段文本做一次 finditer，同时取出日期、主客队、全场和半场比分；
+# 统计和盘口结算都在 numpy 数组上完成，长历史几乎不增加解析成本。
+
+# 行内空白（不跨行）
+_WS = r"[^\S\n]*"
+HISTORY_LINE = re.compile(
+    rf"^{_WS}(?:(?P<date>\d{{1,4}}[/.-]\d{{1,2}}[/.-]\d{{1,4}}){_WS})?"
+    rf"(?P<home>[^\n]*?){_WS}(?P<fh>\d+){_WS}[-–]{_WS}(?P<fa>\d+)"
+    rf"(?:{_WS}[(（]{_WS}(?P<hh>\d+){_WS}[-–]{_WS}(?P<ha>\d+){_WS}[)）])?"
+    rf"{_WS}(?P<away>[^\n]*?){_WS}$",
+    re.MULTILINE,
+)
+
+# 半全场九个结果（主队视角：主/平/客）
+HTFT_RESULTS = ["主", "平", "客"]
+HTFT_OUTCOMES = [f"{h}/{f}" for h in HTFT_RESULTS for f in HTFT_RESULTS]
+# 上半场进球占全场的默认比例（无半场数据时使用）
+DEFAULT_FIRST_HALF_SHARE = 0.45
+HTFT_MAX_GOALS = 6
+
+
+def parse_history_lines(history_text):
+    """一次扫描整段文本，返回每场的字段字典（半场比分缺失时为 None）"""
+    rows = []
+    for m in HISTORY_LINE.finditer(history_text):
+        date, home, fh, fa, hh, ha, away = m.groups()
+        rows.append({
+            "date": date,
+            "home": home.strip(),
+            "away": away.strip(),
+            "ft": (int(fh), int(fa)),
+            "ht": (int(hh), int(ha)) if hh is not None else None,
+        })
+    return rows
+
+
+def _result_code(home_goals, away_goals):
+    """主/平/客 -> 0/1/2"""
+    return np.where(home_goals > away_goals, 0, np.where(home_goals == away_goals, 1, 2))
+
+
+def htft_statistics(matches):
+    """半全场与下半场进球统计；matches 需带 ht_home_goals/ht_away_goals（缺失为 None）"""
+    with_ht = [m for m in matches if m.get("ht_home_goals") is not None]
+    if not with_ht:
+        return None
+    fh = np.array([m["home_goals"] for m in with_ht])
+    fa = np.array([m["away_goals"] for m in with_ht])
+    hh = np.array([m["ht_home_goals"] for m in with_ht])
+    ha = np.array([m["ht_away_goals"] for m in with_ht])
+    n = len(fh)
+    first = hh + ha
+    second = (fh - hh) + (fa - ha)
+    combo = _result_code(hh, ha) * 3 + _result_code(fh, fa)
+    counts = np.bincount(combo, minlength=9)
+    total_goals = int((first + second).sum())
+    return {
+        "matches_with_ht": n,
+        "htft_counts": dict(zip(HTFT_OUTCOMES, counts.tolist())),
+        "htft_rates": dict(zip(HTFT_OUTCOMES, (counts / n * 100).tolist())),
+        "avg_first_half_goals": float(first.mean()),
+        "avg_second_half_goals": float(second.mean()),
+        "first_half_share": first.sum() / total_goals if total_goals else DEFAULT_FIRST_HALF_SHARE,
+        "second_half_over_15_rate": float((second > 1).mean() * 100),
+        "both_halves_scored_rate": float(((first > 0) & (second > 0)).mean() * 100),
+        "comeback_rate": float((((combo == 2) | (combo == 6)).mean()) * 100),
+        "most_common_htft": HTFT_OUTCOMES[int(counts.argmax())],
+    }
+
+
+def _poisson_pmf(mu, max_goals):
+    k = np.arange(max_goals + 1)
+    log_fact = np.array([math.lgamma(i + 1) for i in k])
+    pmf = np.exp(k * np.log(max(mu, 1e-12)) - mu - log_fact)
+    return pmf / pmf.sum()
+
+
+def joint_grid(over_prob, home_share=0.5, first_half_share=DEFAULT_FIRST_HALF_SHARE, max_goals=HTFT_MAX_GOALS):
+    """(半场比分, 下半场进球) 的联合网格，展开成一维
+
+    返回 (hh, ha, fh, fa, prob)：每个格子的半场/全场比分和概率。
+    两个半场的进球相互独立，各自服从 Poisson(λ × 半场占比)。
+    """
+    lam_home, lam_away = prematch_rates(over_prob, home_share)
+    s = first_half_share
+    p1 = np.outer(_poisson_pmf(lam_home * s, max_goals), _poisson_pmf(lam_away * s, max_goals))
+    p2 = np.outer(_poisson_pmf(lam_home * (1 - s), max_goals), _poisson_pmf(lam_away * (1 - s), max_goals))
+    k = np.arange(max_goals + 1)
+    hh, ha, sh, sa = np.meshgrid(k, k, k, k, indexing="ij")
+    prob = (p1[:, :, None, None] * p2[None, None, :, :]).ravel()
+    return hh.ravel(), ha.ravel(), (hh + sh).ravel(), (ha + sa).ravel(), prob
+
+
+def htft_outcome_index(hh, ha, fh, fa):
+    """每个格子的半全场结果下标（HTFT_OUTCOMES 中的位置）"""
+    return _result_code(hh, ha) * 3 + _result_code(fh, fa)
+
+
+def htft_probabilities(over_prob, home_share=0.5, first_half_share=DEFAULT_FIRST_HALF_SHARE):
+    """九个半全场结果的模型概率"""
+    hh, ha, fh, fa, prob = joint_grid(over_prob, home_share, first_half_share)
+    return np.bincount(htft_outcome_index(hh, ha, fh, fa), weights=prob, minlength=9)
+
+
+def htft_settle(bets, hh, ha, fh, fa):
+    """半全场投注在每个格子上的净盈亏；bets 为 {半全场结果: (赔率, 金额)}"""
+    odds = np.array([bets[o][0] if o in bets else 0.0 for o in HTFT_OUTCOMES])
+    stakes = np.array([bets[o][1] if o in bets else 0.0 for o in HTFT_OUTCOMES])
+    idx = htft_outcome_index(hh, ha, fh, fa)
+    return stakes[idx] * odds[idx] - stakes.sum()
+
+
+def htft_market(bets, over_prob, home_share=0.5, first_half_share=DEFAULT_FIRST_HALF_SHARE):
+    """半全场投注的期望值、亏损概率和按结果的明细"""
+    hh, ha, fh, fa, prob = joint_grid(over_prob, home_share, first_half_share)
+    prob = prob / prob.sum()
+    net = htft_settle(bets, hh, ha, fh, fa)
+    outcome_prob = np.bincount(htft_outcome_index(hh, ha, fh, fa), weights=prob, minlength=9)
+    rows = []
+    for i, name in enumerate(HTFT_OUTCOMES):
+        odd, stake = bets.get(name, (0.0, 0.0))
+        rows.append({"半全场": name, "模型概率%": outcome_prob[i] * 100, "赔率": odd, "投入": stake,
+                     "单项EV": stake * (odd * outcome_prob[i] - 1) if stake else 0.0})
+    return {"ev": float(net @ prob), "loss_prob": float(prob[net < 0].sum()), "rows": rows}
+
+
+if __name__ == "__main__":
+    # 基准：python htft.py [行数]
+    n = int(sys.argv[1]) if len(sys.argv) >= 2 else 100000
+    rng = np.random.default_rng(0)
+    h1, a1, h2, a2 = (rng.poisson(0.6, n) for _ in range(4))
+    text = "\n".join(f"02/05/2025 Team A {h1[i] + h2[i]} - {a1[i] + a2[i]} ({h1[i]} - {a1[i]}) Team B"
+                     for i in range(n))
+    start = time.perf_counter()
+    rows = parse_history_lines(text)
+    parse_ms = (time.perf_counter() - start) * 1000
+    matches = [{"home_goals": r["ft"][0], "away_goals": r["ft"][1],
+                "ht_home_goals": r["ht"][0], "ht_away_goals": r["ht"][1]} for r in rows]
+    start = time.perf_counter()
+    stats = htft_statistics(matches)
+    stats_ms = (time.perf_counter() - start) * 1000
+    print(f"{n} 行：解析 {parse_ms:.0f} ms，半全场统计 {stats_ms:.0f} ms，最常见 {stats['most_common_htft']}")
+    start = time.perf_counter()
+    market = htft_market({"主/主": (4.5, 10.0), "平/平": (5.0, 10.0)}, 0.48)
+    print(f"半全场盘口（{HTFT_MAX_GOALS + 1}^4 格）：{(time.perf_counter() - start) * 1000:.2f} ms，EV {market['ev']:.2f}")
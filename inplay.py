@@ -0,0 +1,151 @@
+import math
+import sys
+import time
+
+import numpy as np
+
+from payoff import S1_SCORES
+
+# --- 滚球概率引擎 ---
+# 赛前：由预测大球概率反解全场总进球率，再按主客进球占比拆分。
+# 赛中：剩余时间的进球数服从 Poisson(λ × 剩余比例)，
+# 每个分钟的剩余进球分布在建模时一次性预计算，
+# 每次刷新只需按 (分钟, 当前比分) 查表并做一次外积。
+
+MATCH_MINUTES = 90
+MAX_GOALS = 10  # 剩余时间内每队最多考虑的进球数
+# 主队进球占比的合理范围（少量交锋里某队一球未进时不取到0或1）
+HOME_SHARE_BOUNDS = (0.05, 0.95)
+
+_K = np.arange(MAX_GOALS + 1)
+_LOG_FACT = np.array([math.lgamma(k + 1) for k in _K])
+# (i, j) -> i+j 与 i-j 的独热矩阵，用于把剩余比分矩阵折叠为总进球/净胜球分布
+_I, _J = np.meshgrid(_K, _K, indexing="ij")
+_SUM_ONEHOT = (_I.ravel()[:, None] + _J.ravel()[:, None] == np.arange(2 * MAX_GOALS + 1)).astype(float)
+_DIFF_ONEHOT = ((_I - _J).ravel()[:, None] == np.arange(-MAX_GOALS, MAX_GOALS + 1)).astype(float)
+_S1_GOALS = np.array([list(map(int, s.split("-"))) for s in S1_SCORES])
+
+
+def solve_total_rate(over_prob, tol=1e-9):
+    """反解全场总进球率λ，使 P(总进球≥3) = over_prob"""
+    over_prob = min(max(over_prob, 1e-6), 1 - 1e-6)
+    lo, hi = 0.0, 20.0
+    while hi - lo > tol:
+        lam = (lo + hi) / 2
+        under = math.exp(-lam) * (1 + lam + lam * lam / 2)
+        if 1 - under < over_prob:
+            lo = lam
+        else:
+            hi = lam
+    return (lo + hi) / 2
+
+
+def prematch_rates(over_prob, home_share=0.5):
+    """赛前主客队全场进球率 (λ主, λ客)"""
+    lam = solve_total_rate(over_prob)
+    return lam * home_share, lam * (1 - home_share)
+
+
+def remaining_pmf_table(rates):
+    """预计算每个分钟剩余时间的进球分布，形状 (球队数, 91, MAX_GOALS+1)"""
+    rates = np.atleast_1d(np.asarray(rates, dtype=float))
+    remaining = (MATCH_MINUTES - np.arange(MATCH_MINUTES + 1)) / MATCH_MINUTES
+    mu = rates[:, None, None] * remaining[None, :, None]
+    # 进球率为0（如主客占比取到0或1）时 0·log 0 按 0 计，即必然0球
+    with np.errstate(divide="ignore"):
+        log_mu = np.log(mu)
+    log_pmf = np.where(_K > 0, _K * np.where(mu > 0, log_mu, 0.0), 0.0) - mu - _LOG_FACT
+    log_pmf = np.where((mu == 0) & (_K > 0), -np.inf, log_pmf)
+    pmf = np.exp(log_pmf)
+    # 终场后剩余进球必然为0
+    pmf[:, -1, :] = 0.0
+    pmf[:, -1, 0] = 1.0
+    return pmf
+
+
+class InPlayModel:
+    """多场比赛的滚球模型：按分钟查表重算终场比分分布"""
+
+    def __init__(self, home_rates, away_rates):
+        self.home_pmf = remaining_pmf_table(home_rates)
+        self.away_pmf = remaining_pmf_table(away_rates)
+        self.n_fixtures = self.home_pmf.shape[0]
+
+    def remaining_matrix(self, minute):
+        """剩余进球的联合分布，形状 (比赛数, MAX_GOALS+1, MAX_GOALS+1)"""
+        minute = np.clip(np.broadcast_to(np.asarray(minute, dtype=np.int64), (self.n_fixtures,)), 0, MATCH_MINUTES)
+        rows = np.arange(self.n_fixtures)
+        ph = self.home_pmf[rows, minute]
+        pa = self.away_pmf[rows, minute]
+        return ph[:, :, None] * pa[:, None, :]
+
+    def final_score_matrix(self, minute, home_score, away_score, max_goals=MAX_GOALS):
+        """终场比分分布 P(主队进球, 客队进球)，超出 max_goals 的部分被截断"""
+        rem = self.remaining_matrix(minute)
+        hs = np.broadcast_to(np.asarray(home_score, dtype=np.int64), (self.n_fixtures,))
+        as_ = np.broadcast_to(np.asarray(away_score, dtype=np.int64), (self.n_fixtures,))
+        out = np.zeros((self.n_fixtures, max_goals + 1, max_goals + 1))
+        for f in range(self.n_fixtures):
+            h0, a0 = min(hs[f], max_goals + 1), min(as_[f], max_goals + 1)
+            out[f, h0:, a0:] = rem[f, :max_goals + 1 - h0, :max_goals + 1 - a0]
+        return out
+
+    def outcome_probs(self, minute, home_score, away_score):
+        """当前时刻各盘口的概率（向量化，每个数组第一维为比赛）
+
+        返回字典：
+          s1     -- (比赛数, 7) 策略1六个比分 + 3球+
+          totals -- (比赛数, 4) 终场总进球 0/1/2/3+
+          result -- (比赛数, 3) 终场胜/平/负
+        """
+        rem = self.remaining_matrix(minute)
+        n = self.n_fixtures
+        hs = np.broadcast_to(np.asarray(home_score, dtype=np.int64), (n,))
+        as_ = np.broadcast_to(np.asarray(away_score, dtype=np.int64), (n,))
+        flat = rem.reshape(n, -1)
+
+        # 总进球：剩余总进球分布平移当前总进球
+        rem_total = flat @ _SUM_ONEHOT
+        need = np.arange(3)[None, :] - (hs + as_)[:, None]
+        ok = need >= 0
+        totals = np.where(ok, np.take_along_axis(rem_total, np.where(ok, need, 0), axis=1), 0.0)
+        totals = np.column_stack([totals, np.clip(1 - totals.sum(axis=1), 0.0, 1.0)])
+
+        # 策略1比分：需要剩余进球 (h-hs, a-as) 都非负
+        di = _S1_GOALS[None, :, 0] - hs[:, None]
+        dj = _S1_GOALS[None, :, 1] - as_[:, None]
+        ok = (di >= 0) & (dj >= 0)
+        rows = np.arange(n)[:, None]
+        s1 = np.where(ok, rem[rows, np.where(ok, di, 0), np.where(ok, dj, 0)], 0.0)
+        s1 = np.column_stack([s1, totals[:, 3]])
+
+        # 胜平负：剩余净胜球分布平移当前净胜球
+        rem_diff = flat @ _DIFF_ONEHOT
+        diff = np.arange(-MAX_GOALS, MAX_GOALS + 1)[None, :] + (hs - as_)[:, None]
+        result = np.column_stack([
+            (rem_diff * (diff > 0)).sum(axis=1),
+            (rem_diff * (diff == 0)).sum(axis=1),
+            (rem_diff * (diff < 0)).sum(axis=1),
+        ])
+        return {"s1": s1, "totals": totals, "result": result}
+
+
+def inplay_ev(net_pnl, probs):
+    """按滚球概率计算期望值：net_pnl 与 probs 均为 (比赛数, 结果数)"""
+    return (np.asarray(net_pnl, dtype=float) * np.asarray(probs, dtype=float)).sum(axis=-1)
+
+
+if __name__ == "__main__":
+    # 基准：python inplay.py [比赛数]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rng = np.random.default_rng(0)
+    model = InPlayModel(rng.uniform(0.8, 2.0, n), rng.uniform(0.6, 1.6, n))
+    minute = rng.integers(0, 90, n)
+    hs, as_ = rng.integers(0, 3, n), rng.integers(0, 3, n)
+    model.outcome_probs(minute, hs, as_)
+    reps = 50
+    start = time.perf_counter()
+    for _ in range(reps):
+        model.outcome_probs(minute, hs, as_)
+    per_tick = (time.perf_counter() - start) / reps
+    print(f"{n} 场比赛：每次刷新 {per_tick * 1000:.3f} ms，每场 {per_tick / n * 1e6:.2f} µs")
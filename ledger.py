@@ -0,0 +1,458 @@
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from inplay import InPlayModel, prematch_rates
+from payoff import (
+    CS_OTHER, MAX_GRID_GOALS, S2_RESULTS, S2_TOTALS,
+    correct_score_hits, parse_scoreline, result_index,
+)
+from ratings import RESULTS_COLUMNS, normalize_team
+
+# --- 投注台账与批量结算 ---
+# 台账是一个目录，里面两个只追加的CSV流水：
+#   bets.csv        -- 每行一条注单的一个组成部分（单关一行，2串1两行），注单级字段在每行重复；
+#   settlements.csv -- 每行一次结算（bet_id, 结算时间, 结果, 返还），同一注以最后一条为准。
+# 只追加不改写，中途崩溃最多丢最后一行；加载时两张表各读一次。
+# 内存里按 (比赛, 盘口, 下注时间) 排序建索引，按比赛/盘口/时间段查询用二分查找。
+# 结算：赛果表（列同 ratings.RESULTS_COLUMNS）按 (主队, 客队, 日期) 一次 get_indexer 对上全部组成部分，
+# 每个选项化成 (主队进球, 客队进球, 胜平负, 总进球下限, 上限) 条件，一个布尔表达式判定全部输赢，
+# 再按注单 bincount 汇总：有一腿输即输，全部腿赢才赢，其余仍未结算。
+# 期望盈亏用下注时记录的模型概率：stake × (p × 赔率 − 1)，方差 stake² × 赔率² × p(1−p)。
+
+LEDGER_FILE = "bets.csv"
+SETTLEMENT_FILE = "settlements.csv"
+LEG_COLUMNS = [
+    "bet_id", "leg", "placed_at", "strategy", "date", "home_team", "away_team", "market", "selection",
+    "leg_odds", "exclude", "stake", "bet_odds", "prob", "description",
+]
+SETTLEMENT_COLUMNS = ["bet_id", "settled_at", "status", "payout"]
+# 组成部分的盘口（胜平负从该场主队视角）
+MARKETS = ["波胆", "大小球2.5", "总进球", "胜平负"]
+OPEN, WON, LOST = "未结算", "赢", "输"
+REPORT_GROUPS = {"策略": "strategy", "盘口": "bet_market", "比赛日": "date", "比赛": "fixture"}
+
+
+def _pair_keys(home, away):
+    """(主队, 客队) 的规范化键，只对不同的写法调用 normalize_team"""
+    codes, uniques = pd.factorize(np.asarray(home, dtype=str).astype(object) + "\x1f"
+                                  + np.asarray(away, dtype=str).astype(object))
+    normalized = np.array([normalize_team(h) + " vs " + normalize_team(a)
+                           for h, a in (u.split("\x1f") for u in uniques)], dtype=object)
+    return normalized[codes] if len(uniques) else np.array([], dtype=object)
+
+
+def _selection_terms(market, selection):
+    """选项 -> (主队进球, 客队进球, 胜平负下标, 总进球下限, 上限, 是否「其他」项)，-1 表示不限"""
+    if market == "波胆":
+        score = parse_scoreline(selection)
+        if score is not None:
+            return score[0], score[1], -1, 0, 99, False
+        if selection in CS_OTHER:
+            return -1, -1, CS_OTHER.index(selection), 0, 99, True
+    elif market == "大小球2.5":
+        return (-1, -1, -1, 3, 99, False) if selection == "大球" else (-1, -1, -1, 0, 2, False)
+    elif market == "总进球":
+        if selection == "3球+":
+            return -1, -1, -1, 3, 99, False
+        if selection in S2_TOTALS:
+            return -1, -1, -1, S2_TOTALS.index(selection), S2_TOTALS.index(selection), False
+    elif market == "胜平负" and selection in S2_RESULTS:
+        return -1, -1, S2_RESULTS.index(selection), 0, 99, False
+    raise ValueError(f"无法识别的选项: {market} {selection}")
+
+
+def _score_matrix(fixture, max_goals=MAX_GRID_GOALS):
+    """赛前比分概率矩阵（与组合盈亏分布用同一个模型）"""
+    model = InPlayModel(*prematch_rates(fixture["pred_prob"], fixture.get("home_share", 0.5)))
+    prob = model.final_score_matrix(0, 0, 0, max_goals)[0]
+    return prob / prob.sum()
+
+
+def _parlay_components(fixture):
+    """按比赛字典还原策略2的2串1注单（结构同页面上的 parlay_bets）"""
+    pick = S2_RESULTS.index(fixture["s2_selection"])
+    strong = fixture["s2_odds"][pick]
+    return [{
+        "goal": goal, "parlay_odds": round(odds * strong, 2), "stake": fixture.get("parlay_stake", 0.0),
+        "description": f"2串1: {fixture['s2_selection']} × {goal}",
+        "components": {
+            "strong_win": {"match": f"{fixture['s2_home_team']} vs {fixture['s2_away_team']}",
+                           "selection": fixture["s2_selection"], "odds": strong},
+            "total_goals": {"match": f"{fixture['home_team']} vs {fixture['away_team']}",
+                            "selection": goal, "odds": odds},
+        },
+    } for goal, odds in fixture.get("goal_odds", {}).items()]
+
+
+def fixture_bets(fixture, parlay_bets=None, max_goals=MAX_GRID_GOALS):
+    """把比赛字典（页面上的 current_fixture）展开为待记录的注单列表
+
+    每注 {strategy, stake, odds, prob, description, legs: [{date, home_team, away_team, market, selection,
+    odds, exclude}]}；prob 为模型给出的命中概率。金额为0或赔率≤1的选项不记录。
+    策略2的2串1取 parlay_bets[i]['components']（不给时按比赛字典还原）；页面上的稳胆选项是
+    「某队 胜」之类的显示名，记录时统一成比赛字典里的 胜/平/负。稳胆比赛没有单独的日期，按同一比赛日记录。
+    既没有波胆盘口也没有稳胆的策略（结算条件未知）抛出 ValueError。
+    """
+    prob = _score_matrix(fixture, max_goals)
+    h, a = np.meshgrid(np.arange(max_goals + 1), np.arange(max_goals + 1), indexing="ij")
+    total = (h + a).ravel()
+    cells = prob.ravel()
+    home, away, day = fixture["home_team"], fixture["away_team"], fixture["date"]
+    strategy = fixture.get("strategy", "")
+    bets = []
+
+    def single(market, selection, odds, stake, p, exclude=""):
+        if float(odds) > 1 and float(stake) > 0:
+            bets.append({"strategy": strategy, "stake": float(stake), "odds": float(odds), "prob": float(p),
+                         "description": f"{home} vs {away} {market} {selection}",
+                         "legs": [{"date": day, "home_team": home, "away_team": away, "market": market,
+                                   "selection": selection, "odds": float(odds), "exclude": exclude}]})
+
+    if "score_bets" in fixture:
+        selections = list(fixture["score_bets"])
+        hits = correct_score_hits(h, a, selections)
+        listed = ";".join(s for s in selections if parse_scoreline(s) is not None)
+        for j, sel in enumerate(selections):
+            odds, stake = fixture["score_bets"][sel]
+            single("波胆", sel, odds, stake, cells @ hits[:, j], listed if sel in CS_OTHER else "")
+    elif "s2_odds" in fixture:
+        implied = 1.0 / np.asarray(fixture["s2_odds"], dtype=float)
+        pick = S2_RESULTS.index(fixture["s2_selection"])
+        for bet in (parlay_bets if parlay_bets is not None else _parlay_components(fixture)):
+            strong, goals = bet["components"]["strong_win"], bet["components"]["total_goals"]
+            if float(bet["parlay_odds"]) <= 1 or float(bet["stake"]) <= 0:
+                continue
+            p_goal = cells[total == S2_TOTALS.index(goals["selection"])].sum()
+            legs = []
+            for comp, market, selection in ((strong, "胜平负", S2_RESULTS[pick]),
+                                            (goals, "总进球", goals["selection"])):
+                leg_home, leg_away = comp["match"].split(" vs ", 1)
+                legs.append({"date": day, "home_team": leg_home, "away_team": leg_away, "market": market,
+                             "selection": selection, "odds": float(comp["odds"]), "exclude": ""})
+            bets.append({"strategy": strategy, "stake": float(bet["stake"]), "odds": float(bet["parlay_odds"]),
+                         "prob": float(p_goal * implied[pick] / implied.sum()),
+                         "description": bet["description"], "legs": legs})
+    else:
+        raise ValueError(f"台账还不能按盘口记录「{strategy}」的注单")
+    single("大小球2.5", "大球", fixture["o25_odds"], fixture["o25_stake"], cells[total >= 3].sum())
+    return bets
+
+
+def _read_journal(path, columns):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=columns)
+    return pd.read_csv(path, dtype={"exclude": str, "selection": str, "date": str}, keep_default_na=False,
+                       na_values={"leg_odds": [""], "payout": [""]})
+
+
+def _append_journal(path, frame):
+    header = not os.path.exists(path) or os.path.getsize(path) == 0
+    frame.to_csv(path, mode="a", header=header, index=False, encoding="utf-8")
+
+
+class BetLedger:
+    """本地投注台账（目录 + 只追加流水），线程安全"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self.legs = _read_journal(os.path.join(directory, LEDGER_FILE), LEG_COLUMNS)
+        self.settlements = _read_journal(os.path.join(directory, SETTLEMENT_FILE), SETTLEMENT_COLUMNS)
+        self._reindex()
+
+    def __len__(self):
+        return int(self.legs["bet_id"].nunique())
+
+    def _reindex(self):
+        """按 (比赛, 盘口, 下注时间) 排序的索引"""
+        legs = self.legs
+        self._fixture = _pair_keys(legs["home_team"], legs["away_team"])
+        self._placed = pd.to_datetime(legs["placed_at"]).to_numpy(dtype="datetime64[s]")
+        market = legs["market"].to_numpy(dtype=object)
+        self._order = np.lexsort((self._placed, market, self._fixture))
+        self._sorted_fixture = self._fixture[self._order]
+        self._sorted_market = market[self._order]
+        self._sorted_placed = self._placed[self._order]
+        self._next_id = int(legs["bet_id"].max()) + 1 if len(legs) else 1
+
+    def place(self, bets, placed_at=None):
+        """记录一批注单（fixture_bets 的格式），返回分配的 bet_id 列表"""
+        placed_at = pd.Timestamp.now() if placed_at is None else pd.Timestamp(placed_at)
+        stamp = placed_at.strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            ids = list(range(self._next_id, self._next_id + len(bets)))
+            rows = [(bet_id, k, stamp, bet["strategy"], leg["date"], leg["home_team"], leg["away_team"],
+                     leg["market"], leg["selection"], leg["odds"], leg.get("exclude", ""), bet["stake"],
+                     bet["odds"], bet["prob"], bet["description"])
+                    for bet_id, bet in zip(ids, bets) for k, leg in enumerate(bet["legs"])]
+            if not rows:
+                return []
+            frame = pd.DataFrame(rows, columns=LEG_COLUMNS)
+            os.makedirs(self.directory, exist_ok=True)
+            _append_journal(os.path.join(self.directory, LEDGER_FILE), frame)
+            self.legs = pd.concat([self.legs, frame], ignore_index=True) if len(self.legs) else frame
+            self._reindex()
+        return ids
+
+    def place_fixture(self, fixture, parlay_bets=None, placed_at=None):
+        """记录一场比赛当前的全部投注"""
+        return self.place(fixture_bets(fixture, parlay_bets), placed_at)
+
+    def select(self, home=None, away=None, market=None, start=None, end=None):
+        """按比赛、盘口、下注时间段 [start, end] 查询组成部分
+
+        给定比赛时走排序索引（二分查找），否则按条件筛选全部行。
+        """
+        with self._lock:
+            if home is not None:
+                key = normalize_team(home) + " vs " + normalize_team(away)
+                lo = int(np.searchsorted(self._sorted_fixture, key, side="left"))
+                hi = int(np.searchsorted(self._sorted_fixture, key, side="right"))
+                if market is not None:
+                    markets = self._sorted_market[lo:hi]
+                    lo, hi = (lo + int(np.searchsorted(markets, market, side="left")),
+                              lo + int(np.searchsorted(markets, market, side="right")))
+                    placed = self._sorted_placed[lo:hi]
+                    if start is not None:
+                        lo += int(np.searchsorted(placed, np.datetime64(pd.Timestamp(start), "s"), side="left"))
+                    if end is not None:
+                        hi = lo + int(np.searchsorted(self._sorted_placed[lo:hi],
+                                                      np.datetime64(pd.Timestamp(end), "s"), side="right"))
+                    return self.legs.iloc[self._order[lo:hi]]
+                idx = self._order[lo:hi]
+            else:
+                idx = np.arange(len(self.legs))
+                if market is not None:
+                    idx = idx[self.legs["market"].to_numpy()[idx] == market]
+            placed = self._placed[idx]
+            keep = np.ones(len(idx), dtype=bool)
+            if start is not None:
+                keep &= placed >= np.datetime64(pd.Timestamp(start), "s")
+            if end is not None:
+                keep &= placed <= np.datetime64(pd.Timestamp(end), "s")
+            return self.legs.iloc[np.sort(idx[keep])]
+
+    def bets(self):
+        """每注一行：注单字段 + 最新结算状态 + 期望/实际盈亏"""
+        with self._lock:
+            legs, settlements = self.legs, self.settlements
+        if not len(legs):
+            return pd.DataFrame()
+        first = legs.drop_duplicates("bet_id").set_index("bet_id")
+        n_legs = legs.groupby("bet_id").size()
+        out = first[["placed_at", "strategy", "date", "stake", "bet_odds", "prob", "description"]].copy()
+        out["fixture"] = first["home_team"] + " vs " + first["away_team"]
+        out["bet_market"] = np.where(n_legs.reindex(out.index).to_numpy() > 1, "2串1", first["market"])
+        last = settlements.drop_duplicates("bet_id", keep="last").set_index("bet_id")
+        out["status"] = last["status"].reindex(out.index).fillna(OPEN)
+        out["settled_at"] = last["settled_at"].reindex(out.index).fillna("")
+        out["payout"] = last["payout"].reindex(out.index).astype(float).fillna(0.0)
+        stake, odds, p = out["stake"].astype(float), out["bet_odds"].astype(float), out["prob"].astype(float)
+        out["expected"] = stake * (p * odds - 1)
+        out["variance"] = stake ** 2 * odds ** 2 * p * (1 - p)
+        out["realized"] = np.where(out["status"] == OPEN, np.nan, out["payout"] - stake)
+        return out
+
+    def settle(self, results, settled_at=None, resettle=False):
+        """用赛果表批量结算；默认只结算未结算的注单，resettle=True 时按新赛果重算全部
+
+        返回 {"legs": 参与判定的组成部分数, "matched": 对上赛果的数, "won": 赢注数, "lost": 输注数}
+        """
+        missing = [c for c in RESULTS_COLUMNS if c not in results.columns]
+        if missing:
+            raise ValueError(f"赛果表缺少列: {', '.join(missing)}")
+        settled_at = (pd.Timestamp.now() if settled_at is None else pd.Timestamp(settled_at)).strftime(
+            "%Y-%m-%d %H:%M:%S")
+        # 赛果按 (主队, 客队, 日期) 建索引，重复时以最后一条为准
+        result_day = pd.to_datetime(results["date"], dayfirst=True, errors="coerce").dt.strftime("%Y-%m-%d")
+        result_keys = pd.Index(_pair_keys(results["home_team"], results["away_team"]) + "|" + result_day.to_numpy())
+        last = ~result_keys.duplicated(keep="last")
+        result_keys = result_keys[last]
+        hg_all = pd.to_numeric(results["home_goals"], errors="coerce").to_numpy()[last]
+        ag_all = pd.to_numeric(results["away_goals"], errors="coerce").to_numpy()[last]
+
+        with self._lock:
+            legs = self.legs
+            if not len(legs):
+                return {"legs": 0, "matched": 0, "won": 0, "lost": 0}
+            bet_ids = legs["bet_id"].to_numpy(dtype=np.int64)
+            pending = np.ones(len(legs), dtype=bool)
+            if not resettle and len(self.settlements):
+                pending = ~np.isin(bet_ids, self.settlements["bet_id"].to_numpy(dtype=np.int64))
+            idx = np.nonzero(pending)[0]
+            leg_day = pd.to_datetime(legs["date"].to_numpy()[idx], errors="coerce").strftime("%Y-%m-%d")
+            pos = result_keys.get_indexer(self._fixture[idx] + "|" + np.asarray(leg_day, dtype=object))
+            hg = np.where(pos >= 0, hg_all[pos], np.nan)
+            ag = np.where(pos >= 0, ag_all[pos], np.nan)
+            known = np.isfinite(hg) & np.isfinite(ag)
+            hg = np.where(known, hg, 0).astype(np.int64)
+            ag = np.where(known, ag, 0).astype(np.int64)
+
+            # 不同的选项只有几十种：先逐种化成条件，再按下标展开
+            codes, uniques = pd.factorize(legs["market"].to_numpy()[idx] + "\x1f" + legs["selection"].to_numpy()[idx])
+            terms = np.array([_selection_terms(*u.split("\x1f")) for u in uniques], dtype=np.int64).reshape(-1, 6)
+            sh, sa, sr, lo, hi, other = terms[codes].T
+            total = hg + ag
+            win = (((sh < 0) | (hg == sh)) & ((sa < 0) | (ag == sa))
+                   & ((sr < 0) | (result_index(hg, ag) == sr)) & (total >= lo) & (total <= hi))
+            # 「其他」项不含盘口上列出的比分；盘口写法只有少数几种，按盘口分组判定
+            other = np.nonzero(other.astype(bool))[0]
+            if len(other):
+                score = np.char.add(np.char.add(hg[other].astype(str), "-"), ag[other].astype(str))
+                boards, board_codes = np.unique(legs["exclude"].to_numpy()[idx][other].astype(str),
+                                                return_inverse=True)
+                for b, board in enumerate(boards):
+                    rows = np.nonzero(board_codes == b)[0]
+                    listed = np.isin(score[rows], board.split(";"))
+                    win[other[rows]] &= ~listed
+
+            # 按注单汇总：有一腿确定输即输；全部腿赢才赢
+            bet_codes, bet_uniques = pd.factorize(bet_ids[idx])
+            n = len(bet_uniques)
+            lost = np.bincount(bet_codes, weights=known & ~win, minlength=n) > 0
+            unknown = np.bincount(bet_codes, weights=~known, minlength=n) > 0
+            won = ~lost & ~unknown
+            first = legs.iloc[idx].drop_duplicates("bet_id").set_index("bet_id").loc[bet_uniques]
+            payout = np.where(won, first["stake"].to_numpy(dtype=float) * first["bet_odds"].to_numpy(dtype=float), 0.0)
+            done = won | lost
+            frame = pd.DataFrame({"bet_id": bet_uniques[done], "settled_at": settled_at,
+                                  "status": np.where(won[done], WON, LOST), "payout": np.round(payout[done], 2)},
+                                 columns=SETTLEMENT_COLUMNS)
+            if len(frame):
+                os.makedirs(self.directory, exist_ok=True)
+                _append_journal(os.path.join(self.directory, SETTLEMENT_FILE), frame)
+                self.settlements = (pd.concat([self.settlements, frame], ignore_index=True)
+                                    if len(self.settlements) else frame)
+        return {"legs": int(len(idx)), "matched": int(known.sum()), "won": int(won.sum()), "lost": int(lost.sum())}
+
+    def report(self, by="策略"):
+        """已结算注单的实际盈亏与期望盈亏对比，按 REPORT_GROUPS 之一分组，最后一行为合计
+
+        z值 = (实际 − 期望) / √Σ方差，|z| > 2 说明实际结果与下注时的模型概率明显不符。
+        """
+        bets = self.bets()
+        if not len(bets):
+            return pd.DataFrame()
+        column = REPORT_GROUPS[by]
+        bets = bets.assign(settled=bets["status"] != OPEN, stake=bets["stake"].astype(float))
+        done = bets[bets["settled"]]
+        grouped = done.groupby(column)
+        table = pd.DataFrame({
+            "注数": bets.groupby(column).size(),
+            "已结算": grouped.size(),
+            "投入": grouped["stake"].sum(),
+            "期望盈亏": grouped["expected"].sum(),
+            "实际盈亏": grouped["realized"].sum(),
+            "方差": grouped["variance"].sum(),
+        }).fillna(0.0)
+        table.loc["合计"] = [len(bets), len(done), done["stake"].sum(), done["expected"].sum(),
+                           done["realized"].sum(), done["variance"].sum()]
+        stake = table["投入"].where(table["投入"] > 0)
+        table["差额"] = table["实际盈亏"] - table["期望盈亏"]
+        table["期望ROI%"] = table["期望盈亏"] / stake * 100
+        table["实际ROI%"] = table["实际盈亏"] / stake * 100
+        table["z值"] = table["差额"] / np.sqrt(table["方差"].where(table["方差"] > 0))
+        table[["注数", "已结算"]] = table[["注数", "已结算"]].astype(int)
+        return table.drop(columns="方差").round(2).rename_axis(by).reset_index()
+
+    def cumulative(self):
+        """按结算先后的累计期望、累计实际盈亏及期望 ±2σ 区间（每注一行）"""
+        bets = self.bets()
+        if not len(bets):
+            return pd.DataFrame()
+        done = bets[bets["status"] != OPEN].sort_values(["settled_at", "placed_at"], kind="stable")
+        expected = done["expected"].cumsum().to_numpy()
+        band = 2 * np.sqrt(done["variance"].cumsum().to_numpy())
+        return pd.DataFrame({"累计期望": expected, "累计实际": done["realized"].cumsum().to_numpy(),
+                             "期望-2σ": expected - band, "期望+2σ": expected + band},
+                            index=pd.RangeIndex(1, len(done) + 1, name="已结算注数"))
+
+
+if __name__ == "__main__":
+    # 基准：python ledger.py [注单数] [场数]
+    import tempfile
+
+    n_bets = int(sys.argv[1]) if len(sys.argv) >= 2 else 50000
+    n_fixtures = int(sys.argv[2]) if len(sys.argv) >= 3 else 2000
+    rng = np.random.default_rng(0)
+    teams = [f"Team {i}" for i in range(200)]
+    pairs = rng.choice(len(teams), (n_fixtures, 2), replace=True)
+    days = [str(np.datetime64("2025-08-01") + int(d)) for d in rng.integers(0, 270, n_fixtures)]
+    scores = rng.poisson(1.35, (n_fixtures, 2))
+    fixture = rng.integers(0, n_fixtures, (n_bets, 2))
+    kind = rng.integers(0, 4, n_bets)
+    cs = ["0-0", "1-0", "0-1", "1-1", "2-0", "0-2", "其他主胜", "其他平局"]
+    board = "0-0;1-0;0-1;1-1;2-0;0-2"
+
+    def leg(f, market, selection, odds):
+        return {"date": days[f], "home_team": teams[pairs[f, 0]], "away_team": teams[pairs[f, 1]],
+                "market": market, "selection": selection, "odds": odds,
+                "exclude": board if selection.startswith("其他") else ""}
+
+    bets = []
+    for i, (f, g, k) in enumerate(zip(fixture[:, 0].tolist(), fixture[:, 1].tolist(), kind.tolist())):
+        if k == 0:
+            legs = [leg(f, "波胆", cs[i % len(cs)], 8.0)]
+        elif k == 1:
+            legs = [leg(f, "大小球2.5", "大球", 1.9)]
+        elif k == 2:
+            legs = [leg(f, "总进球", S2_TOTALS[i % 3] if i % 4 else "3球+", 3.5)]
+        else:
+            legs = [leg(g, "胜平负", S2_RESULTS[i % 3], 1.6), leg(f, "总进球", S2_TOTALS[i % 3], 3.5)]
+        odds = float(np.prod([x["odds"] for x in legs]))
+        bets.append({"strategy": "benchmark", "stake": 10.0, "odds": odds, "prob": min(0.95, 0.95 / odds),
+                     "description": "", "legs": legs})
+    results = pd.DataFrame({"date": [f"{d[8:]}/{d[5:7]}/{d[:4]}" for d in days],
+                            "home_team": [teams[i] for i in pairs[:, 0]], "away_team": [teams[i] for i in pairs[:, 1]],
+                            "home_goals": scores[:, 0], "away_goals": scores[:, 1]})
+
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = BetLedger(directory)
+        start = time.perf_counter()
+        ledger.place(bets, "2025-07-31 12:00")
+        place_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        summary = ledger.settle(results.iloc[: n_fixtures * 9 // 10])   # 一成比赛还没有赛果
+        settle_ms = (time.perf_counter() - start) * 1000
+        print(f"{n_bets} 注（{len(ledger.legs)} 个组成部分）：记录 {place_ms:.0f} ms，一次批量结算 {settle_ms:.0f} ms "
+              f"-> 赢 {summary['won']} / 输 {summary['lost']}，对上赛果 {summary['matched']}/{summary['legs']}")
+        start = time.perf_counter()
+        reopened = BetLedger(directory)
+        print(f"重新加载台账：{(time.perf_counter() - start) * 1000:.0f} ms，{len(reopened)} 注，"
+              f"结算 {len(reopened.settlements)} 条")
+        start = time.perf_counter()
+        for f in range(200):
+            reopened.select(teams[pairs[f, 0]], teams[pairs[f, 1]], "总进球")
+        print(f"按 (比赛, 盘口) 查询：{(time.perf_counter() - start) / 200 * 1e6:.0f} µs/次")
+
+        # 核对：逐注逐腿判定
+        by_key = {(teams[pairs[f, 0]], teams[pairs[f, 1]], days[f]): tuple(scores[f])
+                  for f in range(n_fixtures * 9 // 10)}
+
+        def leg_win(x, s):
+            sh, sa, sr, lo, hi, other = _selection_terms(x["market"], x["selection"])
+            ok = (sh < 0 or s[0] == sh) and (sa < 0 or s[1] == sa) and lo <= sum(s) <= hi
+            ok = ok and (sr < 0 or int(result_index(s[0], s[1])) == sr)
+            return ok and not (other and f"{s[0]}-{s[1]}" in x["exclude"].split(";"))
+
+        expected_status = {}
+        for bet_id, bet in enumerate(bets, start=1):
+            outcome = [leg_win(x, by_key[(x["home_team"], x["away_team"], x["date"])])
+                       if (x["home_team"], x["away_team"], x["date"]) in by_key else None for x in bet["legs"]]
+            if False in outcome:
+                expected_status[bet_id] = LOST
+            elif None not in outcome:
+                expected_status[bet_id] = WON
+        table = reopened.bets()
+        got = table.loc[table["status"] != OPEN, "status"].to_dict()
+        print(f"与逐注判定一致：{got == expected_status}")
+        print(reopened.report("盘口").to_string(index=False))
+        # 剩下的赛果补齐后再结算一次，只处理未结算的注单
+        start = time.perf_counter()
+        rest = reopened.settle(results)
+        print(f"补结算 {rest['won'] + rest['lost']} 注：{(time.perf_counter() - start) * 1000:.0f} ms")
@@ -0,0 +1,277 @@
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+
+from backtest import S2_STRONG_COLUMNS, S2_TOTAL_COLUMNS
+from payoff import CS_OTHER, DEFAULT_CS_ODDS, S2_TOTALS, parse_scoreline
+
+# --- 实时赔率接入 ---
+# 行情源（轮询 / 文件 / socket）在后台线程的 asyncio 事件循环里运行，
+# 更新先合并到待推送区，按固定间隔去抖后只把真正变化的盘口交给页面。
+# 盘口名与回测数据集的列名一致，每条行情是一行JSON：
+#   {"market": "cs_1-1", "odds": 7.05}
+
+# 盘口名 -> 页面组件的 session_state key
+MARKET_WIDGET_KEYS = {"o25_odds": "o25_odds"}
+MARKET_WIDGET_KEYS.update({c: c for c in S2_STRONG_COLUMNS})
+MARKET_WIDGET_KEYS.update({c: f"s2_od_{g}" for c, g in zip(S2_TOTAL_COLUMNS, S2_TOTALS)})
+
+# 波胆盘口（cs_<比分或其他项>）不是单独的组件，而是波胆表格里的一行，
+# 对应的 key 为 S1_ODDS_PREFIX + 选项，由页面写回表格
+S1_ODDS_PREFIX = "s1_od_"
+
+# 默认去抖间隔：页面每秒最多重跑4次
+DEFAULT_MIN_INTERVAL = 0.25
+
+
+def market_widget_key(market):
+    """盘口名对应的组件 key，不认识的盘口返回 None"""
+    key = MARKET_WIDGET_KEYS.get(market)
+    if key is None and market.startswith("cs_"):
+        selection = market[3:]
+        if parse_scoreline(selection) is not None or selection in CS_OTHER:
+            key = S1_ODDS_PREFIX + selection
+    return key
+
+
+def parse_lines(chunk):
+    """把若干行JSON行情解析为 [(盘口, 赔率)]，忽略无法解析的行"""
+    updates = []
+    for line in chunk.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            msg = json.loads(line)
+            updates.append((msg["market"], float(msg["odds"])))
+        except (ValueError, KeyError, TypeError):
+            continue
+    return updates
+
+
+async def poll_feed(fetch, interval=1.0):
+    """轮询型行情源：定期在线程池里调用 fetch()，fetch 返回 {盘口: 赔率}"""
+    while True:
+        snapshot = await asyncio.to_thread(fetch)
+        yield list(snapshot.items())
+        await asyncio.sleep(interval)
+
+
+async def file_feed(path, follow=True, poll=0.05):
+    """文件型行情源：读取（并持续追踪）JSON行文件"""
+    with open(path, encoding="utf-8") as f:
+        buf = ""
+        while True:
+            chunk = f.read(1 << 16)
+            if chunk:
+                buf += chunk
+                head, sep, buf = buf.rpartition("\n")
+                if sep:
+                    yield parse_lines(head)
+            elif follow:
+                await asyncio.sleep(poll)
+            else:
+                if buf:
+                    yield parse_lines(buf)
+                return
+
+
+async def socket_feed(host, port):
+    """socket型行情源：订阅推送JSON行的TCP服务"""
+    reader, writer = await asyncio.open_connection(host, port)
+    buf = b""
+    try:
+        while True:
+            chunk = await reader.read(1 << 16)
+            if not chunk:
+                break
+            buf += chunk
+            head, sep, buf = buf.rpartition(b"\n")
+            if sep:
+                yield parse_lines(head.decode("utf-8"))
+    finally:
+        writer.close()
+
+
+def _mock_lines(prices, n, drift=0.02):
+    """按随机游走生成n条模拟行情（JSON行）"""
+    markets = list(prices)
+    lines = []
+    for _ in range(n):
+        m = random.choice(markets)
+        prices[m] = max(1.01, round(prices[m] * (1 + random.uniform(-drift, drift)), 2))
+        lines.append(json.dumps({"market": m, "odds": prices[m]}))
+    return lines
+
+
+def default_prices():
+    """与页面默认值一致的初始赔率"""
+    prices = {"o25_odds": 2.30}
+    prices.update({f"cs_{s}": o for s, o in DEFAULT_CS_ODDS.items()})
+    prices.update(dict(zip(S2_STRONG_COLUMNS, [1.35, 4.50, 8.00])))
+    prices.update(dict(zip(S2_TOTAL_COLUMNS, [7.20, 3.55, 3.00])))
+    return prices
+
+
+async def mock_feed(rate=20, tick=0.05):
+    """进程内模拟行情源：每秒约 rate 条随机游走更新"""
+    prices = default_prices()
+    per_tick = max(1, int(rate * tick))
+    while True:
+        yield parse_lines("\n".join(_mock_lines(prices, per_tick)))
+        await asyncio.sleep(tick)
+
+
+def write_mock_file(path, n, seed=None):
+    """生成包含n条模拟行情的JSON行文件"""
+    random.seed(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(_mock_lines(default_prices(), n)) + "\n")
+
+
+async def serve_mock_feed(host="127.0.0.1", port=0, rate=5000, tick=0.01):
+    """启动本地模拟行情TCP服务，向每个连接按 rate 条/秒推送更新"""
+    async def handle(reader, writer):
+        prices = default_prices()
+        per_tick = max(1, int(rate * tick))
+        try:
+            while True:
+                writer.write(("\n".join(_mock_lines(prices, per_tick)) + "\n").encode("utf-8"))
+                await writer.drain()
+                await asyncio.sleep(tick)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+class OddsIngestor:
+    """后台接入行情：批量合并、只保留变化的盘口、按间隔去抖后交给页面"""
+
+    def __init__(self, min_interval=DEFAULT_MIN_INTERVAL, history=None, fixture=""):
+        self.min_interval = min_interval
+        # 可选的赔率时间序列（odds_history.OddsHistory）：去抖之前逐条记录，保留完整走势
+        self.history = history
+        self.fixture = fixture
+        self._latest = {}    # 已推送给页面的赔率
+        self._pending = {}   # 去抖窗口内的最新赔率
+        self._outbox = {}    # 等待页面取走的变化
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self.stats = {"received": 0, "changed": 0, "flushes": 0, "errors": 0, "alerts": 0}
+
+    def ingest(self, updates):
+        """合并一批更新（只在事件循环线程里调用）"""
+        self.stats["received"] += len(updates)
+        accepted = [(m, round(odds, 2)) for m, odds in updates if market_widget_key(m) is not None]
+        self._pending.update(accepted)
+        if self.history is not None and accepted:
+            alerts = self.history.append_many(self.fixture, accepted)
+            self.stats["alerts"] += len(alerts)
+
+    def flush(self):
+        """把去抖窗口内真正变化的盘口移到待取区"""
+        changed = {m: v for m, v in self._pending.items() if self._latest.get(m) != v}
+        self._pending.clear()
+        if not changed:
+            return changed
+        self._latest.update(changed)
+        with self._lock:
+            self._outbox.update(changed)
+        self.stats["changed"] += len(changed)
+        self.stats["flushes"] += 1
+        return changed
+
+    def has_updates(self):
+        """页面是否有待应用的变化"""
+        with self._lock:
+            return bool(self._outbox)
+
+    def drain(self):
+        """取走全部待应用的变化，返回 {组件key: 赔率}"""
+        with self._lock:
+            out, self._outbox = self._outbox, {}
+        return {market_widget_key(m): v for m, v in out.items()}
+
+    async def _consume(self, feed):
+        try:
+            async for updates in feed:
+                self.ingest(updates)
+        except (OSError, ValueError):
+            self.stats["errors"] += 1
+
+    async def _flusher(self):
+        while True:
+            await asyncio.sleep(self.min_interval)
+            self.flush()
+
+    async def run(self, feeds):
+        """在当前事件循环里运行全部行情源和去抖推送"""
+        tasks = [asyncio.create_task(self._consume(f)) for f in feeds]
+        tasks.append(asyncio.create_task(self._flusher()))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    def start(self, *feeds):
+        """在后台线程启动事件循环（feeds 是异步生成器）"""
+        self._loop = asyncio.new_event_loop()
+
+        def runner():
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._loop.run_until_complete(self.run(feeds))
+            except (asyncio.CancelledError, RuntimeError):
+                pass
+
+        self._thread = threading.Thread(target=runner, name="odds-ingestor", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止后台事件循环"""
+        if self._loop is not None and self._loop.is_running():
+            for task in asyncio.all_tasks(self._loop):
+                self._loop.call_soon_threadsafe(task.cancel)
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+
+async def load_test(rate=5000, seconds=3.0, min_interval=DEFAULT_MIN_INTERVAL):
+    """离线压测：本地模拟TCP行情 -> 接入 -> 去抖，返回吞吐统计"""
+    server = await serve_mock_feed(rate=rate)
+    port = server.sockets[0].getsockname()[1]
+    ingestor = OddsIngestor(min_interval=min_interval)
+    start = time.perf_counter()
+    task = asyncio.create_task(ingestor.run([socket_feed("127.0.0.1", port)]))
+    await asyncio.sleep(seconds)
+    task.cancel()
+    server.close()
+    await server.wait_closed()
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": round(elapsed, 2),
+        "received": ingestor.stats["received"],
+        "updates_per_sec": round(ingestor.stats["received"] / elapsed),
+        "flushes": ingestor.stats["flushes"],
+        "flushes_per_sec": round(ingestor.stats["flushes"] / elapsed, 2),
+        "changed_markets": ingestor.stats["changed"],
+    }
+
+
+if __name__ == "__main__":
+    # 用法: python live_odds.py [每秒更新数] [秒数]
+    rate = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+    print(asyncio.run(load_test(rate, seconds)))
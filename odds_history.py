@@ -0,0 +1,237 @@
+import math
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# --- 赔率时间序列与异动检测 ---
+# 每个 (比赛, 盘口) 一条序列，占二维数组里固定长度的一行环形缓冲（时间、赔率），写满后覆盖最旧的点；
+# 序列数有上限，超出时回收最久没有更新的一条，所以内存只取决于 上限 × 容量。
+# 每次追加 O(1) 地更新该序列的统计（都按隐含概率 1/赔率 计算）：
+#   漂移   -- 最新隐含概率 - 开盘（第一条）隐含概率；
+#   速度   -- Δ概率/Δ时间 的指数平滑（时间常数 VELOCITY_TAU 秒），单位：概率/分钟；
+#   异动   -- 最近 STEAM_WINDOW 秒内的变化，窗口起点指针只前移（均摊 O(1)），
+#            |变化| ≥ STEAM_THRESHOLD 时报警一次，回落到门槛一半以下才重新武装。
+# 盘口名与实时行情一致（o25_odds、cs_1-1、s2_win_odds……）。
+
+DEFAULT_CAPACITY = 256
+DEFAULT_MAX_SERIES = 5000
+STEAM_WINDOW = 300.0
+STEAM_THRESHOLD = 0.02
+VELOCITY_TAU = 120.0
+MAX_ALERTS = 500
+
+
+class OddsHistory:
+    """按 (比赛, 盘口) 存储的定长环形缓冲赔率序列，线程安全"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, max_series=DEFAULT_MAX_SERIES, steam_window=STEAM_WINDOW,
+                 steam_threshold=STEAM_THRESHOLD, velocity_tau=VELOCITY_TAU):
+        self.capacity = capacity
+        self.max_series = max_series
+        self.steam_window = steam_window
+        self.steam_threshold = steam_threshold
+        self.velocity_tau = velocity_tau
+        self._lock = threading.Lock()
+        self.slots = {}        # (比赛, 盘口) -> 行号
+        self.keys = []         # 行号 -> (比赛, 盘口)
+        rows = min(16, max_series)
+        self.times = np.zeros((rows, capacity))
+        self.odds = np.zeros((rows, capacity), dtype=np.float32)
+        # 每条序列的增量状态（逐条更新，用列表比逐元素访问numpy数组快）
+        self.seq = []          # 累计追加点数（下一个写入位置 = seq % capacity）
+        self.tail = []         # 异动窗口起点的序号
+        self.open_prob = []
+        self.last_prob = []
+        self.last_time = []
+        self.velocity = []
+        self.window_change = []
+        self.alerting = []
+        self.alerts = deque(maxlen=MAX_ALERTS)
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def nbytes(self):
+        """环形缓冲占用的字节数"""
+        return self.times.nbytes + self.odds.nbytes
+
+    def _slot(self, key, t):
+        slot = self.slots.get(key)
+        if slot is not None:
+            return slot
+        if len(self.keys) >= self.max_series:
+            # 回收最久没有更新的序列
+            slot = min(range(len(self.keys)), key=self.last_time.__getitem__)
+            del self.slots[self.keys[slot]]
+            self.keys[slot] = key
+            self.evicted += 1
+        else:
+            slot = len(self.keys)
+            self.keys.append(key)
+            for state in (self.seq, self.tail, self.open_prob, self.last_prob, self.last_time,
+                          self.velocity, self.window_change, self.alerting):
+                state.append(None)
+            if slot >= len(self.times):
+                rows = min(2 * len(self.times), self.max_series)
+                self.times = np.concatenate([self.times, np.zeros((rows - len(self.times), self.capacity))])
+                self.odds = np.concatenate([self.odds, np.zeros((rows - len(self.odds), self.capacity),
+                                                                dtype=np.float32)])
+        self.slots[key] = slot
+        self.seq[slot] = self.tail[slot] = 0
+        self.velocity[slot] = self.window_change[slot] = 0.0
+        self.alerting[slot] = False
+        self.last_time[slot] = t
+        return slot
+
+    def append(self, fixture, market, odds, t=None):
+        """追加一个点，触发异动时返回报警字典，否则返回 None"""
+        t = time.time() if t is None else t
+        with self._lock:
+            return self._append(fixture, market, float(odds), t)
+
+    def append_many(self, fixture, updates, t=None):
+        """同一时刻一批 [(盘口, 赔率)]，返回触发的报警列表"""
+        t = time.time() if t is None else t
+        with self._lock:
+            alerts = [self._append(fixture, market, float(odds), t) for market, odds in updates]
+        return [a for a in alerts if a is not None]
+
+    def record_changes(self, fixture, prices, t=None):
+        """只追加与该序列最新赔率不同的 {盘口: 赔率}（记录页面上的手动输入），返回报警列表"""
+        t = time.time() if t is None else t
+        alerts = []
+        with self._lock:
+            for market, odds in prices.items():
+                slot = self.slots.get((fixture, market))
+                if slot is None or abs(1.0 / self.last_prob[slot] - float(odds)) > 1e-9:
+                    alerts.append(self._append(fixture, market, float(odds), t))
+        return [a for a in alerts if a is not None]
+
+    def _append(self, fixture, market, odds, t):
+        if odds <= 1.0:
+            return None
+        slot = self._slot((fixture, market), t)
+        cap = self.capacity
+        seq = self.seq[slot]
+        row_t, row_o = self.times[slot], self.odds[slot]
+        row_t[seq % cap] = t
+        row_o[seq % cap] = odds
+        prob = 1.0 / odds
+        if seq == 0:
+            self.open_prob[slot] = prob
+        else:
+            dt = t - self.last_time[slot]
+            if dt > 0:
+                decay = math.exp(-dt / self.velocity_tau)
+                rate = (prob - self.last_prob[slot]) / dt * 60.0
+                self.velocity[slot] = decay * self.velocity[slot] + (1 - decay) * rate
+        seq += 1
+        self.seq[slot] = seq
+        self.last_prob[slot] = prob
+        self.last_time[slot] = t
+
+        # 窗口起点前移：不早于缓冲里最旧的点，且时间落在窗口内
+        tail = max(self.tail[slot], seq - cap)
+        start = t - self.steam_window
+        while tail < seq - 1 and row_t[tail % cap] < start:
+            tail += 1
+        self.tail[slot] = tail
+        change = prob - 1.0 / float(row_o[tail % cap])
+        self.window_change[slot] = change
+
+        if abs(change) >= self.steam_threshold and not self.alerting[slot]:
+            self.alerting[slot] = True
+            alert = {"time": t, "fixture": fixture, "market": market, "odds": odds, "change": change,
+                     "seconds": t - float(row_t[tail % cap])}
+            self.alerts.append(alert)
+            return alert
+        if abs(change) < self.steam_threshold / 2:
+            self.alerting[slot] = False
+        return None
+
+    def latest(self, fixture, market, n=None):
+        """最近 n 个点（时间, 赔率），按时间先后；只按下标取，与已存历史长度无关"""
+        with self._lock:
+            slot = self.slots.get((fixture, market))
+            if slot is None:
+                return np.empty(0), np.empty(0, dtype=np.float32)
+            seq = self.seq[slot]
+            k = min(seq, self.capacity) if n is None else min(n, seq, self.capacity)
+            idx = np.arange(seq - k, seq) % self.capacity
+            return self.times[slot, idx], self.odds[slot, idx]
+
+    def summary(self, fixture=None):
+        """每条序列的最新赔率、漂移、速度与窗口变化（概率均为百分点）"""
+        with self._lock:
+            slots = [s for s, key in enumerate(self.keys) if fixture is None or key[0] == fixture]
+            if not slots:
+                return pd.DataFrame()
+            last = np.array([self.last_prob[s] for s in slots])
+            opening = np.array([self.open_prob[s] for s in slots])
+            return pd.DataFrame({
+                "比赛": [self.keys[s][0] for s in slots],
+                "盘口": [self.keys[s][1] for s in slots],
+                "开盘赔率": np.round(1 / opening, 2),
+                "最新赔率": np.round(1 / last, 2),
+                "隐含概率%": np.round(last * 100, 2),
+                "漂移(百分点)": np.round((last - opening) * 100, 2),
+                "速度(百分点/分)": np.round(np.array([self.velocity[s] for s in slots]) * 100, 3),
+                f"{self.steam_window:.0f}秒变化(百分点)": np.round(
+                    np.array([self.window_change[s] for s in slots]) * 100, 2),
+                "异动": [self.alerting[s] for s in slots],
+                "点数": [min(self.seq[s], self.capacity) for s in slots],
+            })
+
+    def recent_alerts(self, n=20):
+        """最近 n 条异动报警（新的在前）"""
+        with self._lock:
+            return list(self.alerts)[-n:][::-1]
+
+
+if __name__ == "__main__":
+    # 基准：python odds_history.py [更新条数] [序列数]
+    n = int(sys.argv[1]) if len(sys.argv) >= 2 else 1000000
+    n_series = int(sys.argv[2]) if len(sys.argv) >= 3 else 5000
+    rng = np.random.default_rng(0)
+    series = rng.integers(0, n_series, n)
+    base = rng.uniform(1.5, 8.0, n_series)
+    steps = np.exp(rng.normal(0, 0.01, n))
+    t0 = 1.7e9
+    ts = t0 + np.sort(rng.uniform(0, 3 * 86400, n))   # 三天的行情
+
+    history = OddsHistory()
+    walk = base.copy()
+    fixtures = [f"Fixture {i // 30}" for i in range(n_series)]
+    markets = [f"m{i % 30}" for i in range(n_series)]
+    start = time.perf_counter()
+    for i, (s, step, t) in enumerate(zip(series.tolist(), steps.tolist(), ts.tolist())):
+        walk[s] = max(1.01, walk[s] * step)
+        history.append(fixtures[s], markets[s], walk[s], t)
+    elapsed = time.perf_counter() - start
+    print(f"{n} 次更新 / {len(history)} 条序列：{n / elapsed:,.0f} 次/秒，"
+          f"缓冲 {history.nbytes / 1e6:.1f} MB（容量 {history.capacity} 点/序列），报警 {len(history.alerts)} 条")
+
+    start = time.perf_counter()
+    for _ in range(10000):
+        history.latest("Fixture 0", "m0", 20)
+    print(f"取最近 20 点：{(time.perf_counter() - start) / 10000 * 1e6:.1f} µs")
+
+    # 核对：密集更新（每2秒一点）时，窗口变化与直接按时间筛选的结果一致
+    dense = OddsHistory()
+    price = 2.0
+    for i in range(1000):
+        price = max(1.01, price * float(np.exp(rng.normal(0, 0.005))))
+        dense.append("Dense", "o25_odds", price, t0 + 2.0 * i)
+    times, odds = dense.latest("Dense", "o25_odds")
+    in_window = times >= times[-1] - dense.steam_window
+    direct = 1 / odds[-1] - 1 / odds[in_window][0]
+    print(f"窗口变化 增量 {dense.window_change[0]:.6f} / 直接 {direct:.6f}；报警 {len(dense.alerts)} 条")
+    start = time.perf_counter()
+    table = history.summary()
+    print(f"全部序列汇总：{(time.perf_counter() - start) * 1000:.0f} ms，{len(table)} 行")
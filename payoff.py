@@ -0,0 +1,245 @@
+import re
+
+import numpy as np
+
+# --- 策略结算引擎（向量化） ---
+# 所有结算函数都按「参数组 × 比赛」的二维数组返回结果，
+# 既给页面上的单场盈亏表使用，也给回测/参数扫描批量使用。
+
+# 策略1固定的6个比分（恰好覆盖总进球≤2的全部比分）
+S1_SCORES = ["0-0", "1-0", "0-1", "1-1", "2-0", "0-2"]
+# 策略2可选的总进球选项
+S2_TOTALS = ["0球", "1球", "2球"]
+# 稳胆选项（从稳胆主队视角）
+S2_RESULTS = ["胜", "平", "负"]
+# 波胆盘口里「其他比分」三个选项：命中盘口中未列出、且赛果为主胜/平/客胜的比分
+CS_OTHER = ["其他主胜", "其他平局", "其他客胜"]
+
+# 页面默认的波胆盘口（比分/其他项 -> 赔率）
+DEFAULT_CS_ODDS = {
+    "0-0": 10.0, "1-0": 8.5, "0-1": 8.0, "1-1": 7.0, "2-0": 13.0, "0-2": 12.0,
+    "2-1": 9.5, "1-2": 11.0, "2-2": 15.0, "3-0": 21.0, "0-3": 26.0, "3-1": 19.0, "1-3": 23.0,
+    "3-2": 26.0, "2-3": 29.0, "3-3": 51.0, "4-0": 41.0, "0-4": 67.0, "4-1": 41.0, "1-4": 51.0,
+    "4-2": 67.0, "2-4": 81.0, "其他主胜": 34.0, "其他平局": 101.0, "其他客胜": 51.0,
+}
+
+_SCORELINE = re.compile(r"^\s*(\d{1,2})\s*[-:：]\s*(\d{1,2})\s*$")
+
+# 比分 -> S1_SCORES 下标的查找表，总进球≥3的位置为-1
+_S1_LOOKUP = np.full((3, 3), -1, dtype=np.int8)
+for _i, _s in enumerate(S1_SCORES):
+    _h, _a = map(int, _s.split("-"))
+    _S1_LOOKUP[_h, _a] = _i
+
+
+def score_index(home_goals, away_goals):
+    """把比分映射为S1_SCORES的下标，总进球≥3返回-1"""
+    hg = np.asarray(home_goals, dtype=np.int64)
+    ag = np.asarray(away_goals, dtype=np.int64)
+    small = (hg + ag) <= 2
+    idx = np.full(hg.shape, -1, dtype=np.int8)
+    idx[small] = _S1_LOOKUP[hg[small], ag[small]]
+    return idx
+
+
+def parse_scoreline(text):
+    """「2-1」「2:1」-> (2, 1)，不是比分返回 None"""
+    m = _SCORELINE.match(str(text))
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+
+def result_index(home_goals, away_goals):
+    """把比分映射为胜/平/负下标 (0/1/2)"""
+    hg = np.asarray(home_goals)
+    ag = np.asarray(away_goals)
+    return np.where(hg > ag, 0, np.where(hg == ag, 1, 2)).astype(np.int8)
+
+
+def _per_param(values, n_params):
+    """把标量或一维参数广播为 (参数组数,) 的浮点数组"""
+    return np.broadcast_to(np.asarray(values, dtype=float), (n_params,))
+
+
+def strategy1_settle(score_hits, total_goals, score_odds, o25_odds, score_stakes, o25_stake):
+    """策略1结算：返回 (净盈亏, 投入)，形状均为 (参数组数, 比赛数)
+
+    score_hits   -- (比赛数, 选项数) 每场赛果命中哪些波胆选项（correct_score_hits）
+    total_goals  -- (比赛数,) 总进球
+    score_odds   -- (比赛数, 选项数) 波胆赔率，NaN表示该选项无法下注
+    o25_odds     -- (比赛数,) 大球赔率
+    score_stakes -- (参数组数, 选项数) 每个选项的投入，0表示不投注
+    o25_stake    -- 标量或 (参数组数,) 大球投入
+    """
+    score_hits = np.asarray(score_hits, dtype=bool)
+    total_goals = np.asarray(total_goals)
+    score_odds = np.asarray(score_odds, dtype=float)
+    o25_odds = np.asarray(o25_odds, dtype=float)
+    stakes = np.atleast_2d(np.asarray(score_stakes, dtype=float))
+    o25_stake = _per_param(o25_stake, stakes.shape[0])
+
+    # 缺失赔率视为当场无法下注，不计投入也不计回报
+    valid = np.isfinite(score_odds)
+    odds = np.where(valid, score_odds, 0.0)
+    o25_valid = np.isfinite(o25_odds)
+
+    cost = stakes @ valid.T.astype(float) + o25_stake[:, None] * o25_valid
+
+    income = stakes @ (score_hits * odds).T
+    income += o25_stake[:, None] * np.where((total_goals >= 3) & o25_valid, o25_odds, 0.0)
+    return income - cost, cost
+
+
+def strategy2_settle(total_goals, strong_result, strong_odds, total_odds, o25_odds,
+                     selection, goal_mask, parlay_stake, o25_stake):
+    """策略2结算：返回 (净盈亏, 投入)，形状均为 (参数组数, 比赛数)
+
+    total_goals   -- (比赛数,) 主比赛总进球
+    strong_result -- (比赛数,) 稳胆比赛赛果下标 (0胜/1平/2负，-1未知：该场不下2串1)
+    strong_odds   -- (比赛数, 3) 稳胆胜平负赔率
+    total_odds    -- (比赛数, 3) 主比赛0/1/2球赔率
+    o25_odds      -- (比赛数,) 大球赔率
+    selection     -- (参数组数,) 稳胆选项下标
+    goal_mask     -- (参数组数, 3) 选择的总进球选项
+    parlay_stake  -- 标量或 (参数组数,) 每注2串1投入
+    o25_stake     -- 标量或 (参数组数,) 大球投入
+    """
+    total_goals = np.asarray(total_goals)
+    strong_result = np.asarray(strong_result)
+    strong_odds = np.asarray(strong_odds, dtype=float)
+    total_odds = np.asarray(total_odds, dtype=float)
+    o25_odds = np.asarray(o25_odds, dtype=float)
+    selection = np.atleast_1d(np.asarray(selection, dtype=np.int64))
+    goal_mask = np.atleast_2d(np.asarray(goal_mask, dtype=bool))
+    n_params = goal_mask.shape[0]
+    selection = np.broadcast_to(selection, (n_params,))
+    parlay_stake = _per_param(parlay_stake, n_params)
+    o25_stake = _per_param(o25_stake, n_params)
+
+    # 每组参数对应的稳胆赔率 (参数组数, 比赛数)
+    strong_sel = strong_odds[:, selection].T
+    # 稳胆赛果未知（-1）的比赛无法结算2串1，和缺赔率一样当场不下注
+    strong_valid = np.isfinite(strong_sel) & (strong_result >= 0)[None, :]
+    tg_valid = np.isfinite(total_odds)
+    o25_valid = np.isfinite(o25_odds)
+
+    # 2串1注数 = 选中且可下注的总进球选项数（稳胆赔率缺失则整组不下注）
+    n_parlays = (goal_mask.astype(float) @ tg_valid.T.astype(float)) * strong_valid
+    cost = parlay_stake[:, None] * n_parlays + o25_stake[:, None] * o25_valid
+
+    small = total_goals <= 2
+    col = np.where(small, total_goals, 0).astype(np.int64)
+    rows = np.arange(len(col))
+    tg_hit_odds = np.where(small & tg_valid[rows, col], total_odds[rows, col], np.nan)
+    # 组合赔率 = 稳胆赔率 × 总进球赔率（与页面一致保留两位小数）
+    combined = np.round(np.where(strong_valid, strong_sel, np.nan) * tg_hit_odds[None, :], 2)
+    win = (strong_result[None, :] == selection[:, None]) & goal_mask[:, col] & np.isfinite(combined)
+    income = np.where(win, parlay_stake[:, None] * np.nan_to_num(combined), 0.0)
+    income += o25_stake[:, None] * np.where(~small & o25_valid, o25_odds, 0.0)
+    return income - cost, cost
+
+
+# --- 完整比分网格 ---
+# 热力图等视图需要每个 (主队进球, 客队进球) 的净盈亏，
+# 这里直接复用上面的结算函数，把网格展开成「比赛」维度一次结算。
+
+MAX_GRID_GOALS = 6
+
+
+def _score_grid(max_goals):
+    """返回展开后的 (主队进球, 客队进球) 网格"""
+    h, a = np.meshgrid(np.arange(max_goals + 1), np.arange(max_goals + 1), indexing="ij")
+    return h.ravel(), a.ravel(), h.shape
+
+
+# --- 任意比分的波胆盘口 ---
+# 盘口是 {选项: (赔率, 金额)}，选项为任意比分或 CS_OTHER 中的「其他」项；
+# 盘口里列出的比分（金额为0也算）决定「其他」项覆盖哪些比分。
+# 结算在比分格上做：(格数, 选项数) 的命中矩阵乘以每个选项的回报，
+# 代价只与选项数成正比，页面上增加比分不会增加组件数量。
+
+def correct_score_hits(home_goals, away_goals, selections, odds=None):
+    """每个比分格命中哪些选项：返回 (格数, 选项数) 的布尔矩阵，无法识别的选项永不命中
+
+    odds 给出 (格数, 选项数) 赔率时（历史数据集每场开出的比分不同），
+    「其他」项只排除该行有赔率的比分；不给则整个盘口的比分都算列出。
+    """
+    hg = np.asarray(home_goals, dtype=np.int64).ravel()
+    ag = np.asarray(away_goals, dtype=np.int64).ravel()
+    parsed = [parse_scoreline(s) for s in selections]
+    offered = np.ones((hg.size, len(selections)), dtype=bool) if odds is None else np.isfinite(odds)
+    listed = np.zeros(hg.shape, dtype=bool)
+    for j, p in enumerate(parsed):
+        if p is not None:
+            listed |= (hg == p[0]) & (ag == p[1]) & offered[:, j]
+    result = result_index(hg, ag)
+    hits = np.zeros((hg.size, len(selections)), dtype=bool)
+    for j, (sel, p) in enumerate(zip(selections, parsed)):
+        if p is not None:
+            hits[:, j] = (hg == p[0]) & (ag == p[1])
+        elif sel in CS_OTHER:
+            hits[:, j] = (result == CS_OTHER.index(sel)) & ~listed
+    return hits
+
+
+def correct_score_settle(home_goals, away_goals, score_bets, o25_odds, o25_stake):
+    """波胆盘口 + 大球项在给定比分上的 (净盈亏, 命中选项下标)，未命中任何选项的下标为-1
+
+    赔率≤1（未开盘）的选项不计投入也不计回报。
+    """
+    selections = list(score_bets)
+    odds = np.array([float(score_bets[s][0]) for s in selections])
+    stakes = np.array([float(score_bets[s][1]) for s in selections])
+    stakes = np.where(odds > 1, stakes, 0.0)
+    hits = correct_score_hits(home_goals, away_goals, selections)
+    total = np.asarray(home_goals, dtype=np.int64).ravel() + np.asarray(away_goals, dtype=np.int64).ravel()
+    income = hits.astype(float) @ (odds * stakes) + np.where(total >= 3, o25_odds * o25_stake, 0.0)
+    hit_idx = np.where(hits.any(axis=1), hits.argmax(axis=1), -1)
+    return income - stakes.sum() - o25_stake, hit_idx
+
+
+def strategy1_score_grid(score_bets, o25_odds, o25_stake, max_goals=MAX_GRID_GOALS):
+    """策略1在完整比分网格上的净盈亏，score_bets 为 {比分或其他项: (赔率, 金额)}"""
+    h, a, shape = _score_grid(max_goals)
+    net, _ = correct_score_settle(h, a, score_bets, o25_odds, o25_stake)
+    return net.reshape(shape)
+
+
+def correct_score_groups(score_bets, max_goals=MAX_GRID_GOALS):
+    """把比分网格按结算结果分组（同组的格子净盈亏相同）
+
+    分组键为 (命中的有投入选项 或 None, 是否3球+)。
+    返回 (每格组号，形状 (max_goals+1, max_goals+1)；组键列表)，组按盘口顺序排列，未命中的组在最后。
+    """
+    h, a, shape = _score_grid(max_goals)
+    staked = {s: v for s, v in score_bets.items() if float(v[0]) > 1 and float(v[1]) > 0}
+    # 「其他」项覆盖的范围由全部列出的比分决定，所以命中矩阵用整个盘口算
+    selections = list(score_bets)
+    hits = correct_score_hits(h, a, selections)
+    staked_cols = [j for j, s in enumerate(selections) if s in staked]
+    hit = np.column_stack([hits[:, staked_cols], np.ones(h.size, dtype=bool)])
+    # 每格最多命中一个选项；都未命中时落到最后的哨兵列
+    hit_idx = hit.argmax(axis=1)
+    over = (h + a) >= 3
+    code = hit_idx * 2 + over
+    keys, group = np.unique(code, return_inverse=True)
+    labels = [(selections[staked_cols[k // 2]] if k // 2 < len(staked_cols) else None, bool(k % 2)) for k in keys]
+    return group.reshape(shape), labels
+
+
+def strategy2_score_grid(goal_odds, strong_odds, parlay_stake, o25_odds, o25_stake,
+                         strong_hit=True, max_goals=MAX_GRID_GOALS):
+    """策略2在主比赛完整比分网格上的净盈亏（稳胆命中或未命中两种情形）
+
+    goal_odds 为 {总进球选项: 赔率}，strong_odds 为所选稳胆选项的赔率
+    """
+    h, a, shape = _score_grid(max_goals)
+    tg_odds = np.array([goal_odds.get(g, np.nan) for g in S2_TOTALS])
+    mask = np.array([g in goal_odds for g in S2_TOTALS])
+    # 稳胆只保留所选选项一列，命中时赛果下标为0
+    strong = np.array([strong_odds, np.nan, np.nan])
+    net, _ = strategy2_settle(
+        h + a, np.full(h.size, 0 if strong_hit else 1), np.broadcast_to(strong, (h.size, 3)),
+        np.broadcast_to(tg_odds, (h.size, 3)), np.full(h.size, o25_odds),
+        0, mask, parlay_stake, o25_stake,
+    )
+    return net[0].reshape(shape)
@@ -0,0 +1,326 @@
+import heapq
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dataflow import fingerprint
+from history_stats import decay_statistics, window_statistics
+from inplay import HOME_SHARE_BOUNDS, InPlayModel, prematch_rates
+from payoff import MAX_GRID_GOALS
+from priors import shrink_statistics
+from strategies import COMMON_SCHEMA, bet_table, fixture_ev, fixture_net, get_strategy, outcome_probs
+
+# --- 开赛前后台预计算 ---
+# 比赛日的赛程交给调度器后，后台线程按开球时间先后逐场算好分析结果
+# （交锋统计、赛前进球模型的比分矩阵、注单×结果收益矩阵、EV），写入跨会话共享层。
+# 缓存键是规范化比赛（analysis_fixture：身份 + 赔率/投注字段，类型统一）的指纹：
+# 赔率或投注一改就是新键，重新提交时只有变了的比赛重新排队；
+# 页面和赛程CSV都经同一个规范化，页面打开一场比赛时用同一个键取结果，预计算过的直接命中。
+# 每场比赛在队列里最多一项，排队期间再变只替换待算的版本；
+# 队列深度、计算中数量和「赔率已变但结果还是旧的」的等待时长（陈旧度）都可以随时读取。
+
+ANALYSIS_KIND = "fixture_analysis"
+GOAL_MODEL_KIND = "goal_model"
+DEFAULT_WORKERS = 2
+RECENT_H2H = 10
+
+
+def goal_model_for(shared, over_prob, home_share):
+    """赛前参数对应的滚球模型（共享层里页面和预计算用同一个键）"""
+    key = (round(float(over_prob), 4), round(float(home_share), 4))
+    return shared.get(GOAL_MODEL_KIND, key, lambda: InPlayModel(*prematch_rates(*key)))
+
+
+def fixture_id(fixture):
+    """比赛身份（与赔率无关）：日期、时间、主客队"""
+    return fixture.get("date"), fixture.get("time"), fixture["home_team"], fixture["away_team"]
+
+
+def kickoff(fixture):
+    """开球时间；日期/时间缺失或无法解析时排到最后"""
+    try:
+        return datetime.strptime(f"{fixture.get('date')} {fixture.get('time')}", "%Y-%m-%d %H:%M")
+    except (TypeError, ValueError):
+        return datetime.max
+
+
+def home_share_from(goal_pred=None, *histories):
+    """主队进球占比：联赛进球模型的预期进球优先，其次依次取交锋统计，都没有时各占一半；
+    收窄到 HOME_SHARE_BOUNDS（某队交锋中一球未进时会取到0或1）"""
+    if goal_pred is not None:
+        share = goal_pred["exp_home_goals"] / (goal_pred["exp_home_goals"] + goal_pred["exp_away_goals"])
+    else:
+        share = next((s["avg_home_goals"] / s["avg_goals"] for s in histories if s and s["avg_goals"] > 0), 0.5)
+    return min(max(float(share), HOME_SHARE_BOUNDS[0]), HOME_SHARE_BOUNDS[1])
+
+
+def _canonical(value):
+    """统一类型后再取指纹：数值都转 float，列表/元组/数组都转元组，字典按键排序"""
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _canonical(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return tuple(_canonical(v) for v in value)
+    if isinstance(value, (int, float, np.number)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def analysis_fixture(fixture, goal_model=None):
+    """页面与预计算共用的比赛规范化：按策略 schema 补齐缺省后只保留身份、赔率和投注字段
+
+    比赛字典里没有 home_share（赛程CSV）时按与页面相同的规则补上：有联赛进球模型就取它的预期进球。
+    """
+    strategy = get_strategy(fixture)
+    if fixture.get("home_share") is None:
+        pred = None if goal_model is None else goal_model.predict(fixture["home_team"], fixture["away_team"])
+        fixture = dict(fixture, home_share=home_share_from(pred))
+    full = strategy.defaults(fixture)
+    return {name: full[name] for name in ["strategy"] + [n for n, *_ in COMMON_SCHEMA + strategy.schema]}
+
+
+def analysis_key(fixture, context_key=None):
+    """分析结果的缓存键：规范化比赛（analysis_fixture）的指纹 + 数据来源的键"""
+    return fingerprint(_canonical(fixture)), context_key
+
+
+def head_to_head(results, home, away, as_of=None):
+    """赛果表里两队的交锋统计（以当前主队视角）：全部场次按时间衰减 + 最近 RECENT_H2H 场"""
+    forward = (results["home_team"] == home) & (results["away_team"] == away)
+    reverse = (results["home_team"] == away) & (results["away_team"] == home)
+    rows = results[forward | reverse]
+    # 先按 ISO 日期解析，其余（日/月/年）再按日在前解析
+    parsed = pd.to_datetime(rows["date"], format="ISO8601", errors="coerce")
+    other = parsed.isna()
+    if other.any():
+        parsed[other] = pd.to_datetime(rows["date"][other], dayfirst=True, errors="coerce")
+    days = parsed.to_numpy().astype("datetime64[D]")
+    flip = (rows["home_team"] == away).to_numpy()
+    hg = np.where(flip, rows["away_goals"], rows["home_goals"]).astype(float)
+    ag = np.where(flip, rows["home_goals"], rows["away_goals"]).astype(float)
+    keep = ~np.isnat(days) & ~np.isnan(hg) & ~np.isnan(ag)
+    if as_of is not None:
+        keep &= days < np.datetime64(as_of, "D")
+    order = np.argsort(days[keep], kind="stable")
+    days, hg, ag = days[keep][order], hg[keep][order], ag[keep][order]
+    if not len(days):
+        return None
+    stats = {k: float(v) for k, v in decay_statistics(days, hg, ag, as_of=as_of).items()}
+    stats["total_matches"] = len(days)
+    stats["recent"] = {k: float(v) for k, v in window_statistics(days, hg, ag, last_n=RECENT_H2H).items()}
+    return stats
+
+
+def analyse_fixture(fixture, shared, results=None, priors=None, goal_model=None):
+    """一场比赛的完整赛前分析（结果写入共享层，全部只读）"""
+    t0 = time.perf_counter()
+    model = goal_model_for(shared, fixture["pred_prob"], fixture.get("home_share", 0.5))
+    out = {
+        "ev": fixture_ev(fixture),
+        "bets": bet_table(fixture),
+        "net": fixture_net(fixture),
+        "probs": outcome_probs(fixture),
+        "score_matrix": model.final_score_matrix(0, 0, 0, MAX_GRID_GOALS)[0],
+    }
+    if goal_model is not None:
+        out["model_score_matrix"] = goal_model.score_matrix(fixture["home_team"], fixture["away_team"])
+    if results is not None:
+        history = head_to_head(results, fixture["home_team"], fixture["away_team"], fixture.get("date"))
+        if history is not None and priors is not None:
+            history = shrink_statistics(history, priors.lookup(fixture.get("league")))
+        out["history"] = history
+    out["seconds"] = time.perf_counter() - t0
+    out["computed_at"] = time.time()
+    return out
+
+
+class PrecomputeScheduler:
+    """按开球时间排队的后台预计算；结果放进共享层的 ANALYSIS_KIND 类别"""
+
+    def __init__(self, shared, workers=DEFAULT_WORKERS):
+        self.shared = shared
+        self._cond = threading.Condition()
+        self._heap = []          # (已开球, 开球时间, 序号, 比赛身份)
+        self._queued = set()
+        self._pending = {}       # 比赛身份 -> (比赛字典, 缓存键, 构建函数, 提交时间)
+        self._running = {}       # 比赛身份 -> 开始时间
+        self._ready = {}         # 比赛身份 -> {键, 开球, 完成时间, 耗时}
+        self._seq = 0
+        self.counts = Counter()
+        self._threads = [threading.Thread(target=self._work, daemon=True, name=f"precompute-{i}")
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fixtures, build, context_key=None, now=None):
+        """提交（或刷新）一批比赛；build(比赛字典) 返回分析结果。结果已是最新的比赛不会重新排队"""
+        now = datetime.now() if now is None else now
+        added = 0
+        with self._cond:
+            for fixture in fixtures:
+                fid = fixture_id(fixture)
+                key = analysis_key(fixture, context_key)
+                ready = self._ready.get(fid)
+                pending = self._pending.get(fid)
+                if (ready is not None and ready["key"] == key) or (pending is not None and pending[1] == key):
+                    continue
+                # 排队期间再变只替换待算版本，但保留最早的提交时间（陈旧度从第一次变化算起）
+                since = pending[3] if pending is not None else time.time()
+                self._pending[fid] = (dict(fixture), key, build, since)
+                if fid not in self._queued:
+                    start = kickoff(fixture)
+                    # 已开球的比赛排在所有未开球的比赛之后
+                    heapq.heappush(self._heap, (start < now, start, self._seq, fid))
+                    self._seq += 1
+                    self._queued.add(fid)
+                self.counts["refreshed" if ready is not None else "submitted"] += 1
+                added += 1
+            self._cond.notify_all()
+        return added
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                *_, fid = heapq.heappop(self._heap)
+                self._queued.discard(fid)
+                fixture, key, build, since = self._pending.pop(fid)
+                self._running[fid] = time.time()
+            try:
+                result = self.shared.get(ANALYSIS_KIND, key, lambda: build(fixture))
+                error = None
+            except Exception as e:   # 单场失败不影响其他比赛，错误记在状态里
+                result, error = None, f"{type(e).__name__}: {e}"
+            with self._cond:
+                self._running.pop(fid, None)
+                self._ready[fid] = {"key": key, "kickoff": kickoff(fixture), "finished": time.time(),
+                                    "seconds": None if result is None else result["seconds"], "error": error,
+                                    "since": since}
+                self.counts["failed" if error else "computed"] += 1
+                self._cond.notify_all()
+
+    def wait_idle(self, timeout=None):
+        """等到队列清空且没有计算中的比赛（基准/测试用），超时返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._heap or self._running:
+                left = None if deadline is None else deadline - time.monotonic()
+                if left is not None and left <= 0:
+                    return False
+                self._cond.wait(left)
+        return True
+
+    def metrics(self, now=None):
+        """队列深度、计算中数量、累计次数和陈旧度（秒）"""
+        now = time.time() if now is None else now
+        with self._cond:
+            waiting = [now - p[3] for p in self._pending.values()]
+            stale = [now - p[3] for fid, p in self._pending.items() if fid in self._ready]
+            ages = [now - r["finished"] for r in self._ready.values() if r["error"] is None]
+            return {
+                "queue_depth": len(self._pending),
+                "running": len(self._running),
+                "ready": sum(r["error"] is None for r in self._ready.values()),
+                "submitted": self.counts["submitted"],
+                "refreshed": self.counts["refreshed"],
+                "computed": self.counts["computed"],
+                "failed": self.counts["failed"],
+                # 最久的等待（含首次排队）与赔率已变、结果仍是旧版本的最长时间
+                "max_wait": max(waiting, default=0.0),
+                "max_staleness": max(stale, default=0.0),
+                "oldest_result_age": max(ages, default=0.0),
+            }
+
+    def status(self, now=None):
+        """逐场状态表（按开球时间）"""
+        now = time.time() if now is None else now
+        rows = []
+        with self._cond:
+            fids = set(self._ready) | set(self._pending) | set(self._running)
+            for fid in fids:
+                ready = self._ready.get(fid)
+                pending = self._pending.get(fid)
+                if fid in self._running:
+                    state = "计算中"
+                elif pending is not None:
+                    state = "赔率已变·排队中" if ready is not None else "排队中"
+                else:
+                    state = "失败" if ready["error"] else "已就绪"
+                rows.append({
+                    "比赛": f"{fid[2]} vs {fid[3]}", "开球": f"{fid[0]} {fid[1]}", "状态": state,
+                    "结果时长(秒)": None if ready is None else round(now - ready["finished"], 1),
+                    "等待(秒)": None if pending is None else round(now - pending[3], 1),
+                    "计算耗时(ms)": None if ready is None or ready["seconds"] is None
+                    else round(ready["seconds"] * 1000, 1),
+                    "错误": "" if ready is None or ready["error"] is None else ready["error"],
+                })
+        rows.sort(key=lambda r: r["开球"])
+        return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    # 基准：python precompute.py [比赛数] [线程数]
+    from shared_cache import SharedCache
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_WORKERS
+    rng = np.random.default_rng(0)
+    base = datetime(2030, 1, 1, 12, 0)
+    fixtures = []
+    for i in range(n):
+        start = base + pd.Timedelta(minutes=int(rng.integers(0, 3 * 24 * 60)))
+        fixtures.append({
+            "league": "英超", "date": start.strftime("%Y-%m-%d"), "time": start.strftime("%H:%M"),
+            "home_team": f"H{i}", "away_team": f"A{i}", "strategy": "策略 1：比分精准流",
+            "pred_prob": round(float(rng.uniform(0.35, 0.65)), 2), "home_share": 0.5,
+            "o25_odds": round(float(rng.uniform(1.7, 2.4)), 2), "o25_stake": 100.0,
+            "score_bets": {"1-0": (7.5, 10.0), "2-1": (9.0, 10.0), "1-1": (6.5, 10.0)},
+        })
+    fixtures = [analysis_fixture(f) for f in fixtures]
+    results = pd.DataFrame({
+        "date": pd.date_range("2020-01-01", periods=4000, freq="D").strftime("%Y-%m-%d"),
+        "home_team": [f"H{i % n}" for i in range(4000)], "away_team": [f"A{i % n}" for i in range(4000)],
+        "home_goals": rng.poisson(1.4, 4000), "away_goals": rng.poisson(1.1, 4000),
+    })
+
+    shared = SharedCache(max_entries=4 * n)
+    scheduler = PrecomputeScheduler(shared, workers)
+    order = []
+
+    def build(fixture):
+        order.append(kickoff(fixture))
+        return analyse_fixture(fixture, shared, results)
+
+    t0 = time.perf_counter()
+    scheduler.submit(fixtures, build, "bench")
+    scheduler.wait_idle()
+    elapsed = time.perf_counter() - t0
+    late = sum(b < a for a, b in zip(order, order[1:]))
+    print(f"{n} 场 / {workers} 线程：全部预计算 {elapsed:.2f} s（{elapsed / n * 1000:.1f} ms/场），"
+          f"开球顺序逆序 {late} 处（多线程时相邻完成可能交错）")
+
+    # 页面打开比赛：命中共享层 vs 现算
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        shared.get(ANALYSIS_KIND, analysis_key(fixtures[0], "bench"), lambda: None)
+    t_hit = (time.perf_counter() - t0) / 1000
+    t0 = time.perf_counter()
+    analyse_fixture(fixtures[0], shared, results)
+    t_miss = time.perf_counter() - t0
+    print(f"打开比赛：预计算命中 {t_hit * 1e6:.0f} µs，现算 {t_miss * 1000:.1f} ms")
+
+    # 赔率变化：只有变了的比赛重新排队
+    changed = [analysis_fixture(dict(f, o25_odds=f["o25_odds"] + 0.05)) for f in fixtures[:20]]
+    requeued = scheduler.submit(fixtures[20:] + changed, build, "bench")
+    m = scheduler.metrics()
+    print(f"赔率变化 20 场后重新提交全部：排队 {requeued} 场，队列深度 {m['queue_depth']}，"
+          f"陈旧度 {m['max_staleness'] * 1000:.1f} ms")
+    scheduler.wait_idle()
+    m = scheduler.metrics()
+    print(f"刷新完成：计算 {m['computed']} 次、刷新 {m['refreshed']} 次，队列 {m['queue_depth']}，"
+          f"陈旧度 {m['max_staleness']:.2f} s")
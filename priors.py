@@ -0,0 +1,186 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# --- 联赛先验 + 贝叶斯收缩 ---
+# 从赛果数据预先算出每个联赛的基准：胜平负比例、大球比例、场均进球和总进球分布，
+# 存成一个很小的 .npz 表（每个联赛一行，外加「全部」一行），进程内只加载一次；
+# 每个联赛的查找结果在加载时就建好，页面重跑时只是一次字典查找。
+#
+# 历史交锋往往只有几场，直接用它的大球比例噪声很大。按共轭先验把交锋统计向联赛基准收缩：
+#   比率（Beta / Dirichlet）：后验 = (交锋计数 + k·联赛比率) / (交锋场数 + k)
+#   场均进球（Gamma–Poisson）：后验 = (交锋总进球 + k·联赛场均) / (交锋场数 + k)
+# k 是先验的「等效场数」：交锋越少越靠近联赛基准，场数远大于 k 时基本由交锋决定。
+# 时间衰减/滚动窗口统计用其有效场数代替场数，同一个公式即可。
+
+PRIORS_FILE = "league_priors.npz"
+ALL_LEAGUES = "全部"
+DEFAULT_STRENGTH = 8.0
+MAX_TOTAL = 6   # 总进球分布 0..5 球，最后一格为 6 球+
+
+RATE_FIELDS = ("home_win_rate", "draw_rate", "away_win_rate", "over_25_rate")
+GOAL_FIELDS = ("avg_goals", "avg_home_goals", "avg_away_goals")
+VALUE_FIELDS = RATE_FIELDS + GOAL_FIELDS
+
+
+def build_priors(df):
+    """用赛果表（home_goals, away_goals，可选 league）按联赛汇总先验（一次 bincount 完成全部联赛）"""
+    df = df.dropna(subset=["home_goals", "away_goals"])
+    hg = df["home_goals"].to_numpy(dtype=float)
+    ag = df["away_goals"].to_numpy(dtype=float)
+    if "league" in df.columns:
+        codes, names = pd.factorize(df["league"].astype(str), sort=True)
+        names = list(names)
+    else:
+        codes, names = np.zeros(len(df), dtype=np.int64), []
+    # 最后一行是「全部」：所有比赛再汇总一次
+    n_rows = len(names) + 1
+    codes = np.concatenate([codes, np.full(len(df), len(names))])
+    hg, ag = np.tile(hg, 2), np.tile(ag, 2)
+    goals = hg + ag
+    count = np.bincount(codes, minlength=n_rows).astype(float)
+    safe = np.maximum(count, 1.0)
+
+    def mean(values):
+        return np.bincount(codes, weights=values.astype(float), minlength=n_rows) / safe
+
+    values = np.column_stack([
+        mean(hg > ag) * 100, mean(hg == ag) * 100, mean(hg < ag) * 100, mean(goals > 2) * 100,
+        mean(goals), mean(hg), mean(ag),
+    ])
+    bucket = np.minimum(goals, MAX_TOTAL).astype(np.int64)
+    dist = np.bincount(codes * (MAX_TOTAL + 1) + bucket, minlength=n_rows * (MAX_TOTAL + 1))
+    dist = dist.reshape(n_rows, MAX_TOTAL + 1) / safe[:, None]
+    return LeaguePriors(names + [ALL_LEAGUES], count, values, dist)
+
+
+class LeaguePriors:
+    """联赛先验表：names[i] 一行，含场数、VALUE_FIELDS 各列和总进球分布"""
+
+    def __init__(self, names, matches, values, goal_dist):
+        self.names = list(names)
+        self.matches = np.asarray(matches, dtype=float)
+        self.values = np.asarray(values, dtype=float)
+        self.goal_dist = np.asarray(goal_dist, dtype=float)
+        # 查找结果预先建好，查询只是字典取值
+        self._rows = {
+            name: {"league": name, "matches": float(self.matches[i]),
+                   **dict(zip(VALUE_FIELDS, self.values[i].tolist())), "goal_dist": self.goal_dist[i]}
+            for i, name in enumerate(self.names)
+        }
+
+    def __contains__(self, league):
+        return league in self._rows
+
+    def lookup(self, league):
+        """联赛的先验（表中没有该联赛时退回「全部」）；返回的字典为共享对象，只读"""
+        return self._rows.get(league, self._rows[ALL_LEAGUES])
+
+    def table(self):
+        """先验表（展示用）"""
+        out = pd.DataFrame({"联赛": self.names, "场数": self.matches.astype(int)})
+        for label, col in (("主胜%", 0), ("平局%", 1), ("客胜%", 2), ("大球%", 3), ("场均进球", 4)):
+            out[label] = self.values[:, col].round(2 if col == 4 else 1)
+        for g in range(MAX_TOTAL + 1):
+            out[f"{g}球{'+' if g == MAX_TOTAL else ''}%"] = (self.goal_dist[:, g] * 100).round(1)
+        return out
+
+    def save(self, path):
+        """写成 .npz（先写临时文件再替换，读进程不会看到半个文件）"""
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, names=np.array(self.names, dtype=str), matches=self.matches, values=self.values,
+                 goal_dist=self.goal_dist)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["names"].tolist(), data["matches"], data["values"], data["goal_dist"])
+
+
+def goal_counts(stats):
+    """calculate_statistics 的总进球分布 {球数: 场数} 转成 0..MAX_TOTAL+ 的计数数组"""
+    counts = np.zeros(MAX_TOTAL + 1)
+    for goals, n in stats.get("goal_distribution", {}).items():
+        counts[min(int(goals), MAX_TOTAL)] += n
+    return counts
+
+
+def shrink_statistics(stats, prior, strength=DEFAULT_STRENGTH):
+    """把交锋统计向联赛先验收缩；stats 可以是 calculate_statistics 的结果或加权统计（有 effective_matches）
+
+    返回同样字段的新字典，另加 prior_weight（先验所占权重）、prior_league；
+    有总进球分布时再加 goal_probs（收缩后的 0..MAX_TOTAL+ 球概率）。
+    """
+    n = stats.get("effective_matches", stats.get("total_matches", 0)) if stats else 0
+    n = np.asarray(n, dtype=float)
+    k = float(strength)
+    w = np.where(n + k > 0, n / np.maximum(n + k, 1e-12), 0.0)
+    out = dict(stats or {})
+    for field in VALUE_FIELDS:
+        out[field] = w * out.get(field, 0.0) + (1 - w) * prior[field]
+    out["under_25_rate"] = 100 - out["over_25_rate"]
+    out["prior_weight"] = 1 - w
+    out["prior_league"] = prior["league"]
+    if "goal_distribution" in out:
+        out["goal_probs"] = (goal_counts(out) + k * prior["goal_dist"]) / max(float(n) + k, 1e-12)
+    return out
+
+
+if __name__ == "__main__":
+    # 批处理用法：
+    #   python priors.py build results.csv league_priors.npz
+    #   python priors.py info league_priors.npz
+    # 基准：python priors.py [比赛数]
+    if len(sys.argv) >= 4 and sys.argv[1] == "build":
+        priors = build_priors(pd.read_csv(sys.argv[2]))
+        priors.save(sys.argv[3])
+        print(f"已写入 {len(priors.names) - 1} 个联赛（{int(priors.matches[-1])} 场）-> {sys.argv[3]}")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "info":
+        print(LeaguePriors.load(sys.argv[2]).table().to_string(index=False))
+    else:
+        n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+        rng = np.random.default_rng(0)
+        leagues = [f"L{i:02d}" for i in range(20)]
+        lg = rng.integers(0, len(leagues), n)
+        rate = 1.1 + 0.05 * lg
+        df = pd.DataFrame({"league": np.array(leagues)[lg], "home_goals": rng.poisson(rate * 1.15),
+                           "away_goals": rng.poisson(rate * 0.85)})
+
+        t0 = time.perf_counter()
+        priors = build_priors(df)
+        t_build = time.perf_counter() - t0
+        path = os.path.join(os.environ.get("TMPDIR", "/tmp"), PRIORS_FILE)
+        priors.save(path)
+        t0 = time.perf_counter()
+        priors = LeaguePriors.load(path)
+        t_load = time.perf_counter() - t0
+        print(f"{n} 场 / {len(leagues)} 个联赛：汇总 {t_build * 1000:.1f} ms，"
+              f"表 {os.path.getsize(path)} 字节，加载 {t_load * 1000:.2f} ms")
+
+        # 与逐联赛 pandas 汇总对照
+        g = df.assign(over=(df.home_goals + df.away_goals) > 2, draw=df.home_goals == df.away_goals)
+        ref = g.groupby("league")[["over", "draw"]].mean() * 100
+        got = priors.values[:-1][:, [3, 1]]
+        print(f"与 groupby 的最大差异: {np.abs(got - ref.to_numpy()).max():.2e}")
+
+        reps = 100_000
+        t0 = time.perf_counter()
+        for i in range(reps):
+            priors.lookup(leagues[i % 20])
+        t_lookup = (time.perf_counter() - t0) / reps
+        h2h = {"total_matches": 3, "home_win_rate": 100 / 3, "draw_rate": 0.0, "away_win_rate": 200 / 3,
+               "over_25_rate": 100.0, "avg_goals": 4.0, "avg_home_goals": 2.0, "avg_away_goals": 2.0,
+               "goal_distribution": {3: 1, 4: 1, 5: 1}}
+        prior = priors.lookup("L05")
+        t0 = time.perf_counter()
+        for _ in range(10_000):
+            post = shrink_statistics(h2h, prior)
+        t_shrink = (time.perf_counter() - t0) / 10_000
+        print(f"查找 {t_lookup * 1e9:.0f} ns/次，收缩 {t_shrink * 1e6:.1f} µs/次")
+        print(f"3 场交锋大球 100% -> 收缩后 {post['over_25_rate']:.1f}%（联赛 {prior['over_25_rate']:.1f}%，"
+              f"先验权重 {post['prior_weight']:.2f}）")
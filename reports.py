@@ -0,0 +1,287 @@
+import html
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from string import Template
+
+import pandas as pd
+
+from strategies import STRATEGIES, fixture_ev, fixture_payoff, get_strategy, outcome_rows
+
+# --- 比赛日批量策略报告 ---
+# 每场比赛用与页面「策略报告生成」相同的字段生成报告，
+# 模板在导入时编译一次；整个比赛日作为一个任务交给后台线程（_EXECUTOR）逐场渲染，
+# 页面只提交任务并轮询结果，不会被渲染阻塞。渲染是纯 Python（受 GIL 限制），
+# 按场分到多个线程并不会更快，所以 submit_reports 不再按场并行；generate_reports 的 workers 仅供批处理试验。
+# 输出：单个HTML汇总、每场一个Markdown、一个汇总CSV。
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="report")
+
+MD_TEMPLATE = Template("""# 📋 策略报告：$home_team vs $away_team
+
+**比赛信息**
+- 🏆 联赛: $league
+- 🏠 主队: $home_team
+- ✈️ 客队: $away_team
+- 📅 时间: $date $time
+
+**策略参数**
+- 🎯 选择策略: $strategy
+- 📊 预测大球概率: $pred_pct%
+- ⚖️ 大球赔率: $o25_odds
+$strategy_lines
+**投注详情**
+- 💰 大球投入: $$$o25_stake
+- 💰 对冲/2串1投入: $$$hedge_cost
+- 💰 方案总投入: $$$total_cost
+
+**风险评估**
+- 📈 策略期望值: $$$ev
+- 📈 单纯大球EV: $$$simple_ev
+- 🎲 对冲效果: $hedge_effect%
+
+**盈亏表**
+
+| 模拟赛果 | 净盈亏 | 类型 | 概率% |
+|---|---|---|---|
+$table_rows
+""")
+
+HTML_FIXTURE_TEMPLATE = Template("""<section class="fixture">
+<h2>$home_team vs $away_team</h2>
+<p class="meta">$league · $date $time · $strategy</p>
+<ul>
+<li>预测大球概率: $pred_pct%</li>
+<li>大球赔率: $o25_odds</li>
+$strategy_items
+<li>方案总投入: $$$total_cost</li>
+<li>策略期望值: <strong>$$$ev</strong>（单纯大球EV $$$simple_ev）</li>
+<li>对冲效果: $hedge_effect%</li>
+</ul>
+<table>
+<tr><th>模拟赛果</th><th>净盈亏</th><th>类型</th><th>概率%</th></tr>
+$table_rows
+</table>
+</section>
+""")
+
+HTML_BUNDLE_TEMPLATE = Template("""<!DOCTYPE html>
+<html lang="zh">
+<head>
+<meta charset="utf-8">
+<title>比赛日策略报告 ($count 场)</title>
+<style>
+body { font-family: sans-serif; margin: 2rem; }
+.fixture { border-left: 4px solid #1e3c72; padding: 0 1rem; margin-bottom: 2rem; }
+.meta { color: #666; }
+table { border-collapse: collapse; }
+td, th { border: 1px solid #dee2e6; padding: 4px 8px; }
+.neg { color: #d63031; } .pos { color: #00b894; }
+</style>
+</head>
+<body>
+<h1>🔺 比赛日策略报告（共 $count 场）</h1>
+$sections
+<p><em>本报告仅用于教育目的，展示投注的数学原理和风险。</em></p>
+</body>
+</html>
+""")
+
+CSV_COLUMNS = [
+    "联赛", "日期", "时间", "主队", "客队", "策略", "预测大球概率%", "大球赔率",
+    "大球投入", "对冲投入", "总投入", "EV", "单纯大球EV", "对冲效果%",
+]
+
+
+def fixture_report_data(fixture):
+    """计算单场报告所需的全部字段；盈亏表、概率和EV都由策略注册表的收益矩阵算出（与页面一致）"""
+    bets, _ = fixture_payoff(fixture)
+    rows = outcome_rows(fixture)
+    hedge_cost = sum(b["stake"] for b in bets if b["label"] != "大球2.5")
+    ev = fixture_ev(fixture)
+    simple_ev = (fixture["pred_prob"] * fixture["o25_odds"] - 1) * fixture["o25_stake"]
+    hedge_effect = (abs(ev) - abs(simple_ev)) / abs(simple_ev) * 100 if simple_ev != 0 else 0
+    return {
+        "fixture": fixture,
+        "rows": rows,
+        "hedge_cost": hedge_cost,
+        "total_cost": hedge_cost + fixture["o25_stake"],
+        "ev": ev,
+        "simple_ev": simple_ev,
+        "hedge_effect": hedge_effect,
+    }
+
+
+def _fields(data, escape):
+    """模板公共字段（escape 用于HTML转义）"""
+    f = data["fixture"]
+    return {
+        "league": escape(str(f.get("league", ""))),
+        "home_team": escape(str(f["home_team"])),
+        "away_team": escape(str(f["away_team"])),
+        "date": escape(str(f.get("date", ""))),
+        "time": escape(str(f.get("time", ""))),
+        "strategy": escape(f["strategy"]),
+        "pred_pct": f"{f['pred_prob'] * 100:.1f}",
+        "o25_odds": f"{f['o25_odds']}",
+        "o25_stake": f"{f['o25_stake']:.2f}",
+        "hedge_cost": f"{data['hedge_cost']:.2f}",
+        "total_cost": f"{data['total_cost']:.2f}",
+        "ev": f"{data['ev']:.2f}",
+        "simple_ev": f"{data['simple_ev']:.2f}",
+        "hedge_effect": f"{data['hedge_effect']:.1f}",
+    }
+
+
+def _strategy_details(f):
+    """策略特有参数的 (名称, 值) 列表：策略自己的说明 + 全部注单"""
+    strategy = get_strategy(f)
+    bets, _ = fixture_payoff(f)
+    return strategy.describe(strategy.defaults(f)) + [
+        ("注单", "、".join(f"{b['label']}@{b['odds']}×${b['stake']:.2f}" for b in bets) or "无")]
+
+
+def render_markdown(data):
+    """渲染单场Markdown报告"""
+    fields = _fields(data, lambda s: s)
+    fields["strategy_lines"] = "".join(f"- {k}: {v}\n" for k, v in _strategy_details(data["fixture"]))
+    fields["table_rows"] = "\n".join(
+        f"| {r['模拟赛果']} | {r['净盈亏']:.2f} | {r['类型']} | {r['概率'] * 100:.1f} |" for r in data["rows"])
+    return MD_TEMPLATE.substitute(fields)
+
+
+def render_html_section(data):
+    """渲染单场HTML片段"""
+    fields = _fields(data, html.escape)
+    fields["strategy_items"] = "\n".join(
+        f"<li>{html.escape(k)}: {html.escape(v)}</li>" for k, v in _strategy_details(data["fixture"]))
+    fields["table_rows"] = "\n".join(
+        f"<tr><td>{html.escape(r['模拟赛果'])}</td>"
+        f"<td class=\"{'neg' if r['净盈亏'] < 0 else 'pos'}\">{r['净盈亏']:.2f}</td>"
+        f"<td>{r['类型']}</td><td>{r['概率'] * 100:.1f}</td></tr>" for r in data["rows"])
+    return HTML_FIXTURE_TEMPLATE.substitute(fields)
+
+
+def csv_row(data):
+    """单场汇总CSV行"""
+    f = data["fixture"]
+    return [
+        f.get("league", ""), f.get("date", ""), f.get("time", ""), f["home_team"], f["away_team"],
+        f["strategy"], round(f["pred_prob"] * 100, 1), f["o25_odds"], f["o25_stake"],
+        round(data["hedge_cost"], 2), round(data["total_cost"], 2), round(data["ev"], 2),
+        round(data["simple_ev"], 2), round(data["hedge_effect"], 1),
+    ]
+
+
+def _render_one(fixture):
+    """工作线程：单场计算 + 三种格式渲染"""
+    data = fixture_report_data(fixture)
+    return render_markdown(data), render_html_section(data), csv_row(data)
+
+
+def markdown_filename(i, fixture):
+    """每场Markdown的文件名"""
+    name = f"{i + 1:03d}_{fixture['home_team']}_vs_{fixture['away_team']}.md"
+    return "".join(c if c not in '\\/:*?"<>|' else "_" for c in name)
+
+
+def generate_reports(fixtures, workers=None):
+    """生成整个比赛日的报告，返回 {"html", "markdown", "csv"}；workers 给出时按场分到线程池渲染"""
+    if workers:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            rendered = list(pool.map(_render_one, fixtures, chunksize=32))
+    else:
+        rendered = [_render_one(f) for f in fixtures]
+    markdown = {markdown_filename(i, f): md for i, (f, (md, _, _)) in enumerate(zip(fixtures, rendered))}
+    bundle = HTML_BUNDLE_TEMPLATE.substitute(
+        count=len(fixtures), sections="\n".join(h for _, h, _ in rendered))
+    csv_text = pd.DataFrame([row for _, _, row in rendered], columns=CSV_COLUMNS).to_csv(index=False)
+    return {"html": bundle, "markdown": markdown, "csv": csv_text}
+
+
+def submit_reports(fixtures):
+    """在后台线程中逐场生成整个比赛日的报告（一个任务），立即返回 Future"""
+    return _EXECUTOR.submit(generate_reports, list(fixtures))
+
+
+def bundle_zip(bundle):
+    """把全部输出打包为zip字节流（供下载）"""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("report.html", bundle["html"])
+        zf.writestr("summary.csv", bundle["csv"].encode("utf-8-sig"))
+        for name, md in bundle["markdown"].items():
+            zf.writestr(f"markdown/{name}", md)
+    return buf.getvalue()
+
+
+def write_bundle(bundle, out_dir):
+    """把全部输出写入目录"""
+    os.makedirs(os.path.join(out_dir, "markdown"), exist_ok=True)
+    with open(os.path.join(out_dir, "report.html"), "w", encoding="utf-8") as f:
+        f.write(bundle["html"])
+    with open(os.path.join(out_dir, "summary.csv"), "w", encoding="utf-8-sig") as f:
+        f.write(bundle["csv"])
+    for name, md in bundle["markdown"].items():
+        with open(os.path.join(out_dir, "markdown", name), "w", encoding="utf-8") as f:
+            f.write(md)
+
+
+def _number(rec, name, default, row):
+    """CSV一行里的数值字段：列不存在时用默认值（default 为 None 表示必填），空白或不是数字报错"""
+    if name not in rec:
+        if default is None:
+            raise ValueError(f"{row}: 缺少 {name}")
+        return default
+    value = pd.to_numeric(pd.Series([rec[name]]), errors="coerce").iloc[0]
+    if pd.isna(value):
+        raise ValueError(f"{row}: {name} 为空或不是数字（{rec[name]!r}）")
+    return float(value)
+
+
+def fixtures_from_frame(df):
+    """从比赛日CSV读取比赛列表
+
+    通用列：league, date, time, home_team, away_team, strategy(1/2 或策略全名), pred_prob, o25_odds, o25_stake
+    策略1：scores ("1-1;2-1;其他主胜"), score_stake, cs_<比分或其他项>（如 cs_2-1、cs_其他主胜）
+    策略2：s2_home_team, s2_away_team, s2_league, s2_selection(胜/平/负),
+           s2_win_odds, s2_draw_odds, s2_lose_odds, goals ("1球;2球"), tg_0 … tg_2, parlay_stake
+    其他已登记的策略按各自的 schema / from_record 解析。
+    pred_prob、o25_odds 必填；策略编号无法识别或数值缺失/越界时抛出 ValueError（指明CSV行号）。
+    """
+    numbered = {str(i + 1): name for i, name in enumerate(STRATEGIES)}
+    for col in ("home_team", "away_team", "pred_prob", "o25_odds"):
+        if col not in df.columns:
+            raise ValueError(f"比赛日CSV缺少 {col} 列")
+    fixtures = []
+    for i, rec in enumerate(df.to_dict("records")):
+        row = f"第 {i + 2} 行"   # 表头占第1行
+        code = rec.get("strategy", "1")
+        if pd.isna(code):
+            code = "1"
+        # 数值列读出来的 2.0 按编号 "2" 处理
+        code = str(int(code)) if isinstance(code, float) and code.is_integer() else str(code).strip()
+        strategy = numbered.get(code, code)
+        if strategy not in STRATEGIES:
+            raise ValueError(f"{row}: 无法识别的策略「{code}」（可用 1-{len(STRATEGIES)} 或策略全名）")
+        pred = _number(rec, "pred_prob", None, row)
+        pred = pred / 100 if pred > 1 else pred
+        o25_odds = _number(rec, "o25_odds", None, row)
+        o25_stake = _number(rec, "o25_stake", 100.0, row)
+        if not 0 < pred < 1 or o25_odds <= 1 or o25_stake < 0:
+            raise ValueError(f"{row}: pred_prob 须在 0-1（或 0-100%）之间、o25_odds 须大于1、o25_stake 不能为负")
+        f = {
+            "league": rec.get("league", ""),
+            "date": rec.get("date", ""),
+            "time": rec.get("time", ""),
+            "home_team": rec["home_team"],
+            "away_team": rec["away_team"],
+            "strategy": strategy,
+            "pred_prob": pred,
+            "o25_odds": o25_odds,
+            "o25_stake": o25_stake,
+        }
+        f.update(get_strategy(f["strategy"]).from_record(rec))
+        fixtures.append(f)
+    return fixtures
@@ -0,0 +1,115 @@
+import sys
+import time
+
+import numpy as np
+
+from distribution import fixture_outcomes, random_book
+
+# --- 破产概率（资金状态上的马尔可夫链 / 动态规划） ---
+# 把资金离散成 0..M 个状态（状态0 = 资金≤0 的破产吸收态），
+# 每注的净盈亏分布就是一个稀疏的转移算子：从状态 i 只能跳到 i + d_j（d_j 为各结果的格数位移）。
+# 反向递推 r_{n+1}(i) = Σ_j p_j · r_n(i + d_j)，r_n(i) 为「还剩 n 注时从状态 i 出发最终破产」的概率，
+# 一次递推同时得到所有起始资金的结果；每个投注倍数用自己的金额步长（位移 d_j 不同），
+# 叠成一个批次一起算。
+# 资金超过上限时按上限处理；上限默认取到 n 注后「期望 + 5 倍标准差」之外，
+# 在那之上再跌回破产的路径可以忽略（若有影响也是高估破产概率，偏保守）。
+
+DEFAULT_STATES = 800
+# 上限离起始资金的标准差倍数
+CAP_SIGMAS = 5.0
+
+
+def merge_outcomes(net, prob):
+    """合并净盈亏相同的结果（比分网格里大量格子的盈亏相同）"""
+    values, inverse = np.unique(np.round(np.asarray(net, dtype=float), 6), return_inverse=True)
+    return values, np.bincount(inverse, weights=prob)
+
+
+def default_cap(values, p, bankroll, n_bets, scales):
+    """每个倍数的资金状态上限：n_bets 注后的「期望盈利 + CAP_SIGMAS 倍标准差」"""
+    mean = float(values @ p)
+    std = float(np.sqrt(((values - mean) ** 2) @ p))
+    return bankroll + scales * (n_bets * max(mean, 0.0) + CAP_SIGMAS * std * np.sqrt(n_bets))
+
+
+def ruin_curve(net, prob, bankroll, n_bets, scales, n_states=DEFAULT_STATES, cap=None):
+    """按投注倍数批量求 n_bets 注内的破产概率
+
+    net, prob -- 单注（倍数为1时）的净盈亏分布
+    scales    -- (S,) 投注倍数，所有投注金额同比放大
+    cap       -- 资金状态上限（标量或 (S,)），默认见 default_cap
+    返回字典：
+      ruin_prob      -- (S,) n_bets 注内破产概率
+      ruin_by_bet    -- (S, n_bets+1) 第 n 注之前（含）已破产的概率
+      expected_bets  -- (S,) 期望存活注数 E[min(T, n_bets)]
+      mean_ruin_time -- (S,) 破产条件下的平均破产注数（从未破产为NaN）
+      by_bankroll    -- (S, M+1) 各起始资金的 n_bets 注内破产概率；bankroll_grid (S, M+1) 为对应金额
+    """
+    values, p = merge_outcomes(net, prob)
+    scales = np.atleast_1d(np.asarray(scales, dtype=float))
+    n_scales = len(scales)
+    cap = default_cap(values, p, bankroll, n_bets, scales) if cap is None else cap
+    step = np.broadcast_to(np.asarray(cap, dtype=float) / n_states, (n_scales,))
+    # (S, J) 每个倍数、每个结果的位移（格数）；非整数位移拆到相邻两格，保持每注的期望不变
+    exact = scales[:, None] * values[None, :] / step[:, None]
+    lower = np.floor(exact).astype(np.int64)
+    frac = exact - lower
+    shifts = np.concatenate([lower, lower + 1], axis=1)
+    weights = np.concatenate([p * (1 - frac), p * frac], axis=1)
+    states = np.arange(n_states + 1)
+    # 稀疏转移算子：(S, 2J, M+1) 的目标下标（展平到整个批次），超出上下界的截到吸收态/上限
+    targets = np.clip(states[None, None, :] + shifts[:, :, None], 0, n_states)
+    targets += (np.arange(n_scales) * (n_states + 1))[:, None, None]
+    start = np.minimum(np.rint(bankroll / step).astype(np.int64), n_states)
+    rows = np.arange(n_scales)
+
+    r = np.zeros((n_scales, n_states + 1))
+    r[:, 0] = 1.0
+    ruin_by_bet = np.empty((n_scales, n_bets + 1))
+    ruin_by_bet[:, 0] = r[rows, start]
+    for n in range(1, n_bets + 1):
+        r = np.einsum("sj,sjm->sm", weights, r.ravel()[targets])
+        r[:, 0] = 1.0
+        ruin_by_bet[:, n] = r[rows, start]
+
+    hazard = np.diff(ruin_by_bet, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_time = (hazard * np.arange(1, n_bets + 1)).sum(axis=1) / ruin_by_bet[:, -1]
+    return {
+        "scales": scales,
+        "ruin_prob": ruin_by_bet[:, -1],
+        "ruin_by_bet": ruin_by_bet,
+        "expected_bets": (1 - ruin_by_bet[:, :-1]).sum(axis=1),
+        "mean_ruin_time": np.where(ruin_by_bet[:, -1] > 0, mean_time, np.nan),
+        "by_bankroll": r,
+        "bankroll_grid": states[None, :] * step[:, None],
+    }
+
+
+def fixture_ruin_curve(fixture, bankroll, n_bets, scales, home_share=None, **kwargs):
+    """按比赛字典的投注方案计算破产曲线（每注都重复同一方案）"""
+    net, prob = fixture_outcomes(fixture, home_share)
+    return ruin_curve(net, prob, bankroll, n_bets, scales, **kwargs)
+
+
+def simulate_ruin(net, prob, bankroll, n_bets, scale, n_trials=20000, seed=None):
+    """抽样估计破产概率（用于核对）"""
+    rng = np.random.default_rng(seed)
+    draws = np.asarray(net)[rng.choice(len(net), size=(n_trials, n_bets), p=prob)] * scale
+    paths = bankroll + np.cumsum(draws, axis=1)
+    return float((paths.min(axis=1) <= 0).mean())
+
+
+if __name__ == "__main__":
+    # 基准：python ruin.py [注数] [倍数个数]
+    n_bets = int(sys.argv[1]) if len(sys.argv) >= 2 else 500
+    n_scales = int(sys.argv[2]) if len(sys.argv) >= 3 else 50
+    net, prob = fixture_outcomes(random_book(1)[0])
+    scales = np.linspace(0.1, 3.0, n_scales)
+    start = time.perf_counter()
+    curve = ruin_curve(net, prob, 1000.0, n_bets, scales)
+    print(f"{n_scales} 个倍数 × {n_bets} 注：{(time.perf_counter() - start) * 1000:.0f} ms")
+    for i in np.linspace(0, n_scales - 1, 5).astype(int):
+        mc = simulate_ruin(net, prob, 1000.0, n_bets, scales[i], seed=1)
+        print(f"  倍数 {scales[i]:.2f}: 破产概率 {curve['ruin_prob'][i]:.4f}（抽样 {mc:.4f}），"
+              f"期望存活 {curve['expected_bets'][i]:.1f} 注")
@@ -0,0 +1,231 @@
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# --- 整季 / 赛会结局模拟 ---
+# 已赛场次按实际比分计入，剩余场次按每场的比分概率矩阵抽样；一批赛季在 NumPy 里一起模拟：
+#   抽样 -- 每场比赛一次 searchsorted，把整批赛季的均匀随机数映射到比分格（单场的累积分布很小，常驻缓存）；
+#   积分榜 -- 积分/进球/失球用 (赛季, 比赛) × (比赛, 球队) 的 one-hot 矩阵乘法汇总；
+#   排名 -- 积分之后按联赛的同分规则依次比较，最后抽签，一次 lexsort 排出 (赛季, 名次)。
+# 相互战绩按「同分球队之间的小联赛」计算：同分两队之间的比赛才计入，同样是一次矩阵乘法。
+# 赛季分块模拟（控制内存），块之间相互独立，可以分给进程池；每块只返回名次计数，汇总成名次概率。
+
+DEFAULT_SEASONS = 100_000
+DEFAULT_CHUNK = 10_000
+POINTS_WIN, POINTS_DRAW = 3, 1
+
+# 积分相同后的比较顺序（积分之后、抽签之前）
+TIE_BREAKERS = {
+    "英超": ("goal_difference", "goals_for"),
+    "德甲": ("goal_difference", "goals_for"),
+    "法甲": ("goal_difference", "goals_for"),
+    "西甲": ("h2h_points", "h2h_goal_difference", "goal_difference", "goals_for"),
+    "意甲": ("h2h_points", "h2h_goal_difference", "goal_difference", "goals_for"),
+}
+DEFAULT_TIE_BREAKERS = ("goal_difference", "goals_for")
+TIE_BREAKER_LABELS = {"goal_difference": "净胜球", "goals_for": "进球", "h2h_points": "相互战绩积分",
+                      "h2h_goal_difference": "相互战绩净胜球"}
+
+
+def default_zones(n_teams):
+    """名次区间 {名称: [起, 止)}：冠军、前四、降级（后三名）"""
+    return {"冠军": (0, 1), "前四": (0, min(4, n_teams)), "降级": (max(n_teams - 3, 0), n_teams)}
+
+
+def remaining_fixtures(teams, played_home, played_away):
+    """双循环赛程里还没踢的 (主, 客) 球队编号"""
+    n = len(teams)
+    home, away = np.divmod(np.arange(n * n), n)
+    todo = home != away
+    todo[np.asarray(played_home, dtype=np.int64) * n + np.asarray(played_away, dtype=np.int64)] = False
+    return home[todo], away[todo]
+
+
+def season_inputs(played, score_matrix, fixtures=None, teams=None):
+    """整理模拟输入
+
+    played：已赛赛果（home_team, away_team, home_goals, away_goals）；
+    fixtures：剩余赛程（home_team, away_team），不给时取双循环里还没踢的场次；
+    score_matrix(主, 客)：比分概率矩阵（如 GoalModel.score_matrix），返回 None 表示缺少该队参数。
+    """
+    names = [played["home_team"], played["away_team"]]
+    if fixtures is not None:
+        names += [fixtures["home_team"], fixtures["away_team"]]
+    teams = sorted(set(pd.concat(names).astype(str)) if teams is None else teams)
+    index = {t: i for i, t in enumerate(teams)}
+    p_home = np.array([index[t] for t in played["home_team"].astype(str)], dtype=np.int64)
+    p_away = np.array([index[t] for t in played["away_team"].astype(str)], dtype=np.int64)
+    if fixtures is None:
+        home, away = remaining_fixtures(teams, p_home, p_away)
+    else:
+        home = np.array([index[t] for t in fixtures["home_team"].astype(str)], dtype=np.int64)
+        away = np.array([index[t] for t in fixtures["away_team"].astype(str)], dtype=np.int64)
+    grids = [score_matrix(teams[h], teams[a]) for h, a in zip(home.tolist(), away.tolist())]
+    missing = sorted({teams[h] for h, g in zip(home.tolist(), grids) if g is None} |
+                     {teams[a] for a, g in zip(away.tolist(), grids) if g is None})
+    if missing:
+        raise ValueError(f"缺少比分概率的球队: {', '.join(missing[:5])}")
+    size = grids[0].shape[0] if grids else 1
+    cdf = np.cumsum(np.array(grids, dtype=float).reshape(len(grids), -1), axis=1) if grids else np.ones((0, 1))
+    cdf /= np.maximum(cdf[:, -1:], 1e-300)
+    cdf[:, -1] = 1.0
+    return {
+        "teams": teams, "played_home": p_home, "played_away": p_away,
+        "played_hg": played["home_goals"].to_numpy(dtype=np.int16),
+        "played_ag": played["away_goals"].to_numpy(dtype=np.int16),
+        "home": home, "away": away, "cdf": cdf, "grid_size": size,
+    }
+
+
+def sample_scores(cdf, grid_size, n_seasons, rng):
+    """按每场的累积分布抽样比分：返回 (赛季, 比赛) 的主客进球"""
+    n_matches, n_cells = cdf.shape
+    # 按 (比赛, 赛季) 存放：每场的随机数连续，逐场查找时只访问该场的累积分布
+    # （所有比赛首尾相接一次查完反而更慢：大表的随机访问不命中缓存）
+    u = rng.random((n_matches, n_seasons))
+    cell = np.empty((n_matches, n_seasons), dtype=np.int16)
+    for m in range(n_matches):
+        cell[m] = np.searchsorted(cdf[m], u[m], side="right")
+    np.minimum(cell, n_cells - 1, out=cell)
+    hg, ag = np.divmod(cell.T, grid_size)
+    return np.ascontiguousarray(hg), np.ascontiguousarray(ag)
+
+
+def season_tables(inputs, hg, ag, tie_breakers=DEFAULT_TIE_BREAKERS, rng=None):
+    """一批赛季的最终积分榜：返回 (积分, 名次)，形状都是 (赛季, 球队)，名次 0 为冠军"""
+    n_seasons = hg.shape[0]
+    n_teams = len(inputs["teams"])
+    # 已赛场次对每个赛季都一样，拼在抽样结果前面
+    home = np.concatenate([inputs["played_home"], inputs["home"]])
+    away = np.concatenate([inputs["played_away"], inputs["away"]])
+    hg = np.concatenate([np.broadcast_to(inputs["played_hg"], (n_seasons, len(inputs["played_hg"]))), hg], axis=1)
+    ag = np.concatenate([np.broadcast_to(inputs["played_ag"], (n_seasons, len(inputs["played_ag"]))), ag], axis=1)
+    on_home = np.zeros((len(home), n_teams), dtype=np.float32)
+    on_home[np.arange(len(home)), home] = 1
+    on_away = np.zeros((len(away), n_teams), dtype=np.float32)
+    on_away[np.arange(len(away)), away] = 1
+
+    hp = np.where(hg > ag, POINTS_WIN, np.where(hg == ag, POINTS_DRAW, 0)).astype(np.float32)
+    ap = np.where(hg < ag, POINTS_WIN, np.where(hg == ag, POINTS_DRAW, 0)).astype(np.float32)
+    hgf, agf = hg.astype(np.float32), ag.astype(np.float32)
+    points = hp @ on_home + ap @ on_away
+    goals_for = hgf @ on_home + agf @ on_away
+    stats = {"goals_for": goals_for, "goal_difference": goals_for - (agf @ on_home + hgf @ on_away)}
+    if any(rule.startswith("h2h_") for rule in tie_breakers):
+        # 同分球队之间的小联赛：只有两队积分相同的比赛才计入
+        tied = (points[:, home] == points[:, away]).astype(np.float32)
+        stats["h2h_points"] = (hp * tied) @ on_home + (ap * tied) @ on_away
+        diff = (hgf - agf) * tied
+        stats["h2h_goal_difference"] = diff @ on_home - diff @ on_away
+
+    rng = np.random.default_rng() if rng is None else rng
+    # lexsort 以最后一个键为主键：抽签 < ... < 积分，全部取负按降序排
+    keys = [rng.random((n_seasons, n_teams))] + [-stats[rule] for rule in reversed(tie_breakers)] + [-points]
+    order = np.lexsort(np.stack(keys), axis=-1)
+    position = np.empty_like(order)
+    np.put_along_axis(position, order, np.arange(n_teams)[None, :], axis=1)
+    return points, position
+
+
+def simulate_chunk(inputs, n_seasons, seed, tie_breakers=DEFAULT_TIE_BREAKERS):
+    """模拟一块赛季，返回 (名次计数 (球队, 名次), 积分和 (球队,))；模块级函数，可交给进程池"""
+    rng = np.random.default_rng(seed)
+    hg, ag = sample_scores(inputs["cdf"], inputs["grid_size"], n_seasons, rng)
+    points, position = season_tables(inputs, hg, ag, tie_breakers, rng)
+    n_teams = len(inputs["teams"])
+    team = np.broadcast_to(np.arange(n_teams), position.shape)
+    counts = np.bincount((team * n_teams + position).ravel(), minlength=n_teams * n_teams)
+    return counts.reshape(n_teams, n_teams), points.sum(axis=0, dtype=np.float64)
+
+
+def simulate_season(inputs, n_seasons=DEFAULT_SEASONS, tie_breakers=DEFAULT_TIE_BREAKERS, workers=1,
+                    chunk=DEFAULT_CHUNK, seed=0):
+    """分块模拟 n_seasons 个赛季；workers>1 时各块交给进程池。返回名次计数、预期积分和耗时"""
+    t0 = time.perf_counter()
+    sizes = [min(chunk, n_seasons - start) for start in range(0, n_seasons, chunk)]
+    # 每块一个独立的随机流，结果与是否用进程池无关
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers > 1 and len(sizes) > 1:
+        # 与评估服务一致用 spawn，避免在多线程的 Streamlit 进程里 fork
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            parts = list(pool.map(simulate_chunk, [inputs] * len(sizes), sizes, seeds,
+                                  [tuple(tie_breakers)] * len(sizes)))
+    else:
+        parts = [simulate_chunk(inputs, n, s, tie_breakers) for n, s in zip(sizes, seeds)]
+    counts = sum(p[0] for p in parts)
+    points = sum(p[1] for p in parts)
+    return {"counts": counts, "expected_points": points / max(n_seasons, 1), "n_seasons": n_seasons,
+            "seconds": time.perf_counter() - t0}
+
+
+def current_points(inputs):
+    """已赛场次的积分"""
+    n_teams = len(inputs["teams"])
+    hg, ag = inputs["played_hg"], inputs["played_ag"]
+    hp = np.where(hg > ag, POINTS_WIN, np.where(hg == ag, POINTS_DRAW, 0))
+    ap = np.where(hg < ag, POINTS_WIN, np.where(hg == ag, POINTS_DRAW, 0))
+    return (np.bincount(inputs["played_home"], weights=hp, minlength=n_teams)
+            + np.bincount(inputs["played_away"], weights=ap, minlength=n_teams))
+
+
+def position_table(inputs, result, zones=None):
+    """名次概率表：当前积分、预期积分、各区间概率和每个名次的概率（%），按预期积分排序"""
+    teams = inputs["teams"]
+    prob = result["counts"] / max(result["n_seasons"], 1) * 100
+    zones = default_zones(len(teams)) if zones is None else zones
+    out = pd.DataFrame({"球队": teams, "当前积分": current_points(inputs).astype(int),
+                        "预期积分": result["expected_points"].round(1)})
+    for name, (lo, hi) in zones.items():
+        out[f"{name}%"] = prob[:, lo:hi].sum(axis=1).round(2)
+    for pos in range(len(teams)):
+        out[f"第{pos + 1}名%"] = prob[:, pos].round(2)
+    return out.sort_values("预期积分", ascending=False, ignore_index=True)
+
+
+if __name__ == "__main__":
+    # 基准：python season.py [赛季数] [进程数]
+    from goal_model import GoalModel
+
+    n_seasons = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SEASONS
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    rng = np.random.default_rng(0)
+    n_teams = 20
+    teams = [f"T{i:02d}" for i in range(n_teams)]
+    model = GoalModel(teams, rng.normal(0, 0.25, n_teams), rng.normal(0, 0.2, n_teams), 0.15, 0.25, -0.05)
+    empty = pd.DataFrame({"home_team": [], "away_team": [], "home_goals": [], "away_goals": []})
+
+    t0 = time.perf_counter()
+    inputs = season_inputs(empty, model.score_matrix, teams=teams)
+    print(f"整季 {len(inputs['home'])} 场、每场 {inputs['cdf'].shape[1]} 个比分格：准备 "
+          f"{(time.perf_counter() - t0) * 1000:.0f} ms")
+    for rules in (DEFAULT_TIE_BREAKERS, TIE_BREAKERS["西甲"]):
+        result = simulate_season(inputs, n_seasons, rules, workers)
+        label = " > ".join(TIE_BREAKER_LABELS[r] for r in rules)
+        print(f"{n_seasons} 个赛季（积分 > {label}，{workers} 进程）：{result['seconds']:.2f} s")
+
+    # 小样本逐赛季对照：逐队累加积分、按 (积分, 净胜球, 进球) 排序
+    check = np.random.default_rng(1)
+    hg, ag = sample_scores(inputs["cdf"], inputs["grid_size"], 200, check)
+    points, position = season_tables(inputs, hg, ag, DEFAULT_TIE_BREAKERS, check)
+    mismatches = 0
+    for s in range(200):
+        pts, gf, ga = np.zeros(n_teams), np.zeros(n_teams), np.zeros(n_teams)
+        for h, a, x, y in zip(inputs["home"], inputs["away"], hg[s], ag[s]):
+            pts[h] += 3 if x > y else (1 if x == y else 0)
+            pts[a] += 3 if y > x else (1 if x == y else 0)
+            gf[h] += x
+            gf[a] += y
+            ga[h] += y
+            ga[a] += x
+        key = sorted(range(n_teams), key=lambda t: (-pts[t], -(gf[t] - ga[t]), -gf[t]))
+        ranked = [sorted(range(n_teams), key=lambda t: position[s, t])]
+        # 三项都相同的球队由抽签决定，只比较排序键
+        mismatches += [(pts[t], gf[t] - ga[t], gf[t]) for t in key] != \
+                      [(pts[t], gf[t] - ga[t], gf[t]) for t in ranked[0]]
+    print(f"逐赛季对照：200 个赛季中排名不一致 {mismatches} 个")
+    table = position_table(inputs, result)
+    print(table.iloc[:, :7].head(6).to_string(index=False))
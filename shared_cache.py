@@ -0,0 +1,200 @@
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+# --- 跨会话共享缓存 + 会话内存记账 ---
+# 多人同时使用时，联赛先验、进球模型表等昂贵且不可变的产物只在进程里保存一份，
+# 所有会话只读共享；每个会话只保留小的增量（组件取值、自己的派生结果）。
+# 会话的派生结果放在服务端的会话空间里，空闲超时后整体回收，再访问时按需重建，
+# 这样内存随用户数增长的只有增量部分。
+
+DEFAULT_IDLE_SECONDS = 15 * 60
+DEFAULT_MAX_ENTRIES = 64
+
+
+def freeze(value):
+    """把共享产物设为只读：数组禁止写入，字典换成只读视图（对象只处理一层属性）"""
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+        return value
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    for attr in getattr(value, "__dict__", {}).values():
+        if isinstance(attr, np.ndarray):
+            attr.setflags(write=False)
+    return value
+
+
+def deep_sizeof(obj, skip_ids=frozenset(), _seen=None):
+    """估算对象占用的字节数；skip_ids 中的对象（共享产物）不计入"""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen or id(obj) in skip_ids:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        # 视图（如内存映射切片）不拥有数据，只计对象头
+        return sys.getsizeof(obj) if obj.base is not None else obj.nbytes + 128
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(np.sum(obj.memory_usage(deep=True)))
+    if hasattr(obj, "to_plotly_json"):
+        # 图对象内部引用了全局共享的校验器，只计图数据本身
+        return deep_sizeof(obj.to_plotly_json(), skip_ids, seen)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, (dict, MappingProxyType)):
+        size += sum(deep_sizeof(k, skip_ids, seen) + deep_sizeof(v, skip_ids, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(v, skip_ids, seen) for v in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), skip_ids, seen)
+    return size
+
+
+def format_bytes(n):
+    """字节数转为易读字符串"""
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+class SharedCache:
+    """进程级只读产物缓存，按 (类别, 键) 存放，每个类别按最近使用保留有限条目"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = defaultdict(OrderedDict)   # 类别 -> {键: (值, 字节数)}
+        self._building = {}                        # (类别, 键) -> 构建锁
+        self.hits = defaultdict(int)
+        self.builds = defaultdict(int)
+
+    def get(self, kind, key, builder):
+        """命中则直接返回；未命中时调用 builder() 构建一次（同一键并发只构建一次）"""
+        with self._lock:
+            entries = self._entries[kind]
+            if key in entries:
+                entries.move_to_end(key)
+                self.hits[kind] += 1
+                return entries[key][0]
+            build_lock = self._building.setdefault((kind, key), threading.Lock())
+        with build_lock:
+            with self._lock:
+                if key in self._entries[kind]:
+                    self.hits[kind] += 1
+                    return self._entries[kind][key][0]
+            value = freeze(builder())
+            size = deep_sizeof(value)
+            with self._lock:
+                entries = self._entries[kind]
+                entries[key] = (value, size)
+                while len(entries) > self.max_entries:
+                    entries.popitem(last=False)
+                self.builds[kind] += 1
+                self._building.pop((kind, key), None)
+        return value
+
+    def put(self, kind, key, value):
+        """直接写入一个已算好的产物（供后台预计算使用）"""
+        return self.get(kind, key, lambda: value)
+
+    def owned_ids(self):
+        """共享产物及其内部对象的 id，会话记账时跳过"""
+        ids = set()
+        with self._lock:
+            values = [v for entries in self._entries.values() for v, _ in entries.values()]
+        for value in values:
+            ids.add(id(value))
+            ids.update(id(v) for v in getattr(value, "__dict__", {}).values())
+        return ids
+
+    def nbytes(self):
+        with self._lock:
+            return sum(size for entries in self._entries.values() for _, size in entries.values())
+
+    def stats(self):
+        """每个类别的条目数、内存和命中/构建次数"""
+        with self._lock:
+            return [
+                {"类别": kind, "条目": len(entries),
+                 "内存": format_bytes(sum(size for _, size in entries.values())),
+                 "命中": self.hits[kind], "构建": self.builds[kind]}
+                for kind, entries in self._entries.items()
+            ]
+
+
+class SessionRegistry:
+    """各会话的服务端空间与最近访问时间；空闲超时的会话空间整体回收"""
+
+    def __init__(self, idle_seconds=DEFAULT_IDLE_SECONDS):
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._spaces = {}       # 会话id -> dict
+        self._last_seen = {}
+        self._state_bytes = {}  # 会话id -> 最近一次记录的 session_state 字节数
+        self.evicted = 0
+
+    def space(self, session_id):
+        """取（必要时新建）会话的服务端空间，并刷新访问时间"""
+        with self._lock:
+            self._last_seen[session_id] = time.monotonic()
+            return self._spaces.setdefault(session_id, {})
+
+    def record_state(self, session_id, nbytes):
+        with self._lock:
+            self._state_bytes[session_id] = nbytes
+
+    def evict_idle(self, now=None):
+        """回收超过空闲时长的会话空间，返回回收的会话数"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            idle = [sid for sid, seen in self._last_seen.items() if now - seen > self.idle_seconds]
+            for sid in idle:
+                self._spaces.pop(sid, None)
+                self._last_seen.pop(sid, None)
+                self._state_bytes.pop(sid, None)
+            self.evicted += len(idle)
+        return len(idle)
+
+    def usage(self, skip_ids=frozenset()):
+        """每个会话的空闲时长和内存（服务端空间 + session_state，不含共享产物）"""
+        now = time.monotonic()
+        with self._lock:
+            items = [(sid, space, now - self._last_seen[sid], self._state_bytes.get(sid, 0))
+                     for sid, space in self._spaces.items()]
+        return [
+            {"会话": sid[:8], "空闲秒": round(idle, 1), "会话空间": deep_sizeof(space, skip_ids),
+             "session_state": state_bytes}
+            for sid, space, idle, state_bytes in items
+        ]
+
+
+def memory_report(shared, registry, session_id, state):
+    """当前会话按键的内存明细 + 全部会话汇总 + 共享层统计
+
+    state 是当前会话的 session_state（只读遍历）
+    """
+    skip = shared.owned_ids()
+    state_rows = [{"位置": "session_state", "键": str(k), "内存": deep_sizeof(v, skip)}
+                  for k, v in state.items()]
+    registry.record_state(session_id, sum(r["内存"] for r in state_rows))
+    space_rows = [{"位置": "会话空间", "键": str(k), "内存": deep_sizeof(v, skip)}
+                  for k, v in registry.space(session_id).items()]
+    sessions = registry.usage(skip)
+    per_session = sum(s["会话空间"] + s["session_state"] for s in sessions)
+    return {
+        "current": sorted(state_rows + space_rows, key=lambda r: -r["内存"]),
+        "sessions": sessions,
+        "shared": shared.stats(),
+        "shared_bytes": shared.nbytes(),
+        "sessions_bytes": per_session,
+    }
@@ -0,0 +1,144 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+# --- 冷启动计时与快速启动模式 ---
+# 每次脚本运行用 RunTimer 记录各阶段距运行开始的耗时（首屏、依赖导入、首个组件、完成……）；
+# 进程里第一次运行（冷启动：模块首次导入、静态资源首次整理）单独保存在 COLD_RUN，
+# 页面上的计时面板和下面的基准脚本都读它。
+# 快速启动模式（默认开启，环境变量 APP_STARTUP_MODE=full 关闭）：
+#   首屏（样式、标题）和首个组件（主客队输入）在导入 pandas 等重量级依赖之前发出；
+#   报告、教育总结、热力图、台账等非核心板块在用户打开开关之前不计算也不构建组件，
+#   这些板块的模块也在开关分支里才导入。
+
+STARTUP_MODE_ENV = "APP_STARTUP_MODE"
+# 进程内第一次导入本模块的时刻
+PROCESS_START = time.perf_counter()
+COLD_RUN = None
+_lock = threading.Lock()
+
+
+def default_fast_start():
+    """快速启动模式的默认值（由环境变量决定）"""
+    return os.environ.get(STARTUP_MODE_ENV, "fast").strip().lower() != "full"
+
+
+class RunTimer:
+    """单次脚本运行的阶段计时"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = []
+
+    def mark(self, name):
+        """记录一个阶段（距本次运行开始的秒数）"""
+        self.marks.append((name, time.perf_counter() - self.start))
+
+    def finish(self):
+        """运行结束：记录完成时刻；进程里的第一次运行另存为冷启动记录"""
+        global COLD_RUN
+        self.mark("完成")
+        record = {"started": self.start, "since_process_ms": (self.start - PROCESS_START) * 1000,
+                  "marks": [(name, t * 1000) for name, t in self.marks]}
+        with _lock:
+            if COLD_RUN is None:
+                COLD_RUN = record
+        return record
+
+
+def cold_run():
+    """本进程第一次运行的计时记录（还没有完整运行过时为 None）"""
+    return COLD_RUN
+
+
+def timing_rows(record):
+    """阶段计时表：每个阶段的累计耗时和本段耗时（毫秒）"""
+    rows, previous = [], 0.0
+    for name, ms in record["marks"]:
+        rows.append({"阶段": name, "累计 ms": round(ms, 1), "本段 ms": round(ms - previous, 1)})
+        previous = ms
+    return rows
+
+
+# --- 冷启动基准 ---
+# 每次测量都起一个全新的解释器进程，按启动模式运行一次应用脚本（streamlit AppTest），记录：
+#   streamlit 导入耗时、从进程启动到首屏/首个组件的时间、脚本内各阶段耗时、重跑一次的耗时。
+# 注意：AppTest.run() 的墙钟时间含测试框架自身的等待，首屏/首个组件以脚本内打点为准。
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+# 依赖导入耗时（python -X importtime）单独列出的顶层包
+IMPORT_PROBES = ["streamlit", "pandas", "numpy", "plotly.graph_objects"]
+
+
+def _child_measure():
+    """子进程：冷启动运行一次应用，把结果以 JSON 输出到 stdout"""
+    t0 = time.perf_counter()
+    import streamlit  # noqa: F401
+    t_streamlit = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    at.run()
+    t_first = time.perf_counter()
+    at.run()
+    t_rerun = time.perf_counter()
+    # 本文件此时作为 __main__ 运行，应用导入的 startup 是另一个模块对象
+    cold = sys.modules["startup"].COLD_RUN
+    offset = (cold["started"] - t0) * 1000
+    marks = dict(cold["marks"])
+    print(json.dumps({
+        "import_streamlit_ms": (t_streamlit - t0) * 1000,
+        "first_paint_ms": offset + marks["首屏"],
+        "first_widget_ms": offset + marks["首个组件"],
+        "script_ms": marks["完成"],
+        "first_run_wall_ms": (t_first - t_streamlit) * 1000,
+        "rerun_wall_ms": (t_rerun - t_first) * 1000,
+        "exceptions": len(at.exception),
+        "marks": cold["marks"],
+    }))
+
+
+def measure_cold_start(mode, repeats=3):
+    """按启动模式（fast/full）测 repeats 次全新进程的冷启动"""
+    env = dict(os.environ, **{STARTUP_MODE_ENV: mode})
+    runs = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"], env=env,
+                             capture_output=True, text=True, check=True, cwd=os.path.dirname(APP_PATH))
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return runs
+
+
+def import_costs(modules=IMPORT_PROBES):
+    """各包在全新进程里单独导入的累计耗时（毫秒，python -X importtime，含其依赖）"""
+    costs = {}
+    for module in modules:
+        err = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                             capture_output=True, text=True, check=True).stderr
+        for line in err.splitlines():
+            parts = line.split("|")
+            # 顶层导入的模块名前只有一个空格，嵌套导入逐层多缩进两格
+            if len(parts) == 3 and parts[1].strip().isdigit() and parts[2].rstrip()[1:] == module:
+                costs[module] = int(parts[1]) / 1000
+    return costs
+
+
+if __name__ == "__main__":
+    # 基准：python startup.py [每种模式的次数]
+    if len(sys.argv) >= 2 and sys.argv[1] == "--child":
+        _child_measure()
+        sys.exit(0)
+    repeats = int(sys.argv[1]) if len(sys.argv) >= 2 else 3
+    costs = import_costs()
+    print("依赖导入（-X importtime 累计）：" + "，".join(f"{m} {ms:.0f} ms" for m, ms in costs.items()))
+    fields = [("import_streamlit_ms", "导入streamlit"), ("first_paint_ms", "首屏"),
+              ("first_widget_ms", "首个组件"), ("script_ms", "脚本全程"), ("rerun_wall_ms", "重跑")]
+    for mode in ("full", "fast"):
+        runs = measure_cold_start(mode, repeats)
+        summary = "，".join(f"{label} {statistics.median(r[key] for r in runs):.0f} ms" for key, label in fields)
+        print(f"[{mode}] {repeats} 次冷启动中位数：{summary}；异常 {sum(r['exceptions'] for r in runs)}")
+        stages = timing_rows({"marks": runs[len(runs) // 2]["marks"]})
+        print("    " + "，".join(f"{r['阶段']} +{r['本段 ms']:.0f}" for r in stages))
@@ -0,0 +1,403 @@
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from inplay import InPlayModel, prematch_rates
+from payoff import (
+    CS_OTHER, MAX_GRID_GOALS, S1_SCORES, S2_RESULTS, S2_TOTALS,
+    correct_score_hits, parse_scoreline, strategy1_settle, strategy2_settle,
+)
+
+# --- 策略插件注册表 ---
+# 每个策略是注册在 STRATEGIES 里的一个插件，声明：
+#   schema          -- 比赛字典里该策略自己的字段 (名称, 类型, 默认值, 说明)，缺省字段按它补齐，CSV 导入按它解析；
+#   bets            -- 由比赛字典构造的注单 [{label, odds, stake}]；
+#   payoff          -- (结果数, 注单数) 的收益矩阵：每注在每个结果上的净盈亏；
+#   settle_history  -- 历史数据集上的逐场批量结算（赔率随比赛变化），回测和参数扫描用；
+#   backtest_params -- 当前比赛对应的一组 settle_history 参数（sweep_stake 是回测时扫描的投注金额参数）；
+#   leg_results     -- 关联腿是另一场比赛的胜平负时，该比赛和「状态 -> 胜/平/负」的权重（稳胆对冲、评级模型用）。
+# 所有策略共用一个结果空间：关联腿状态 × 主比赛完整比分网格
+# （状态在外层，比分按 (主队进球, 客队进球) 行优先展开）。没有关联腿的策略只有一个状态；
+# 策略2的关联腿是稳胆（命中 / 未命中）。结果概率 = 状态概率 ⊗ 比分网格概率，
+# 于是期望、精确分布、热力图、报告、对冲都只和 (收益矩阵, 概率) 打交道，不再按策略分支；
+# 多场比赛补零叠成 (场数, 结果数, 注单数) 张量一次计算。
+# 新策略只需要继承 Strategy、实现 bets / payoff（需要回测时再实现 backtest_params / settle_history），
+# 再用 @register 登记；页面按 schema 生成它的输入组件。
+
+STRATEGY_1 = "策略 1：比分精准流"
+STRATEGY_2 = "策略 2：总进球复式流"
+STRATEGIES = {}
+
+# 所有策略共用的比赛字段
+COMMON_SCHEMA = [
+    ("league", str, "", "联赛"),
+    ("date", str, "", "比赛日期"),
+    ("time", str, "", "开球时间"),
+    ("home_team", str, "", "主队"),
+    ("away_team", str, "", "客队"),
+    ("pred_prob", float, 0.48, "预测大球概率"),
+    ("home_share", float, 0.5, "主队进球占比"),
+    ("o25_odds", float, 2.30, "大球2.5赔率"),
+    ("o25_stake", float, 100.0, "大球投入"),
+]
+
+
+def _split(value):
+    """拆分 "1-1;0-0" 这类多选字段"""
+    if not isinstance(value, str):
+        return []
+    return [v.strip() for v in value.replace("，", ";").replace(",", ";").split(";") if v.strip()]
+
+
+def score_grid(max_goals=MAX_GRID_GOALS):
+    """比分网格展开后的 (主队进球, 客队进球)，行优先"""
+    h, a = np.meshgrid(np.arange(max_goals + 1), np.arange(max_goals + 1), indexing="ij")
+    return h.ravel(), a.ravel()
+
+
+class Strategy:
+    """策略插件基类：子类声明 name、schema，实现 bets / payoff"""
+
+    name = ""
+    schema = []
+    # 回测时按扫描值替换的投注金额参数 (参数名, 说明)；不支持回测的策略为 None
+    sweep_stake = None
+
+    def defaults(self, fixture):
+        """按 COMMON_SCHEMA + schema 补齐缺省字段（返回新字典）"""
+        out = {name: default for name, _, default, _ in COMMON_SCHEMA + self.schema}
+        out.update(fixture)
+        out["strategy"] = self.name
+        return out
+
+    def from_record(self, rec):
+        """CSV 的一行 -> 本策略自己的字段（默认按 schema 逐列取值）"""
+        return {name: kind(rec[name]) if name in rec and pd.notna(rec[name]) else default
+                for name, kind, default, _ in self.schema if kind in (str, float)}
+
+    def states(self, fixture):
+        """关联腿的状态名和概率；默认没有关联腿"""
+        return ["—"], np.ones(1)
+
+    def describe(self, fixture):
+        """报告里注单以外的策略参数 (名称, 值)；默认没有"""
+        return []
+
+    def leg_results(self, fixture):
+        """关联腿是另一场比赛的胜平负时返回 ((主队, 客队), 权重 (状态数, 3))；默认没有"""
+        return None
+
+    def bets(self, fixture):
+        raise NotImplementedError
+
+    def payoff(self, fixture, max_goals=MAX_GRID_GOALS):
+        raise NotImplementedError
+
+    def backtest_params(self, fixture):
+        """当前比赛的投注对应的一组 settle_history 参数；不支持回测时为 None"""
+        return None
+
+    def settle_history(self, fixtures, params):
+        """历史数据集（backtest.prepare_fixtures 的结果）按参数组结算，返回 (净盈亏, 投入) (参数组数, 比赛数)"""
+        raise NotImplementedError(f"{self.name} 不支持历史回测")
+
+
+def register(cls):
+    """登记策略插件（类装饰器）"""
+    STRATEGIES[cls.name] = cls()
+    return cls
+
+
+def get_strategy(fixture):
+    """按策略名或比赛字典取插件；比赛字典没有 strategy 字段时按是否有 score_bets 判断（兼容旧数据）"""
+    if isinstance(fixture, str):
+        name = fixture
+    else:
+        name = fixture.get("strategy") or (STRATEGY_1 if "score_bets" in fixture else STRATEGY_2)
+    if name not in STRATEGIES:
+        raise ValueError(f"未注册的策略: {name}")
+    return STRATEGIES[name]
+
+
+@register
+class CorrectScoreStrategy(Strategy):
+    """策略1：大球 + 波胆盘口上的若干比分（含「其他」项）"""
+
+    name = STRATEGY_1
+    schema = [
+        ("score_bets", dict, {}, "波胆盘口 {比分或其他项: (赔率, 金额)}，金额为0的行只作为盘口列出"),
+    ]
+    sweep_stake = ("score_stake", "每个比分投入")
+
+    def from_record(self, rec):
+        # CSV：scores ("1-1;2-1;其他主胜"), score_stake, cs_<比分或其他项>
+        stake = float(rec.get("score_stake", 10.0))
+        return {"score_bets": {s: (float(rec.get(f"cs_{s}")), stake) for s in _split(rec.get("scores"))
+                               if (parse_scoreline(s) or s in CS_OTHER) and pd.notna(rec.get(f"cs_{s}"))}}
+
+    def bets(self, fixture):
+        out = [{"label": sel, "odds": float(odds), "stake": float(stake)}
+               for sel, (odds, stake) in fixture["score_bets"].items() if float(odds) > 1 and float(stake) > 0]
+        out.append({"label": "大球2.5", "odds": float(fixture["o25_odds"]), "stake": float(fixture["o25_stake"])})
+        return out
+
+    def payoff(self, fixture, max_goals=MAX_GRID_GOALS):
+        h, a = score_grid(max_goals)
+        # 「其他」项覆盖的范围由整个盘口（含金额为0的行）决定
+        selections = list(fixture["score_bets"])
+        hits = correct_score_hits(h, a, selections)
+        bets = self.bets(fixture)
+        columns = [hits[:, selections.index(b["label"])] for b in bets[:-1]] + [h + a >= 3]
+        odds = np.array([b["odds"] for b in bets])
+        stakes = np.array([b["stake"] for b in bets])
+        return np.column_stack(columns).astype(float) * (odds * stakes) - stakes
+
+    def backtest_params(self, fixture):
+        # 回测里每个比分同一金额，取盘口里第一个有投入的比分的金额
+        staked = {s: float(stake) for s, (_, stake) in fixture["score_bets"].items() if float(stake) > 0}
+        return {"scores": list(staked), "score_stake": next(iter(staked.values()), 10.0),
+                "o25_stake": float(fixture["o25_stake"])}
+
+    def settle_history(self, fixtures, params):
+        # 参数组：scores（数据集 score_selections 的子集，没有赔率列的选项不下注）, score_stake, o25_stake
+        selections = list(fixtures.get("score_selections", S1_SCORES))
+        stakes = np.zeros((len(params), len(selections)))
+        o25 = np.zeros(len(params))
+        for p, prm in enumerate(params):
+            for s in prm.get("scores", []):
+                if s in selections:
+                    stakes[p, selections.index(s)] = prm.get("score_stake", 10.0)
+            o25[p] = prm.get("o25_stake", 100.0)
+        score_odds = np.asarray(fixtures["score_odds"], dtype=float)
+        hits = correct_score_hits(fixtures["home_goals"], fixtures["away_goals"], selections, score_odds)
+        return strategy1_settle(hits, fixtures["total_goals"], score_odds, fixtures["o25_odds"], stakes, o25)
+
+
+@register
+class GoalParlayStrategy(Strategy):
+    """策略2：大球 + 每个总进球选项与另一场稳胆组成的2串1"""
+
+    name = STRATEGY_2
+    schema = [
+        ("s2_home_team", str, "", "稳胆比赛主队"),
+        ("s2_away_team", str, "", "稳胆比赛客队"),
+        ("s2_league", str, "", "稳胆比赛联赛"),
+        ("s2_selection", str, "胜", "稳胆选项（胜/平/负，稳胆主队视角）"),
+        ("s2_odds", list, [1.35, 4.50, 8.00], "稳胆胜平负赔率"),
+        ("goal_odds", dict, {}, "主比赛总进球选项 {0球/1球/2球: 赔率}"),
+        ("parlay_stake", float, 50.0, "每注2串1投入"),
+    ]
+    sweep_stake = ("parlay_stake", "每注2串1投入")
+
+    def from_record(self, rec):
+        # CSV：s2_win_odds, s2_draw_odds, s2_lose_odds, goals ("1球;2球"), tg_0 … tg_2
+        out = super().from_record(rec)
+        out["s2_odds"] = [float(rec.get(c, d)) for c, d in
+                          zip(["s2_win_odds", "s2_draw_odds", "s2_lose_odds"], [1.35, 4.50, 8.00])]
+        out["goal_odds"] = {g: float(rec.get(f"tg_{i}")) for i, g in enumerate(S2_TOTALS)
+                            if g in _split(rec.get("goals")) and pd.notna(rec.get(f"tg_{i}"))}
+        return out
+
+    def result_probs(self, fixture):
+        """稳胆比赛胜平负概率：比赛字典给了 leg_result_probs（如评级模型）就用它，否则取赔率隐含概率（去水）"""
+        if fixture.get("leg_result_probs") is not None:
+            probs = np.asarray(fixture["leg_result_probs"], dtype=float)
+        else:
+            probs = 1.0 / np.asarray(fixture["s2_odds"], dtype=float)
+        return probs / probs.sum()
+
+    def states(self, fixture):
+        p_hit = self.result_probs(fixture)[S2_RESULTS.index(fixture["s2_selection"])]
+        return ["稳胆命中", "稳胆未命中"], np.array([p_hit, 1 - p_hit])
+
+    def leg_results(self, fixture):
+        # 命中即所选结果；未命中分摊到另外两个结果（按赔率隐含概率）
+        pick = S2_RESULTS.index(fixture["s2_selection"])
+        implied = 1.0 / np.asarray(fixture["s2_odds"], dtype=float)
+        miss = np.where(np.arange(3) == pick, 0.0, implied)
+        return (fixture["s2_home_team"], fixture["s2_away_team"]), np.vstack([np.eye(3)[pick], miss / miss.sum()])
+
+    def describe(self, fixture):
+        match = f"{fixture['s2_league']} {fixture['s2_home_team']} vs {fixture['s2_away_team']}".strip()
+        return [("稳胆比赛", match),
+                ("稳胆选项", f"{fixture['s2_selection']} @ {fixture['s2_odds'][S2_RESULTS.index(fixture['s2_selection'])]}")]
+
+    def bets(self, fixture):
+        strong = float(fixture["s2_odds"][S2_RESULTS.index(fixture["s2_selection"])])
+        stake = float(fixture.get("parlay_stake", 0.0))
+        out = []
+        if np.isfinite(strong) and stake > 0:
+            # 组合赔率与页面一致保留两位小数
+            out = [{"label": f"2串1 {fixture['s2_selection']}×{g}", "goal": g, "odds": round(float(o) * strong, 2),
+                    "stake": stake} for g, o in fixture.get("goal_odds", {}).items() if np.isfinite(float(o))]
+        if np.isfinite(float(fixture["o25_odds"])):
+            out.append({"label": "大球2.5", "odds": float(fixture["o25_odds"]), "stake": float(fixture["o25_stake"])})
+        return out
+
+    def payoff(self, fixture, max_goals=MAX_GRID_GOALS):
+        h, a = score_grid(max_goals)
+        total = np.concatenate([h + a, h + a])
+        hit = np.repeat([True, False], h.size)
+        bets = self.bets(fixture)
+        columns = [(total == S2_TOTALS.index(b["goal"])) & hit if "goal" in b else total >= 3 for b in bets]
+        if not columns:
+            return np.zeros((total.size, 0))
+        odds = np.array([b["odds"] for b in bets])
+        stakes = np.array([b["stake"] for b in bets])
+        return np.column_stack(columns).astype(float) * (odds * stakes) - stakes
+
+    def backtest_params(self, fixture):
+        return {"selection": fixture["s2_selection"], "goals": list(fixture.get("goal_odds", {})),
+                "parlay_stake": float(fixture["parlay_stake"]), "o25_stake": float(fixture["o25_stake"])}
+
+    def settle_history(self, fixtures, params):
+        # 参数组：selection（胜/平/负）, goals, parlay_stake, o25_stake
+        selection = np.zeros(len(params), dtype=np.int64)
+        mask = np.zeros((len(params), len(S2_TOTALS)), dtype=bool)
+        parlay = np.zeros(len(params))
+        o25 = np.zeros(len(params))
+        for p, prm in enumerate(params):
+            selection[p] = S2_RESULTS.index(prm.get("selection", "胜"))
+            for g in prm.get("goals", ["1球", "2球"]):
+                mask[p, S2_TOTALS.index(g)] = True
+            parlay[p] = prm.get("parlay_stake", 50.0)
+            o25[p] = prm.get("o25_stake", 100.0)
+        return strategy2_settle(fixtures["total_goals"], fixtures["strong_result"], fixtures["strong_odds"],
+                                fixtures["total_odds"], fixtures["o25_odds"], selection, mask, parlay, o25)
+
+
+# --- 统一的计算路径（对任何已登记的策略都成立） ---
+
+def fixture_payoff(fixture, max_goals=MAX_GRID_GOALS):
+    """(注单列表, 收益矩阵 (结果数, 注单数))"""
+    strategy = get_strategy(fixture)
+    fixture = strategy.defaults(fixture)
+    return strategy.bets(fixture), strategy.payoff(fixture, max_goals)
+
+
+def fixture_net(fixture, max_goals=MAX_GRID_GOALS):
+    """每个结果上整场投注的净盈亏"""
+    return fixture_payoff(fixture, max_goals)[1].sum(axis=1)
+
+
+def outcome_probs(fixture, home_share=None, minute=0, home_score=0, away_score=0, max_goals=MAX_GRID_GOALS):
+    """结果概率（状态概率 ⊗ 比分网格概率，和为1）；home_share 不给时取比赛字典里的"""
+    strategy = get_strategy(fixture)
+    fixture = strategy.defaults(fixture)
+    share = fixture["home_share"] if home_share is None else home_share
+    model = InPlayModel(*prematch_rates(fixture["pred_prob"], share))
+    # 超出 max_goals 的比分概率极小，截断后按比例归一化
+    cells = model.final_score_matrix(minute, home_score, away_score, max_goals)[0].ravel()
+    if not cells.sum() > 0:
+        raise ValueError(f"当前比分 {home_score}-{away_score} 超出比分网格（每队最多 {max_goals} 球）")
+    return np.kron(strategy.states(fixture)[1], cells / cells.sum())
+
+
+def outcome_labels(fixture, max_goals=MAX_GRID_GOALS):
+    """结果名（「稳胆命中 · 2-1」；没有关联腿时只有比分）"""
+    states = get_strategy(fixture).states(get_strategy(fixture).defaults(fixture))[0]
+    h, a = score_grid(max_goals)
+    scores = [f"{x}-{y}" for x, y in zip(h.tolist(), a.tolist())]
+    return scores if len(states) == 1 else [f"{s} · {c}" for s in states for c in scores]
+
+
+def total_goal_probs(fixture, home_share=None, minute=0, home_score=0, away_score=0, max_goals=MAX_GRID_GOALS):
+    """主比赛 0/1/2/3+ 球的概率（由同一比分网格汇总）"""
+    h, a = score_grid(max_goals)
+    cells = outcome_probs(dict(fixture, strategy=STRATEGY_1, score_bets={}), home_share, minute, home_score,
+                          away_score, max_goals)
+    return np.bincount(np.minimum(h + a, 3), weights=cells, minlength=4)
+
+
+def fixture_ev(fixture, home_share=None, minute=0, home_score=0, away_score=0, max_goals=MAX_GRID_GOALS):
+    """整场投注的期望盈亏"""
+    _, matrix = fixture_payoff(fixture, max_goals)
+    return float(outcome_probs(fixture, home_share, minute, home_score, away_score, max_goals) @ matrix.sum(axis=1))
+
+
+def bet_table(fixture, home_share=None, minute=0, home_score=0, away_score=0, max_goals=MAX_GRID_GOALS):
+    """每注的赔率、投入、命中概率和期望盈亏"""
+    bets, matrix = fixture_payoff(fixture, max_goals)
+    prob = outcome_probs(fixture, home_share, minute, home_score, away_score, max_goals)
+    return pd.DataFrame({
+        "注单": [b["label"] for b in bets],
+        "赔率": [b["odds"] for b in bets],
+        "投入": [b["stake"] for b in bets],
+        "命中概率%": np.round(prob @ (matrix > 0) * 100, 2),
+        "EV": np.round(prob @ matrix, 2),
+    })
+
+
+def outcome_rows(fixture, home_share=None, minute=0, home_score=0, away_score=0, max_goals=MAX_GRID_GOALS):
+    """按净盈亏合并的结果表（任何策略都可用的通用报告行）：[{模拟赛果, 净盈亏, 类型, 概率}]"""
+    net = fixture_net(fixture, max_goals)
+    prob = outcome_probs(fixture, home_share, minute, home_score, away_score, max_goals)
+    labels = np.array(outcome_labels(fixture, max_goals), dtype=object)
+    values, inverse = np.unique(np.round(net, 2), return_inverse=True)
+    weights = np.bincount(inverse, weights=prob)
+    rows = []
+    for k, value in enumerate(values):
+        cells = labels[inverse == k]
+        shown = "、".join(cells[:4]) + (f" 等{len(cells)}种" if len(cells) > 4 else "")
+        rows.append({"模拟赛果": shown, "净盈亏": float(value), "类型": "盈利" if value > 0 else "亏损",
+                     "概率": float(weights[k])})
+    return rows
+
+
+def book_tensor(fixtures, home_share=None, max_goals=MAX_GRID_GOALS):
+    """多场比赛补零叠成 (场数, 结果数, 注单数) 收益张量和 (场数, 结果数) 概率（补出的结果概率为0）"""
+    payoffs = [fixture_payoff(f, max_goals)[1] for f in fixtures]
+    probs = [outcome_probs(f, home_share, max_goals=max_goals) for f in fixtures]
+    n_out = max((p.shape[0] for p in payoffs), default=0)
+    n_bets = max((p.shape[1] for p in payoffs), default=0)
+    tensor = np.zeros((len(fixtures), n_out, n_bets))
+    weights = np.zeros((len(fixtures), n_out))
+    for i, (m, p) in enumerate(zip(payoffs, probs)):
+        tensor[i, :m.shape[0], :m.shape[1]] = m
+        weights[i, :len(p)] = p
+    return tensor, weights
+
+
+def book_ev(fixtures, home_share=None, max_goals=MAX_GRID_GOALS):
+    """每场每注的期望盈亏 (场数, 注单数)（一次 einsum）"""
+    tensor, weights = book_tensor(fixtures, home_share, max_goals)
+    return np.einsum("fo,fob->fb", weights, tensor)
+
+
+if __name__ == "__main__":
+    # 基准：python strategies.py [比赛数]
+    from payoff import strategy1_score_grid, strategy2_score_grid
+
+    n = int(sys.argv[1]) if len(sys.argv) >= 2 else 1000
+    rng = np.random.default_rng(0)
+    book = []
+    for i in range(n):
+        base = {"pred_prob": float(rng.uniform(0.35, 0.65)), "o25_odds": float(rng.uniform(1.7, 2.3)),
+                "o25_stake": float(rng.choice([50, 100])), "home_share": float(rng.uniform(0.4, 0.6))}
+        if i % 2 == 0:
+            base["score_bets"] = {s: (float(o * rng.uniform(0.9, 1.1)), float(rng.choice([0, 10])))
+                                  for s, o in {"0-0": 10, "1-0": 8.5, "0-1": 8, "1-1": 7, "其他主胜": 34}.items()}
+        else:
+            base.update(s2_selection=str(rng.choice(S2_RESULTS)), s2_odds=[1.5, 4.0, 6.0],
+                        goal_odds={"1球": 4.5, "2球": 3.4}, parlay_stake=10.0)
+        book.append(base)
+
+    start = time.perf_counter()
+    evs = book_ev(book)
+    print(f"{n} 场（策略1/2各半）：收益张量 + 每注EV {(time.perf_counter() - start) * 1000:.0f} ms，"
+          f"张量 {book_tensor(book[:2])[0].shape[1:]} / 场")
+
+    # 核对：收益矩阵按注单求和 == 原来各策略自己的比分网格结算
+    worst = 0.0
+    for f in book[:200]:
+        if "score_bets" in f:
+            old = strategy1_score_grid(f["score_bets"], f["o25_odds"], f["o25_stake"]).ravel()
+        else:
+            args = (f["goal_odds"], f["s2_odds"][S2_RESULTS.index(f["s2_selection"])], f["parlay_stake"],
+                    f["o25_odds"], f["o25_stake"])
+            old = np.concatenate([strategy2_score_grid(*args, True).ravel(), strategy2_score_grid(*args, False).ravel()])
+        worst = max(worst, float(np.abs(fixture_net(f) - old).max()))
+    print(f"与原结算网格的最大差 {worst:.2e}；期望合计 {evs.sum():.2f}")
+    print(bet_table(book[1]).to_string(index=False))